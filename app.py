@@ -1,41 +1,47 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file,abort,g
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file,abort,g, Response, stream_with_context
 import pandas as pd
 import os
 import json
 from datetime import datetime
-import matplotlib.pyplot as plt
-import base64
-from io import BytesIO
-import csv
-import uuid
 from collections import defaultdict
 import sys
 import re
 import bcrypt
 import pandas as pd
 from functools import wraps
+from urllib.parse import quote
 
 # 将backend目录添加到Python的搜索路径中
 # 假设app.py在ecommerce_system根目录，backend是同级目录
 backend_dir = os.path.join(os.path.dirname(__file__), 'backend')
 sys.path.append(backend_dir)  # 让Python能找到backend目录下的文件
 
+from backend.utils.catalog_cache import catalog_cache  # 商品目录缓存（进程内共享）
+from backend.utils.action_log import submit_action, flush_actions, get_action_log_metrics  # 用户行为日志（后台批量追加写入）
+from backend.storage.engine import get_store  # 存储引擎（CSV / SQLite，由 ECOMMERCE_STORAGE_ENGINE 选择）
+from backend.utils.user_index import user_index  # 用户索引（user_id / 用户名 / 手机号 O(1)查找）
+from backend.utils.order_index import order_index  # 订单索引（按下单时间排序，支持按用户/状态游标分页）
+from backend.models.order_model import CheckoutError, OrderModel  # 订单模型（后台订单列表分页、结算下单）
+from backend.models.product_model import ProductModel  # 商品模型（商品搜索）
+from backend.utils.order_items import attach_items  # 订单商品明细（order_items表，兼容历史订单的JSON字段）
+from backend.utils.order_history import order_history  # 用户订单历史（每个用户最近订单的物化视图）
+from backend.utils.stock_ledger import stock_ledger  # 库存账本（O(1)库存查询、结算页库存预留）
+from backend.utils.session_id import get_session_id  # 会话标识（行为日志、库存预留）
+from backend.utils.flash_sale import flash_sale  # 秒杀模式（内存库存令牌 + 有界准入队列）
+from backend.utils.product_search import start_background as start_product_search  # 商品搜索索引（倒排索引 + BM25，后台构建）
+from backend.utils.purchase_migration import start_background as start_purchase_migration  # 购买记录迁移为订单（后台分块执行，可中断续跑）
+from backend.utils.action_stats import action_stats  # 看板行为统计（写入时增量累加，快照持久化）
+from backend.utils.chart_utils import order_amount_bins  # 订单金额区间统计（按订单表数据版本缓存）
+from backend.utils.export_stream import parse_export_options, export_file_name, iter_export_csv  # 流式CSV导出（分块读取/筛选/gzip）
+from backend.utils.excel_utils import export_table_to_excel  # Excel导出（只写模式工作簿，超过行数上限自动分表）
+from backend.utils.export_jobs import export_jobs, public_job  # 后台导出任务（进度查询、按数据版本缓存生成的文件）
 
-# ---------------------- 关键修复：Matplotlib线程问题（避免GUI冲突）----------------------
-plt.switch_backend('Agg')  # 使用非GUI后端，解决多线程资源冲突
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'Arial Unicode MS', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
 
 # ---------------------- 核心路径配置（保持原结构，优化路径校验）----------------------
 base_dir = os.path.abspath(os.path.dirname(__file__))
 
-# 统一数据目录：ecommerce_system/data
-ECOMMERCE_DATA_DIR = os.path.join(base_dir, 'data')
-USER_ACTIONS_CSV = os.path.join(ECOMMERCE_DATA_DIR, 'user_actions.csv')
-PRODUCTS_CSV = os.path.join(ECOMMERCE_DATA_DIR, 'products.csv')
-FAVORITES_CSV = os.path.join(ECOMMERCE_DATA_DIR, 'user_favorites.csv')
-ORDERS_CSV = os.path.join(ECOMMERCE_DATA_DIR, 'orders.csv')
-USERS_CSV_PATH = os.path.join(ECOMMERCE_DATA_DIR, 'users.csv') 
+# 统一数据目录：ecommerce_system/data（可用环境变量 ECOMMERCE_DATA_DIR 指定，由 backend/config.py 统一解析）
+from backend.config import DATA_DIR, USERS_CSV_PATH
 
 # 模板/静态资源目录配置（确保路径存在）
 template_dir = os.path.join(base_dir, 'frontend', 'templates')
@@ -60,58 +66,55 @@ app.config['TEMPLATES_AUTO_RELOAD'] = True      # 模板自动重载（开发模
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 限制上传文件大小（16MB）
 
 # ---------------------- 目录自动创建（确保必要目录存在）----------------------
-os.makedirs(ECOMMERCE_DATA_DIR, exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(os.path.join(static_dir, 'images'), exist_ok=True)
 os.makedirs(os.path.join(static_dir, 'admin', 'uploads', 'products'), exist_ok=True)
 
 # ---------------------- 登录/注册核心辅助函数（新增）----------------------
 # 修改get_all_users函数，增加更健壮的错误处理
+def _normalize_user(row):
+    """统一用户字段类型（兼容CSV字符串与SQLite数值，缺失值转为默认值）"""
+    user = {k: ('' if v is None or (isinstance(v, float) and pd.isna(v)) else v) for k, v in row.items()}
+    user['user_id'] = str(user.get('user_id', ''))
+    user['username'] = str(user.get('username', ''))
+    user['password'] = str(user.get('password', ''))
+    try:
+        user['balance'] = float(user.get('balance') or 0)
+    except:
+        user['balance'] = 0.0
+        
+    favorites = user.get('favorites')
+    try:
+        user['favorites'] = json.loads(favorites) if isinstance(favorites, str) and favorites else (favorites or [])
+    except:
+        user['favorites'] = []
+        
+    is_admin = user.get('is_admin', False)
+    user['is_admin'] = is_admin.lower() == 'true' if isinstance(is_admin, str) else bool(is_admin)
+    user['phone'] = str(user.get('phone', ''))
+    return user
+
 def get_all_users():
-    """读取users.csv中所有用户数据（增强错误处理）"""
-    users = []
-    if not os.path.exists(USERS_CSV_PATH):
+    """读取所有用户数据（增强错误处理）"""
+    if not get_store().exists('users'):
         print(f"警告：用户数据文件不存在 - {USERS_CSV_PATH}")
-        return users
+        return []
     
     try:
-        with open(USERS_CSV_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            # 验证CSV文件头是否正确
-            required_fields = ['user_id', 'username', 'password', 'phone', 'balance', 'favorites', 'is_admin']
-            if not all(field in reader.fieldnames for field in required_fields):
-                print(f"错误：用户数据文件格式不正确，缺少必要字段")
-                return users
-                
-            for row in reader:
-                # 转换数据类型，增加容错处理
-                try:
-                    row['balance'] = float(row.get('balance', 0))
-                except:
-                    row['balance'] = 0.0
-                    
-                try:
-                    row['favorites'] = eval(row['favorites']) if row.get('favorites') else []
-                except:
-                    row['favorites'] = []
-                    
-                row['is_admin'] = row.get('is_admin', 'false').lower() == 'true'
-                row['phone'] = row.get('phone', '')
-                users.append(row)
-        return users
+        rows = user_index.all()
+        # 验证数据表字段是否正确
+        required_fields = ['user_id', 'username', 'password', 'phone', 'balance', 'favorites', 'is_admin']
+        if rows and not all(field in rows[0] for field in required_fields):
+            print(f"错误：用户数据文件格式不正确，缺少必要字段")
+            return []
+        return [_normalize_user(row) for row in rows]
     except Exception as e:
         print(f"读取用户数据失败：{str(e)}")
         return []
 
 def save_user(user):
-    """保存新用户到users.csv（新增phone字段）"""
-    file_exists = os.path.exists(USERS_CSV_PATH)
-    with open(USERS_CSV_PATH, 'a', encoding='utf-8', newline='') as f:
-        # 字段名新增 phone（必须和表头一致）
-        fieldnames = ['user_id', 'username', 'password', 'phone', 'balance', 'favorites', 'is_admin']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(user)
+    """保存新用户（新增phone字段），同时增量更新用户索引"""
+    user_index.insert(user)
 
 def login_required(f):
     """登录校验装饰器（原有逻辑，补充完整）"""
@@ -141,15 +144,11 @@ def admin_required(f):
 
 # ---------------------- 基础工具函数（修复潜在bug，确保函数定义在调用前）----------------------
 def load_products(category=None):
-    if not os.path.exists(PRODUCTS_CSV):
+    if not get_store().exists('products'):
         create_default_products()
     try:
-        df = pd.read_csv(PRODUCTS_CSV, encoding='utf-8-sig')
-        # 确保product_id为整数类型
-        df['product_id'] = pd.to_numeric(df['product_id'], errors='coerce').fillna(0).astype(int)
-        if category and category != '全部商品':
-            df = df[df['category'] == category]
-        return df.to_dict('records')
+        # 走目录缓存：仅在版本号/文件时间戳变化时重新解析CSV
+        return catalog_cache.get_all(category)
     except Exception as e:
         print(f"加载商品失败：{e}")
         create_default_products()  # 读取失败时重新创建默认商品
@@ -166,7 +165,8 @@ def create_default_products():
         {'product_id': 7, 'name': 'SK-II神仙水', 'category': '美妆护肤', 'price': 1590, 'stock': 90, 'description': 'PITERA™核心成分，调节肌肤水油平衡', 'image': 'sk2.jpg'},
         {'product_id': 8, 'name': 'Nike Air Max', 'category': '服装鞋帽', 'price': 1299, 'stock': 120, 'description': '全掌气垫缓震，网面透气，经典配色', 'image': 'nike_airmax.jpg'},
     ]
-    pd.DataFrame(default_products).to_csv(PRODUCTS_CSV, index=False, encoding='utf-8-sig')
+    get_store().replace_table('products', pd.DataFrame(default_products))
+    catalog_cache.invalidate()
     print("默认商品创建成功")
 
 def get_cart():
@@ -174,15 +174,15 @@ def get_cart():
 
 def get_cart_items():
     cart = get_cart()
-    products = load_products()
+    # 一次批量读取购物车中的所有商品（无法转换为整数的ID自动忽略）
+    products = catalog_cache.get_many(cart.keys())
     cart_items = []
     for pid_str, quantity in cart.items():
-        # 确保pid_str能转换为整数
         try:
             product_id = int(pid_str)
-        except:
+        except (TypeError, ValueError):
             continue
-        product = next((p for p in products if p['product_id'] == product_id), None)
+        product = products.get(product_id)
         if product:
             cart_items.append({
                 'product_id': product['product_id'],
@@ -196,14 +196,8 @@ def get_cart_items():
     return cart_items
 
 def record_user_action(user_id, product_id, action_type, **kwargs):
-    try:
-        product = next((p for p in load_products() if p['product_id'] == int(product_id)), None)
-    except:
-        product = None
-    session_id = session.get('_id')
-    if not session_id:
-        session_id = str(uuid.uuid4())
-        session['_id'] = session_id
+    product = catalog_cache.get(product_id)
+    session_id = get_session_id()
     
     action_data = {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -218,100 +212,54 @@ def record_user_action(user_id, product_id, action_type, **kwargs):
         'total_amount': kwargs.get('total_amount', 0)
     }
     try:
-        df = pd.read_csv(USER_ACTIONS_CSV, encoding='utf-8-sig') if os.path.exists(USER_ACTIONS_CSV) else pd.DataFrame(columns=action_data.keys())
-        new_row = pd.DataFrame([action_data])
-        pd.concat([df, new_row], ignore_index=True).to_csv(USER_ACTIONS_CSV, index=False, encoding='utf-8-sig')
+        # 交给后台写入线程批量追加，请求线程不等待刷盘
+        submit_action(action_data)
     except Exception as e:
         print(f"行为记录失败：{e}")
 
-def fig_to_base64(fig):
-    buffer = BytesIO()
-    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=100)
-    buffer.seek(0)
-    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+def _series(pairs):
+    return {'labels': [label for label, _ in pairs], 'values': [value for _, value in pairs]}
 
-def generate_charts(df):
-    charts = {}
-    try:
-        # 1. 用户行为分布饼图
-        action_counts = df['action_type'].value_counts()
-        fig, ax = plt.subplots(figsize=(6, 6))
-        ax.pie(action_counts.values, labels=action_counts.index, autopct='%1.1f%%', startangle=90)
-        ax.set_title('用户行为分布')
-        charts['action_distribution'] = fig_to_base64(fig)
-        plt.close()
-        
-        # 2. 热门商品TOP5柱状图
-        top_products = df[df['action_type'] == 'view']['product_name'].value_counts().head(5)
-        fig, ax = plt.subplots(figsize=(8, 4))
-        top_products.plot(kind='bar', ax=ax, color='#3498db')
-        ax.set_title('热门商品浏览TOP5')
-        ax.set_xlabel('商品名称')
-        ax.set_ylabel('浏览次数')
-        plt.xticks(rotation=45, ha='right')
-        charts['top_products'] = fig_to_base64(fig)
-        plt.close()
-        
-        # 3. 每日行为趋势折线图
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        daily_actions = df.groupby('date').size()
-        fig, ax = plt.subplots(figsize=(10, 4))
-        daily_actions.plot(kind='line', ax=ax, marker='o', color='#e74c3c')
-        ax.set_title('每日用户行为趋势')
-        ax.set_xlabel('日期')
-        ax.set_ylabel('行为次数')
-        plt.xticks(rotation=45)
-        charts['daily_trend'] = fig_to_base64(fig)
-        plt.close()
-        
-        # 4. 商品分类占比饼图
-        category_counts = df['product_category'].value_counts()
-        fig, ax = plt.subplots(figsize=(6, 6))
-        ax.pie(category_counts.values, labels=category_counts.index, autopct='%1.1f%%', startangle=90)
-        ax.set_title('商品分类访问占比')
-        charts['category_distribution'] = fig_to_base64(fig)
-        plt.close()
-    except Exception as e:
-        print(f"图表生成失败：{e}")
-    return charts
+def build_dashboard_data(summary=None):
+    """看板数据：统计指标 + 各图表的数值序列（由浏览器绘图，不在服务端渲染图片）"""
+    summary = summary or action_stats.get_summary()
+    by_count = lambda counts: sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    
+    # 热门商品TOP5：按商品名合计浏览次数
+    view_counts = defaultdict(int)
+    for product in summary['products'].values():
+        if product['view']:
+            view_counts[product['name']] += product['view']
+    
+    return {
+        'total_users': summary['total_users'],
+        'total_actions': summary['total_actions'],
+        'total_purchases': summary['total_purchases'],
+        'total_revenue': summary['total_revenue'],
+        'conversion_rates': summary['conversion_rates'],
+        'charts': {
+            'action_distribution': _series(by_count(summary['by_type'])),
+            'top_products': _series(by_count(view_counts)[:5]),
+            'daily_trend': _series(summary['by_day'].items()),
+            'category_distribution': _series(by_count(summary['by_category'])),
+            'order_amount': order_amount_bins(),
+        }
+    }
 
 # ---------------------- 收藏功能核心函数（确保定义在API调用前）----------------------
-def init_favorites_file():
-    if not os.path.exists(FAVORITES_CSV):
-        try:
-            with open(FAVORITES_CSV, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['user_id', 'product_id', 'add_time'])
-            print(f"收藏文件初始化成功：{FAVORITES_CSV}")
-        except Exception as e:
-            print(f"初始化收藏文件失败：{str(e)}")
-
 def add_user_favorite(user_id, product_id):
-    init_favorites_file()
+    store = get_store()
     try:
-        existing_records = []
-        with open(FAVORITES_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            try:
-                header = next(reader)
-            except StopIteration:
-                header = ['user_id', 'product_id', 'add_time']
-            existing_records.append(header)
+        with store.locked('user_favorites'):
+            if store.find_one('user_favorites', user_id=user_id, product_id=int(product_id)):
+                print(f"已收藏：用户{user_id}，商品{product_id}")
+                return False
             
-            is_already_favorite = False
-            for row in reader:
-                if len(row) >= 2 and row[0] == user_id and row[1] == str(product_id):
-                    is_already_favorite = True
-                existing_records.append(row)
-        
-        if is_already_favorite:
-            print(f"已收藏：用户{user_id}，商品{product_id}")
-            return False
-        
-        with open(FAVORITES_CSV, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerows(existing_records)
-            writer.writerow([user_id, product_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
+            store.insert('user_favorites', {
+                'user_id': user_id,
+                'product_id': product_id,
+                'add_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
         print(f"收藏成功：用户{user_id}，商品{product_id}")
         return True
     except Exception as e:
@@ -319,31 +267,10 @@ def add_user_favorite(user_id, product_id):
         return False
 
 def remove_user_favorite(user_id, product_id):
-    init_favorites_file()
     try:
-        remaining_records = []
-        has_record = False
-        with open(FAVORITES_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            try:
-                header = next(reader)
-            except StopIteration:
-                header = ['user_id', 'product_id', 'add_time']
-            remaining_records.append(header)
-            
-            for row in reader:
-                if len(row) >= 2 and row[0] == user_id and row[1] == str(product_id):
-                    has_record = True
-                else:
-                    remaining_records.append(row)
-        
-        if not has_record:
+        if not get_store().delete('user_favorites', {'user_id': user_id, 'product_id': int(product_id)}):
             print(f"未收藏：用户{user_id}，商品{product_id}")
             return False
-        
-        with open(FAVORITES_CSV, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerows(remaining_records)
         print(f"取消收藏成功：用户{user_id}，商品{product_id}")
         return True
     except Exception as e:
@@ -351,22 +278,12 @@ def remove_user_favorite(user_id, product_id):
         return False
 
 def load_user_favorites(user_id):
-    init_favorites_file()
     favorite_ids = []
-    print(f"\n===== 加载收藏：目标文件路径 = {FAVORITES_CSV} =====")
+    print(f"\n===== 加载收藏：用户 {user_id}（存储引擎：{get_store().engine}） =====")
     try:
-        with open(FAVORITES_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            try:
-                header = next(reader)
-            except StopIteration:
-                header = []
-            print(f"收藏文件表头：{header}")
-            print("收藏文件所有记录：")
-            for row in reader:
-                print(f"  - {row}")
-                if len(row) >= 2 and row[0] == user_id and row[1].isdigit():
-                    favorite_ids.append(int(row[1]))
+        for row in get_store().find('user_favorites', user_id=user_id):
+            if pd.notna(row.get('product_id')):
+                favorite_ids.append(int(row['product_id']))
         
         print(f"✅ 用户{user_id}的收藏ID列表：{favorite_ids}")
         return favorite_ids
@@ -374,83 +291,6 @@ def load_user_favorites(user_id):
         print(f"❌ 加载收藏失败：{str(e)}")
         return []
 
-# ---------------------- 订单迁移函数（确保定义在调用前）----------------------
-def migrate_purchase_to_orders():
-    import pandas as pd
-    import os
-    import json
-    from datetime import datetime
-
-    # 打印核心路径（确认文件位置）
-    print("\n===== 订单迁移开始 =====")
-    print(f"• user_actions.csv路径：{USER_ACTIONS_CSV}")
-    print(f"• orders.csv目标路径：{ORDERS_CSV}")
-    print(f"• user_actions.csv是否存在：{os.path.exists(USER_ACTIONS_CSV)}")
-
-    # 1. 读取user_actions.csv（先读全量数据，不筛选）
-    try:
-        all_actions = pd.read_csv(USER_ACTIONS_CSV, encoding='utf-8-sig')
-        print(f"• 读取到user_actions.csv共{len(all_actions)}条记录")
-        print(f"• user_actions.csv的列名：{all_actions.columns.tolist()}")  # 确认字段名
-        
-        # 筛选purchase行为（严格匹配字段名）
-        if 'action_type' not in all_actions.columns:
-            print("❌ 错误：user_actions.csv缺少'action_type'列")
-            return
-        purchase_records = all_actions[all_actions['action_type'] == 'purchase'].copy()
-        print(f"• 筛选出purchase记录数：{len(purchase_records)}")
-        
-        # 打印前2条purchase记录，确认数据格式
-        if len(purchase_records) > 0:
-            print("• 前2条purchase记录示例：")
-            print(purchase_records.head(2))
-    except Exception as e:
-        print(f"❌ 读取user_actions.csv失败：{str(e)}")
-        return
-
-    # 2. 必须有13条purchase记录才继续（无则跳过，避免报错）
-    if len(purchase_records) != 13:
-        print(f"⚠️  警告：仅找到{len(purchase_records)}条purchase记录（需要13条），跳过迁移")
-        return
-
-    # 3. 逐行处理13条记录（打印每条进度）
-    migrated_orders = []
-    order_id_prefix = int(datetime.now().timestamp())  # 唯一ID前缀
-    for idx, row in purchase_records.iterrows():
-        try:
-            # 生成订单ID
-            order_id = f"USER_ORDER_{order_id_prefix}_{idx+1:03d}"
-            
-            # 提取字段（严格对应你的user_actions.csv列名）
-            order_data = {
-                'order_id': order_id,
-                'user_id': row['user_id'],
-                'username': row.get('username', '未知用户'),
-                'total_amount': round(float(row['total_amount']), 2),
-                'status': '已支付',
-                'create_time': row['timestamp'],  # 直接用原时间
-                'items': json.dumps([{  # 单商品订单
-                    'product_id': int(row['product_id']),
-                    'name': row['product_name'],
-                    'image': f"{row['product_id']}.jpg",  # 图片名=商品ID
-                    'quantity': int(row['quantity']),
-                    'price': float(row['total_amount'])
-                }])
-            }
-            migrated_orders.append(order_data)
-            print(f"✅ 处理第{idx+1}条：订单ID={order_id}，商品={row['product_name']}")
-        except Exception as e:
-            print(f"❌ 处理第{idx+1}条失败：{str(e)}")
-
-    # 4. 写入orders.csv（覆盖旧文件）
-    if migrated_orders:
-        orders_df = pd.DataFrame(migrated_orders)
-        orders_df.to_csv(ORDERS_CSV, index=False, encoding='utf-8-sig')
-        print(f"\n✅ 迁移完成：{len(migrated_orders)}条订单已写入orders.csv")
-    else:
-        print("❌ 无订单可写入")
-    print("===== 订单迁移结束 =====\n")
-
 # ---------------------- 所有路由定义（统一注册到同一个app实例，顺序无关）----------------------
 # 1. 登录/注册路由（保留原模板路径，适配前端）
 @app.route('/login')
@@ -471,7 +311,7 @@ def index():
 def products():
     category = request.args.get('category', '全部商品')
     all_products = load_products(category=category)
-    all_categories = ['全部商品'] + list(set(p['category'] for p in load_products()))
+    all_categories = ['全部商品'] + catalog_cache.get_categories()
     return render_template('user/products.html', 
                          products=all_products,
                          current_category=category,
@@ -479,7 +319,7 @@ def products():
 
 @app.route('/product/<int:product_id>')
 def product_detail(product_id):
-    product = next((p for p in load_products() if p['product_id'] == product_id), None)
+    product = catalog_cache.get(product_id)
     if not product:
         return redirect(url_for('products'))
     record_user_action(
@@ -510,6 +350,13 @@ def checkout():
     total_quantity = sum(item['quantity'] for item in cart_items)
     total_amount = sum(item['subtotal'] for item in cart_items)
     
+    # 为本会话预留购物车中的商品（有效期内其他会话无法买走），库存不足时提示
+    stock_warning = ''
+    shortages = stock_ledger.reserve(get_session_id(), {item['product_id']: item['quantity'] for item in cart_items})
+    if shortages:
+        stock_warning = '、'.join(f"《{item['name']}》仅剩{shortages[item['product_id']]}件"
+                                  for item in cart_items if item['product_id'] in shortages) + '，请修改购物车数量'
+    
     address = session.get('default_address', {
         'name': session.get('username', '默认收货人'),
         'phone': '13800138000',
@@ -522,7 +369,8 @@ def checkout():
                           cart_items=cart_items,
                           total_quantity=total_quantity,
                           total_amount=total_amount,
-                          address=address)
+                          address=address,
+                          stock_warning=stock_warning)
 
 # 4. 个人中心相关路由
 # 修改用户中心路由，增加登录验证
@@ -540,10 +388,12 @@ def profile():
 
     # 统计用户行为（仅当前登录用户）
     stats = {'view_count': 0, 'cart_count': 0, 'purchase_count': 0}
-    if os.path.exists(USER_ACTIONS_CSV):
+    flush_actions()  # 确保缓冲中的行为记录已落盘
+    if get_store().exists('user_actions'):
         try:
-            df = pd.read_csv(USER_ACTIONS_CSV, encoding='utf-8-sig')
-            user_actions = df[df['user_id'] == session['user_id']]  # 只统计当前用户
+            # 只统计当前用户（SQLite引擎按 user_id 索引查询）
+            user_actions = pd.DataFrame(get_store().find('user_actions', user_id=session['user_id']),
+                                        columns=['action_type'])
             stats = {
                 'view_count': len(user_actions[user_actions['action_type'] == 'view']),
                 'cart_count': len(user_actions[user_actions['action_type'] == 'add_to_cart']),
@@ -558,8 +408,6 @@ def profile():
 def profile_orders():
     user_id = session.get('user_id', 'anonymous')
     orders = []
-    all_products = load_products()
-    product_map = {p['product_id']: p for p in all_products}
     
     user_info = {
         'user_id': user_id,
@@ -569,68 +417,11 @@ def profile_orders():
         'avatar': session.get('avatar', 'default_avatar.png')
     }
 
-    if os.path.exists(USER_ACTIONS_CSV):
-        try:
-            df = pd.read_csv(USER_ACTIONS_CSV, encoding='utf-8-sig')
-            purchase_actions = df[(df['user_id'] == user_id) & (df['action_type'] == 'purchase')].copy()
-            if not purchase_actions.empty:
-                purchase_actions['product_id'] = pd.to_numeric(purchase_actions['product_id'], errors='coerce').fillna(0).astype(int)
-                order_groups = purchase_actions.groupby('timestamp')
-                order_id = 2000
-                for timestamp, group in order_groups:
-                    order_items = []
-                    for _, action in group.iterrows():
-                        product = product_map.get(action['product_id'], {})
-                        order_items.append({
-                            'name': product.get('name', '未知商品'),
-                            'image': product.get('image', 'default.jpg'),
-                            'quantity': int(action.get('quantity', 1)),
-                            'price': product.get('price', 0)
-                        })
-                    orders.append({
-                        'order_id': f'USER_ORDER_{order_id}',
-                        'create_time': timestamp,
-                        'total_amount': round(group['total_amount'].sum(), 2),
-                        'status': '已支付',
-                        'items': order_items,
-                        'product_count': len(order_items)
-                    })
-                    order_id += 1
-        except Exception as e:
-            print(f"读取用户订单失败：{e}")
-
-    if not orders:
-        orders = [
-            {
-                'order_id': 'USER_ORDER_2001',
-                'create_time': '2025-11-20 15:30:00',
-                'total_amount': 9998.00,
-                'status': '已支付',
-                'product_count': 2,
-                'items': [
-                    {'name': 'iPhone 15 Pro', 'image': 'iphone15.jpg', 'quantity': 1, 'price': 7999},
-                    {'name': 'AirPods Pro 2', 'image': 'airpods.jpg', 'quantity': 1, 'price': 1999}
-                ]
-            }
-        ]
-
-    fixed_orders = []
-    for order in orders:
-        if not isinstance(order, dict):
-            order = {}
-        order_items = order.get('items', [])
-        if not isinstance(order_items, list):
-            order_items = []
-        fixed_order = {
-            'order_id': order.get('order_id', f'ORDER_{len(fixed_orders)+1}'),
-            'create_time': order.get('create_time', ''),
-            'total_amount': order.get('total_amount', 0.00),
-            'status': order.get('status', '未知状态'),
-            'product_count': len(order_items),
-            'items': order_items
-        }
-        fixed_orders.append(fixed_order)
-    orders = fixed_orders
+    # 从订单历史视图读取当前用户最近的订单（最新在前；命中时不读取订单表）
+    try:
+        orders = order_history.get(user_id)
+    except Exception as e:
+        print(f"读取用户订单失败：{e}")
 
     return render_template('user/profile/orders.html', orders=orders, user_info=user_info)
 
@@ -642,8 +433,9 @@ def profile_favorites():
         return redirect(url_for('index', msg='请先登录查看收藏'))
     
     favorite_ids = load_user_favorites(user_id)
-    all_products = load_products()
-    favorite_products = [p for p in all_products if p['product_id'] in favorite_ids]
+    if not get_store().exists('products'):
+        create_default_products()
+    favorite_products = list(catalog_cache.get_many(favorite_ids).values())
     
     user_info = {
         'user_id': user_id,
@@ -683,31 +475,24 @@ def profile_recharge():
 def admin_dashboard():
     total_products = len(load_products())
     stats = {'total_products': total_products}
-    charts = {}
+    flush_actions()  # 确保缓冲中的行为记录已落盘
     
-    if not os.path.exists(USER_ACTIONS_CSV):
+    store = get_store()
+    if store.is_empty('user_actions'):
         return render_template('admin/dashboard.html', 
                              has_data=False,
                              message="暂无用户行为数据，请先在前台进行操作",
-                             stats=stats,
-                             charts=charts)
+                             stats=stats)
     
+    # 图表数据由页面通过 /admin/api/dashboard_data 获取并在浏览器中绘制
     try:
-        df = pd.read_csv(USER_ACTIONS_CSV, encoding='utf-8-sig')
-        total_users = df['user_id'].nunique()
-        total_actions = len(df)
-        total_purchases = len(df[df['action_type'] == 'purchase'])
-        total_revenue = df[df['action_type'] == 'purchase']['total_amount'].sum()
-        
-        views = len(df[df['action_type'] == 'view'])
-        carts = len(df[df['action_type'] == 'add_to_cart'])
-        conversion_rates = {
-            'view_to_cart': round(carts/views*100, 2) if views > 0 else 0,
-            'cart_to_purchase': round(total_purchases/carts*100, 2) if carts > 0 else 0,
-            'view_to_purchase': round(total_purchases/views*100, 2) if views > 0 else 0
-        }
-        
-        charts = generate_charts(df)
+        # 读取物化统计（行为写入时已增量累加，这里只补读尚未统计的新记录）
+        summary = action_stats.get_summary()
+        total_users = summary['total_users']
+        total_actions = summary['total_actions']
+        total_purchases = summary['total_purchases']
+        total_revenue = summary['total_revenue']
+        conversion_rates = summary['conversion_rates']
     except Exception as e:
         print(f"后台数据统计失败：{e}")
         total_users = 0
@@ -715,6 +500,7 @@ def admin_dashboard():
         total_purchases = 0
         total_revenue = 0
         conversion_rates = {'view_to_cart': 0, 'cart_to_purchase': 0, 'view_to_purchase': 0}
+    stats.update(total_users=total_users, total_sales=total_revenue)
     
     return render_template('admin/dashboard.html',
                          has_data=True,
@@ -723,14 +509,26 @@ def admin_dashboard():
                          total_purchases=total_purchases,
                          total_revenue=total_revenue,
                          conversion_rates=conversion_rates,
-                         stats=stats,
-                         charts=charts)
+                         stats=stats)
+
+@app.route('/admin/api/dashboard_data')
+@admin_required
+def dashboard_data():
+    """看板图表的数值序列：行为分布、热门商品、每日趋势、分类占比、订单金额区间（JSON，供浏览器绘图）"""
+    flush_actions()
+    if get_store().is_empty('user_actions'):
+        return jsonify({'success': False, 'msg': '暂无用户行为数据'})
+    try:
+        return jsonify({'success': True, 'data': build_dashboard_data()})
+    except Exception as e:
+        print(f"看板数据统计失败：{e}")
+        return jsonify({'success': False, 'msg': f'看板数据统计失败：{str(e)}'})
 
 @app.route('/admin/product_manage')
 def product_manage():
     category = request.args.get('category', '全部商品')
     products = load_products(category=category)
-    all_categories = ['全部商品'] + list(set(p['category'] for p in load_products()))
+    all_categories = ['全部商品'] + catalog_cache.get_categories()
     return render_template('admin/product_manage.html', 
                          products=products,
                          current_category=category,
@@ -741,10 +539,10 @@ def product_manage():
 @admin_required  # 再校验管理员权限
 def user_manage():
     users = []
-    if os.path.exists(USERS_CSV_PATH):
+    if get_store().exists('users'):
         try:
-            # 读取CSV时包含phone字段（如果CSV已有phone列）
-            df = pd.read_csv(USERS_CSV_PATH, encoding='utf-8-sig')
+            # 读取用户表时包含phone字段（如果已有phone列）
+            df = get_store().read_table('users')
             for _, row in df.iterrows():
                 if row['user_id'] != 'anonymous':
                     users.append({
@@ -765,86 +563,41 @@ def user_manage():
 
 @app.route('/admin/order_manage')
 def order_manage():
-    orders = []
-    all_products = load_products()
-    product_map = {p['product_id']: p for p in all_products}
+    """订单管理：按下单时间倒序游标分页（每页只读取一页订单），支持 status（状态）、user（用户名或用户ID）筛选"""
+    status = request.args.get('status', '').strip()
+    user = request.args.get('user', '').strip()
+    cursor = request.args.get('cursor') or None
+    page_size = request.args.get('page_size', type=int)
 
-    # 关键优化：添加详细日志，方便排查问题
-    print("\n===== 后台订单读取日志 =====")
-    print(f"1. 读取的订单文件路径：{ORDERS_CSV}")
-    print(f"2. 订单文件是否存在：{os.path.exists(ORDERS_CSV)}")
+    user_id = None
+    if user:
+        matched = user_index.get_by_username(user)
+        user_id = matched['user_id'] if matched else user
 
-    # 读取orders.csv（增强容错性）
-    if os.path.exists(ORDERS_CSV):
+    orders = []
+    next_cursor = None
+    if get_store().exists('orders'):
         try:
-            # 读取订单文件，添加 dtype 确保字段类型正确
-            order_df = pd.read_csv(
-                ORDERS_CSV,
-                encoding='utf-8-sig',
-                dtype={
-                    'order_id': str,
-                    'user_id': str,
-                    'username': str,
-                    'total_amount': float,
-                    'status': str,
-                    'create_time': str,
-                    'items': str
-                }
-            )
-            print(f"3. 成功读取订单文件，共{len(order_df)}条记录")
-
-            # 遍历所有订单，增强字段容错
-            for idx, row in order_df.iterrows():
-                try:
-                    # 解析订单项（捕获JSON解析错误）
-                    if pd.notna(row['items']) and row['items'].strip():
-                        items = json.loads(row['items'])
-                    else:
-                        items = []
-                        print(f"⚠️  第{idx+1}条订单（{row['order_id']}）的items字段为空，跳过")
-                        continue
-
-                    # 构造订单数据（所有字段添加默认值，避免空值报错）
-                    order = {
-                        'order_id': row.get('order_id', f'UNKNOWN_{idx}'),  # 订单ID默认值
-                        'user_id': row.get('user_id', 'unknown_user'),     # 用户ID默认值
-                        'username': row.get('username', '未知用户'),       # 用户名默认值
-                        'total_amount': float(row.get('total_amount', 0.0)),  # 金额默认0
-                        'status': row.get('status', '待支付'),             # 状态默认值
-                        'create_time': row.get('create_time', '2025-01-01 00:00:00'),  # 时间默认值
-                        'product_count': len(items),
-                        'items': items
-                    }
-                    orders.append(order)
-                    print(f"✅ 加载第{idx+1}条订单：{order['order_id']}（用户：{order['username']}）")
-
-                except json.JSONDecodeError:
-                    print(f"❌ 第{idx+1}条订单（{row['order_id']}）的items字段格式错误，跳过")
-                except Exception as e:
-                    print(f"❌ 第{idx+1}条订单（{row['order_id']}）加载失败：{str(e)}，跳过")
-
-            # 排序优化：处理时间格式异常，避免排序崩溃
-            try:
-                # 按时间倒序（最新订单在前），异常时间排最后
-                orders.sort(
-                    key=lambda x: pd.to_datetime(x['create_time'], errors='coerce'),
-                    reverse=True
-                )
-                print(f"4. 订单排序完成，共加载{len(orders)}条有效订单")
-            except Exception as e:
-                print(f"⚠️  订单排序失败：{str(e)}，使用原始顺序")
+            page, next_cursor = OrderModel.get_orders_page(page_size, cursor=cursor, status=status or None, user_id=user_id)
+        except ValueError:
+            # 游标无效（如被手动修改）：回到第一页
+            page, next_cursor = OrderModel.get_orders_page(page_size, status=status or None, user_id=user_id)
+            cursor = None
+        for row in attach_items(page):
+            items = row['items']
+            orders.append({
+                'order_id': row.get('order_id'),
+                'user_id': row.get('user_id') or 'unknown_user',
+                'username': row.get('username') or '未知用户',
+                'total_amount': float(row.get('total_amount') or 0.0),
+                'status': row.get('status') or '待支付',
+                'create_time': row.get('create_time') or '',
+                'product_count': len(items),
+                'items': items
+            })
 
-        except FileNotFoundError:
-            print(f"❌ 订单文件不存在：{ORDERS_CSV}")
-        except Exception as e:
-            print(f"❌ 读取订单文件失败：{str(e)}")
-            orders = []
-    else:
-        print(f"❌ 订单文件不存在：{ORDERS_CSV}")
-
-    # 若无有效订单，显示演示数据
-    if not orders:
-        print("⚠️  无有效订单，显示演示数据")
+    # 无任何订单（未筛选的第一页为空）时显示演示数据
+    if not orders and not (cursor or status or user):
         orders = [
             {
                 'order_id': 'USER_ORDER_DEMO_001',
@@ -860,8 +613,10 @@ def order_manage():
             }
         ]
 
-    print("===== 后台订单读取结束 =====\n")
-    return render_template('admin/order_manage.html', orders=orders)
+    # 翻页链接保留当前筛选条件
+    filters = {k: v for k, v in {'status': status, 'user': user, 'page_size': page_size}.items() if v}
+    return render_template('admin/order_manage.html', orders=orders, filters=filters,
+                           next_cursor=next_cursor, is_first_page=not cursor)
 
 @app.route('/admin/data_export')
 def data_export():
@@ -869,48 +624,109 @@ def data_export():
         {'key': 'products', 'name': '商品数据', 'file_name': '商品数据_2025.csv', 'desc': '包含所有商品的名称、分类、价格等信息'},
         {'key': 'user_actions', 'name': '用户行为数据', 'file_name': '用户行为数据_2025.csv', 'desc': '包含用户浏览、加购、购买等行为记录'},
         {'key': 'orders', 'name': '订单数据', 'file_name': '订单数据_2025.csv', 'desc': '包含所有订单的用户、金额、状态等信息'},
+        {'key': 'order_items', 'name': '订单明细数据', 'file_name': '订单明细数据_2025.csv', 'desc': '包含每个订单的商品、单价、数量'},
         {'key': 'users', 'name': '用户数据', 'file_name': '用户数据_2025.csv', 'desc': '包含所有注册用户的基本信息'}  # 新增用户数据导出
     ]
     return render_template('admin/data_export.html', export_types=export_types)
 
 @app.route('/admin/export_file/<string:data_key>')
+@admin_required
 def export_file(data_key):
-    export_config = {
-        'products': {
-            'path': PRODUCTS_CSV,
-            'default_data': [{'product_id': '', 'name': '', 'category': '', 'price': '', 'stock': '', 'description': '', 'image': ''}]
-        },
-        'user_actions': {
-            'path': USER_ACTIONS_CSV,
-            'default_data': [{'timestamp': '', 'user_id': '', 'username': '', 'product_id': '', 'product_name': '', 'product_category': '', 'action_type': '', 'session_id': '', 'quantity': '', 'total_amount': ''}]
-        },
-        'orders': {
-            'path': ORDERS_CSV,
-            'default_data': [{'order_id': '', 'user_id': '', 'username': '', 'total_amount': '', 'status': '', 'create_time': '', 'product_count': ''}]
-        },
-        'users': {  # 新增用户数据导出配置
-            'path': USERS_CSV_PATH,
-            'default_data': [{'user_id': '', 'username': '', 'password': '', 'balance': '', 'favorites': '', 'is_admin': ''}]
-        }
-    }
-    
-    if data_key not in export_config:
-        return jsonify({'success': False, 'msg': '不支持的数据类型'}), 400
-    
-    config = export_config[data_key]
-    file_path = config['path']
+    """流式导出CSV：按块读取、筛选并输出，支持 start_date/end_date、user_id、status、action_type、category、
+    columns（逗号分隔的列名）与 gzip=1（压缩下载）；format=xlsx 时按块写入只写模式的Excel工作簿后下载"""
+    try:
+        options = parse_export_options(data_key, request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'msg': str(e)}), 400
     
-    if not os.path.exists(file_path):
-        pd.DataFrame(config['default_data']).to_csv(file_path, index=False, encoding='utf-8-sig')
+    if data_key == 'user_actions':
+        flush_actions()
     
-    return send_file(
-        file_path,
-        as_attachment=True,
-        download_name=export_config[data_key]['file_name'],
-        mimetype='text/csv; charset=utf-8'
+    file_name = export_file_name(data_key, options)
+    if options['format'] == 'xlsx':
+        return export_table_to_excel(data_key, options, file_name)
+    return Response(
+        stream_with_context(iter_export_csv(data_key, options)),
+        mimetype='application/gzip' if options['gzip'] else 'text/csv; charset=utf-8',
+        headers={'Content-Disposition': f"attachment; filename*=UTF-8''{quote(file_name)}"}
     )
 
+@app.route('/admin/api/export_jobs', methods=['POST'])
+@admin_required
+def create_export_job():
+    """提交后台导出任务：data_type 为 products/orders/order_items/users/user_actions 或 all（五个工作表的Excel），
+    其余参数同 /admin/export_file；返回任务ID，之后轮询进度并在完成后下载"""
+    data = request.get_json(silent=True) or request.form.to_dict() or request.args.to_dict()
+    try:
+        job = export_jobs.submit(data.get('data_type'), data)
+    except ValueError as e:
+        return jsonify({'success': False, 'msg': str(e)}), 400
+    return jsonify({'success': True, 'msg': '导出任务已提交', 'data': public_job(job)})
+
+@app.route('/admin/api/export_jobs/<string:job_id>')
+@admin_required
+def export_job_status(job_id):
+    """导出任务进度"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'msg': '导出任务不存在'}), 404
+    return jsonify({'success': True, 'data': public_job(job)})
+
+@app.route('/admin/api/export_jobs/<string:job_id>/download')
+@admin_required
+def export_job_download(job_id):
+    """下载已完成的导出文件"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'msg': '导出任务不存在'}), 404
+    if job['status'] != 'done':
+        return jsonify({'success': False, 'msg': '导出尚未完成'}), 409
+    if not os.path.exists(job['artifact']):
+        return jsonify({'success': False, 'msg': '导出文件已过期，请重新导出'}), 410
+    mimetype = 'application/gzip' if job['artifact'].endswith('.gz') else (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' if job['format'] == 'xlsx' else 'text/csv; charset=utf-8')
+    return send_file(job['artifact'], as_attachment=True, download_name=job['file_name'], mimetype=mimetype)
+
+@app.route('/admin/api/action_log_metrics')
+@admin_required
+def action_log_metrics():
+    """行为日志写入器指标（队列深度、丢弃数、刷盘耗时）"""
+    return jsonify({'success': True, 'data': get_action_log_metrics()})
+
+@app.route('/admin/api/flash_sale', methods=['GET', 'POST'])
+@admin_required
+def flash_sale_admin():
+    """秒杀模式：GET 查看剩余令牌与排队情况；POST {"product_ids": [...]} 开启（按当前可售库存发放令牌），
+    {"product_ids": [...], "stop": true} 关闭指定商品，{"stop": true} 全部关闭"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            product_ids = [int(pid) for pid in data.get('product_ids') or []]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'msg': '商品ID无效'}), 400
+        if data.get('stop'):
+            flash_sale.stop(product_ids or None)
+        else:
+            missing = [pid for pid in product_ids if not catalog_cache.exists(pid)]
+            if not product_ids or missing:
+                return jsonify({'success': False, 'msg': f'商品不存在：{missing}' if missing else '请指定商品ID'}), 400
+            flash_sale.start(product_ids)
+    return jsonify({'success': True, 'data': flash_sale.status()})
+
 # ---------------------- API接口定义 ----------------------
+# 商品搜索API
+@app.route('/api/products/search', methods=['GET'])
+def api_search_products():
+    """商品搜索：q 为关键词（匹配名称、分类、描述），limit 为返回条数，category 为分类筛选；按相关度从高到低返回"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'msg': '请输入搜索关键词'}), 400
+    if not get_store().exists('products'):
+        create_default_products()
+    products = ProductModel.search_products(query, limit=request.args.get('limit', type=int),
+                                            category=request.args.get('category') or None)
+    return jsonify({'success': True, 'data': products, 'count': len(products)})
+
 # 购物车相关API
 @app.route('/api/add_to_cart', methods=['POST'])
 def api_add_to_cart():
@@ -986,11 +802,9 @@ def api_update_cart():
         if pid_str not in cart:
             return jsonify({'success': False, 'msg': '商品不在购物车中'})
         
-        products = load_products()
-        product = next((p for p in products if str(p['product_id']) == pid_str), None)
-        if not product:
+        if not catalog_cache.exists(pid_str):
             return jsonify({'success': False, 'msg': '商品不存在'})
-        if quantity > product['stock']:
+        if quantity > stock_ledger.available(pid_str, get_session_id()):
             return jsonify({'success': False, 'msg': '库存不足'})
         
         cart[pid_str] = quantity
@@ -1042,17 +856,7 @@ def api_register():
     if len(password) < 6 or len(password) > 16 or not re.search(r'\d', password) or not re.search(r'[a-zA-Z]', password):
         return jsonify({"success": False, "msg": "密码需6-16位，含字母和数字"})
 
-    # 检查用户是否已存在（用户名/手机号/phone重复）
-    users = get_all_users()
-    for user in users:
-        if user['username'] == username:
-            return jsonify({"success": False, "msg": "用户名已被注册"})
-        if user['phone'] == phone:
-            return jsonify({"success": False, "msg": "手机号已被注册"})
-        if user['user_id'] == phone:  # 兼容旧逻辑：user_id曾用手机号
-            return jsonify({"success": False, "msg": "手机号已被注册"})
-
-    # 密码加密（核心修改：明文→哈希）
+    # 密码加密（核心修改：明文→哈希；在加锁前完成，避免慢哈希占用用户表锁）
     password_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt()
     hashed_password = bcrypt.hashpw(password_bytes, salt).decode('utf-8')  # 转为字符串存储
@@ -1068,7 +872,17 @@ def api_register():
         'is_admin': False  # 新用户默认非管理员
     }
 
-    save_user(new_user)
+    # 查重与写入在同一把锁内，避免并发注册出现重复用户
+    with get_store().locked('users'):
+        # 检查用户是否已存在（用户名/手机号/phone重复，走用户索引）
+        if user_index.get_by_username(username):
+            return jsonify({"success": False, "msg": "用户名已被注册"})
+        if user_index.get_by_phone(phone):
+            return jsonify({"success": False, "msg": "手机号已被注册"})
+        if user_index.get(phone):  # 兼容旧逻辑：user_id曾用手机号
+            return jsonify({"success": False, "msg": "手机号已被注册"})
+
+        save_user(new_user)
     return jsonify({"success": True, "msg": "注册成功，即将跳转到登录页"})
 
 # 修改登录API，增加完整的异常处理
@@ -1088,25 +902,15 @@ def api_login():
             return jsonify({"success": False, "msg": "请填写完整信息"})
 
         # 验证用户数据文件是否存在
-        if not os.path.exists(USERS_CSV_PATH):
+        if not get_store().exists('users'):
             return jsonify({"success": False, "msg": "用户数据文件不存在，请先注册"})
 
         # 读取用户数据
-        users = get_all_users()
-        if not users:
+        if not user_index.count():
             return jsonify({"success": False, "msg": "暂无注册用户，请先注册"})
 
-        # 查找匹配的用户
-        for user in users:
-            # 匹配条件：user_id/用户名/手机号 任一匹配
-            match_condition = (
-                user['user_id'] == login_id 
-                or user['username'] == login_id 
-                or user['phone'] == login_id
-            )
-            if not match_condition:
-                continue
-
+        # 查找匹配的用户（匹配条件：user_id/用户名/手机号 任一匹配，走用户索引）
+        for user in map(_normalize_user, user_index.find_login(login_id)):
             # 密码验证
             try:
                 password_bytes = password.encode('utf-8')
@@ -1149,70 +953,42 @@ def api_purchase():
         if not cart_items:
             return jsonify({'success': False, 'msg': '购物车为空'})
         
-        total_amount = sum(item['subtotal'] for item in cart_items)
         user_id = session.get('user_id', 'anonymous')
         username = session.get('username', '匿名用户')  # 获取当前登录用户名
         
-        print(f"当前操作的商品文件：{PRODUCTS_CSV}")
+        # 秒杀商品：先领取内存中的库存令牌，售罄时直接返回（不读写数据文件）
+        claim = None
+        quantities = {item['product_id']: item['quantity'] for item in cart_items}
+        if flash_sale.covers(quantities):
+            claim = flash_sale.claim(quantities)
+            if claim is None:
+                return jsonify({'success': False, 'msg': '秒杀商品已售罄'})
         
-        def load_products_abs():
-            if not os.path.exists(PRODUCTS_CSV):
-                create_default_products()
-            df = pd.read_csv(PRODUCTS_CSV, encoding='utf-8-sig')
-            df['product_id'] = pd.to_numeric(df['product_id'], errors='coerce').fillna(0).astype(int)
-            return df.to_dict('records')
+        if not get_store().exists('products'):
+            create_default_products()
         
-        products = load_products_abs()
-        
-        # 库存校验与扣减（原逻辑保留）
-        for item in cart_items:
-            product = next((p for p in products if p['product_id'] == item['product_id']), None)
-            if not product:
-                return jsonify({'success': False, 'msg': f'商品《{item["name"]}》不存在'})
-            if product['stock'] < item['quantity']:
-                return jsonify({'success': False, 'msg': f'商品《{item["name"]}》库存不足，仅剩{product["stock"]}件'})
-        
-        for item in cart_items:
-            for p in products:
-                if p['product_id'] == item['product_id']:
-                    p['stock'] -= item['quantity']
-                    break
-        
-        pd.DataFrame(products).to_csv(
-            PRODUCTS_CSV,
-            index=False,
-            encoding='utf-8-sig',
-            mode='w'
-        )
-        print("库存更新成功！")
-        
-        # 构造订单数据并写入orders.csv
-        order_id = f"USER_ORDER_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:4]}"
-        create_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        order_data = {
-            'order_id': order_id,
-            'user_id': user_id,
-            'username': username,
-            'total_amount': total_amount,
-            'status': '已支付',
-            'create_time': create_time,
-            'items': json.dumps([{
-                'product_id': item['product_id'],
-                'name': item['name'],
-                'image': item['image'],
-                'quantity': item['quantity'],
-                'price': item['price']
-            } for item in cart_items])
-        }
-        
-        if os.path.exists(ORDERS_CSV):
-            order_df = pd.read_csv(ORDERS_CSV, encoding='utf-8-sig')
-            new_order_df = pd.DataFrame([order_data])
-            order_df = pd.concat([order_df, new_order_df], ignore_index=True)
-        else:
-            order_df = pd.DataFrame([order_data])
-        order_df.to_csv(ORDERS_CSV, index=False, encoding='utf-8-sig')
-        print(f"订单{order_id}已写入文件：{ORDERS_CSV}")
+        # 库存校验、库存扣减、订单明细与订单头在一个工作单元内校验并一次提交（库存不足时不写入任何数据）；
+        # 订单ID由序列分配（同一秒内大量下单也不会重复）
+        job = {'user_id': user_id, 'username': username, 'cart_items': cart_items,
+               'charge_balance': False, 'clear_cart': False, 'token': get_session_id()}
+        try:
+            if claim is None:
+                result = OrderModel.checkout(**job)
+            else:
+                # 秒杀商品进入准入队列，与同时到达的请求在一个工作单元内组提交
+                result = flash_sale.submit(job, OrderModel.checkout_batch)
+                if result is None:
+                    raise CheckoutError('秒杀太火爆了，请稍后重试')
+                if isinstance(result, Exception):
+                    raise result
+        except CheckoutError as e:
+            flash_sale.give_back(claim)
+            return jsonify({'success': False, 'msg': str(e)})
+        except Exception:
+            flash_sale.give_back(claim)
+            raise
+        order_id, total_amount = result['order_id'], result['total_amount']
+        print(f"订单{order_id}已写入（存储引擎：{get_store().engine}）")
         
         # 记录用户购买行为
         for item in cart_items:
@@ -1259,9 +1035,7 @@ def api_add_favorite():
             return jsonify({'success': False, 'msg': '商品ID无效！'})
         product_id = int(product_id)
         
-        all_products = load_products()
-        product_exists = any(p['product_id'] == product_id for p in all_products)
-        if not product_exists:
+        if not catalog_cache.exists(product_id):
             return jsonify({'success': False, 'msg': '商品不存在！'})
         
         success = add_user_favorite(user_id, product_id)
@@ -1333,8 +1107,8 @@ def api_get_favorites():
         if not favorite_ids:
             return jsonify({'success': True, 'data': [], 'msg': '暂无收藏'})
         
-        all_products = load_products()
-        favorite_products = [p for p in all_products if p['product_id'] in favorite_ids]
+        # 从商品目录缓存批量查找收藏商品（保持收藏顺序，已下架的商品跳过）
+        favorite_products = list(catalog_cache.get_many(favorite_ids).values())
         
         return jsonify({
             'success': True,
@@ -1357,23 +1131,13 @@ def api_recharge():
         current_balance = session.get('balance', 0.00)
         session['balance'] = round(current_balance + amount, 2)
         
-        # 同步更新users.csv中的余额（核心修改：补充phone字段）
-        users = get_all_users()  # 已修改：会读取phone字段
-        updated = False
-        with open(USERS_CSV_PATH, 'w', encoding='utf-8', newline='') as f:
-            # 1. 修改fieldnames：新增phone字段（和表头顺序一致）
-            fieldnames = ['user_id', 'username', 'password', 'phone', 'balance', 'favorites', 'is_admin']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for user in users:
-                if user['user_id'] == session['user_id']:
-                    user['balance'] = session['balance']
-                    updated = True
-                # 2. 直接写入user（get_all_users已包含phone字段，无需额外处理）
-                writer.writerow(user)
+        # 同步更新用户表中的余额：在存储层做增量加法，同一用户的并发充值不会互相覆盖
+        user = user_index.adjust(session.get('user_id'), 'balance', amount)
         
-        if not updated:
-            print(f"警告：未找到用户{session['user_id']}，余额未持久化")
+        if user is None:
+            print(f"警告：未找到用户{session.get('user_id')}，余额未持久化")
+        elif pd.notna(user.get('balance')):
+            session['balance'] = round(float(user['balance']), 2)  # 以存储中的余额为准
         
         return jsonify({
             'success': True,
@@ -1410,11 +1174,16 @@ def api_add_address():
     except Exception as e:
         return jsonify({'success': False, 'msg': f'添加失败：{str(e)}'})
 
+# 启动时构建订单索引（之后的新订单增量登记）
+order_index.refresh()
+
 # ---------------------- 程序入口（合并重复的启动逻辑）----------------------
 if __name__ == '__main__':
-    # 首次启动时执行一次订单迁移（仅当orders.csv不存在或为空时）
-    if not os.path.exists(ORDERS_CSV) or (os.path.exists(ORDERS_CSV) and pd.read_csv(ORDERS_CSV).empty):
-        migrate_purchase_to_orders()
+    # 购买记录迁移为订单（首次启动或上次未完成时）：后台线程分块执行，可从检查点继续，不阻塞启动
+    start_purchase_migration()
+    
+    # 商品搜索索引：后台线程构建，之后随商品增删改增量更新
+    start_product_search()
     
-    # 启动Flask服务器（关闭自动重载，避免Matplotlib线程冲突）
+    # 启动Flask服务器（关闭自动重载：重载器会再启动一个子进程，后台线程与进程内缓存会重复创建）
     app.run(debug=True, use_reloader=False, port=5000)
\ No newline at end of file
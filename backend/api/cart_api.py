@@ -5,6 +5,8 @@ from flask import Blueprint, jsonify, request, session
 from backend.models.cart_model import CartModel  # 现在能正常导入
 from backend.models.product_model import ProductModel
 from backend.models.user_model import UserModel
+from backend.utils.session_id import get_session_id
+from backend.utils.stock_ledger import stock_ledger
 
 bp = Blueprint('cart_api', __name__)
 
@@ -18,12 +20,13 @@ def add_to_cart():
     product_id = int(data.get('product_id', 0))
     quantity = int(data.get('quantity', 1))
     
-    # 验证商品
+    # 验证商品（可售数量来自库存账本，已扣除其他会话在结算页的预留）
     product = ProductModel.get_product_by_id(product_id)
     if not product:
         return jsonify({'success': False, 'msg': '商品不存在'})
-    if quantity <= 0 or quantity > product['stock']:
-        return jsonify({'success': False, 'msg': f'购买数量无效（库存{product["stock"]}件）'})
+    available = stock_ledger.available(product_id, get_session_id())
+    if quantity <= 0 or quantity > available:
+        return jsonify({'success': False, 'msg': f'购买数量无效（库存{available}件）'})
     
     # 调用购物车模型添加商品
     success = CartModel.add_to_cart(user_id, product_id, quantity)
@@ -89,8 +92,9 @@ def update_quantity():
     product = ProductModel.get_product_by_id(product_id)
     if not product:
         return jsonify({'success': False, 'msg': '商品不存在'})
-    if new_quantity <= 0 or new_quantity > product['stock']:
-        return jsonify({'success': False, 'msg': f'数量无效（库存{product["stock"]}件）'})
+    available = stock_ledger.available(product_id, get_session_id())
+    if new_quantity <= 0 or new_quantity > available:
+        return jsonify({'success': False, 'msg': f'数量无效（库存{available}件）'})
     
     success = CartModel.update_cart_quantity(user_id, product_id, new_quantity)
     if success:
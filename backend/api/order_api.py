@@ -1,11 +1,10 @@
 #订单相关 API 接口
 #功能：提供订单创建、查询、取消等接口
 from flask import Blueprint, jsonify, request, session
-from backend.models.order_model import OrderModel
-from backend.models.cart_model import CartModel  # 现在能正常导入
+from backend.models.order_model import CheckoutError, OrderModel
 from backend.models.user_model import UserModel
 from backend.models.product_model import ProductModel
-from datetime import datetime
+from backend.utils.session_id import get_session_id
 
 bp = Blueprint('order_api', __name__)
 
@@ -19,79 +18,58 @@ def create_order():
     data = request.json
     address_id = int(data.get('address_id', 0))  # 收货地址ID
     
-    # 1. 验证购物车是否为空
-    cart_items = CartModel.get_cart_items(user_id)
-    if not cart_items:
-        return jsonify({'success': False, 'msg': '购物车为空，无法创建订单'})
-    
-    # 2. 验证收货地址
+    # 1. 验证收货地址
     from backend.models.address_model import AddressModel
     address = AddressModel.get_address_by_id(address_id, user_id)
     if not address:
         return jsonify({'success': False, 'msg': '请选择有效的收货地址'})
     
-    # 3. 验证用户余额
-    total_amount = CartModel.get_cart_total(user_id)
-    user_balance = UserModel.get_user_balance(user_id)
-    if user_balance < total_amount:
-        return jsonify({'success': False, 'msg': f'余额不足（当前余额：{user_balance}元，订单金额：{total_amount}元）', 'need_recharge': True})
+    # 2. 结算：购物车、库存、余额在同一把锁内校验，订单明细/订单头/库存/余额/购物车一次提交
+    try:
+        result = OrderModel.checkout(user_id, session.get('username', '匿名用户'), token=get_session_id())
+    except CheckoutError as e:
+        response = {'success': False, 'msg': str(e)}
+        if e.need_recharge:
+            response['need_recharge'] = True
+        return jsonify(response)
     
-    # 4. 验证商品库存（防止超卖）
-    for item in cart_items:
-        product = ProductModel.get_product_by_id(item['product_id'])
-        if not product or product['stock'] < item['quantity']:
-            return jsonify({'success': False, 'msg': f'商品《{item["name"]}》库存不足，无法下单'})
+    # 3. 记录购买行为（提交给行为日志的后台写入线程）
+    for item in result['items']:
+        UserModel.record_user_action(
+            user_id=user_id,
+            product_id=item['product_id'],
+            product_name=item['name'],
+            product_category=item['category'],
+            action_type='purchase',
+            quantity=item['quantity'],
+            total_amount=item['subtotal']
+        )
     
-    # 5. 调用订单模型创建订单
-    order_data = {
-        'user_id': user_id,
-        'username': session.get('username', '匿名用户'),
-        'product_ids': [item['product_id'] for item in cart_items],
-        'product_names': [item['name'] for item in cart_items],
-        'quantities': [item['quantity'] for item in cart_items],
-        'total_amount': total_amount,
-        'create_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'status': '已支付'  # 简化版：直接标记为已支付
+    return jsonify({
+        'success': True,
+        'msg': '下单成功！',
+        'order_id': result['order_id'],
+        'total_amount': result['total_amount'],
+        'new_balance': UserModel.get_user_balance(user_id)
+    })
+
+def _page_args():
+    """分页参数：page_size（每页条数）、cursor（上一页返回的 next_cursor）、status（订单状态筛选）"""
+    return {
+        'page_size': request.args.get('page_size', type=int),
+        'cursor': request.args.get('cursor') or None,
+        'status': request.args.get('status') or None,
     }
-    order_id = OrderModel.create_order(order_data)
-    if order_id:
-        # 6. 扣减用户余额
-        UserModel.recharge_balance(user_id, -total_amount)  # 负数表示扣减
-        
-        # 7. 扣减商品库存
-        for item in cart_items:
-            ProductModel.update_product_stock(item['product_id'], -item['quantity'])
-        
-        # 8. 记录购买行为
-        for item in cart_items:
-            UserModel.record_user_action(
-                user_id=user_id,
-                product_id=item['product_id'],
-                product_name=item['name'],
-                product_category=item['category'],
-                action_type='purchase',
-                quantity=item['quantity'],
-                total_amount=item['subtotal']
-            )
-        
-        # 9. 清空购物车
-        CartModel.clear_cart(user_id)
-        
-        return jsonify({
-            'success': True,
-            'msg': '下单成功！',
-            'order_id': order_id,
-            'total_amount': total_amount,
-            'new_balance': UserModel.get_user_balance(user_id)
-        })
-    return jsonify({'success': False, 'msg': '创建订单失败，请重试'})
 
-# 2. 获取用户订单列表
+# 2. 获取用户订单列表（游标分页）
 @bp.route('/get_user_orders', methods=['GET'])
 def get_user_orders():
     user_id = session.get('user_id', 'anonymous')
-    orders = OrderModel.get_orders_by_user_id(user_id)
-    return jsonify({'success': True, 'data': orders})
+    try:
+        orders, next_cursor = OrderModel.get_orders_page(user_id=user_id, **_page_args())
+    except ValueError as e:
+        return jsonify({'success': False, 'msg': str(e)})
+    return jsonify({'success': True, 'data': orders, 'next_cursor': next_cursor})
 
 # 3. 获取订单详情
 @bp.route('/get/<int:order_id>', methods=['GET'])
@@ -107,14 +85,17 @@ def get_order_detail(order_id):
     
     return jsonify({'success': True, 'data': order})
 
-# 4. 后台获取所有订单（仅管理员）
+# 4. 后台获取所有订单（仅管理员，游标分页，可按 status / user_id 筛选）
 @bp.route('/admin/get_all', methods=['GET'])
 def get_all_orders():
     if not session.get('is_admin', False):
         return jsonify({'success': False, 'msg': '无管理员权限'})
     
-    orders = OrderModel.get_all_orders()
-    return jsonify({'success': True, 'data': orders})
+    try:
+        orders, next_cursor = OrderModel.get_orders_page(user_id=request.args.get('user_id') or None, **_page_args())
+    except ValueError as e:
+        return jsonify({'success': False, 'msg': str(e)})
+    return jsonify({'success': True, 'data': orders, 'next_cursor': next_cursor})
 
 # 5. 取消订单（仅未发货订单）
 @bp.route('/cancel/<int:order_id>', methods=['POST'])
@@ -137,10 +118,8 @@ def cancel_order(order_id):
         # 返还用户余额
         UserModel.recharge_balance(user_id, order['total_amount'])
         
-        # 返还商品库存
-        product_ids = eval(order['product_ids'])  # 字符串转列表
-        quantities = eval(order['quantities'])   # 字符串转列表
-        for pid, qty in zip(product_ids, quantities):
+        # 返还商品库存（订单模型已将列表字段解码）
+        for pid, qty in zip(order['product_ids'], order['quantities']):
             ProductModel.update_product_stock(pid, qty)
         
         return jsonify({'success': True, 'msg': '订单取消成功，余额已返还', 'new_balance': UserModel.get_user_balance(user_id)})
@@ -117,7 +117,17 @@ def delete_product(product_id):
         return jsonify({'success': True, 'msg': '删除商品成功'})
     return jsonify({'success': False, 'msg': '商品不存在或删除失败'})
 
-# 6. 获取所有商品分类（用于前端筛选）
+# 6. 商品搜索（按相关度排序）
+@bp.route('/search', methods=['GET'])
+def search_products():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'msg': '请输入搜索关键词'})
+    products = ProductModel.search_products(query, limit=request.args.get('limit', type=int),
+                                            category=request.args.get('category') or None)
+    return jsonify({'success': True, 'data': products})
+
+# 7. 获取所有商品分类（用于前端筛选）
 @bp.route('/get_categories', methods=['GET'])
 def get_categories():
     categories = ProductModel.get_all_categories()
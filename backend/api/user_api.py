@@ -113,8 +113,8 @@ def remove_favorite():
 def get_favorites():
     user_id = session.get('user_id', 'anonymous')
     favorites = UserModel.get_user_favorites(user_id)
-    # 获取收藏商品的详细信息
-    favorite_products = [ProductModel.get_product_by_id(pid) for pid in favorites if ProductModel.get_product_by_id(pid)]
+    # 获取收藏商品的详细信息（一次批量读取，保持收藏顺序）
+    favorite_products = list(ProductModel.get_products_by_ids(favorites).values())
     return jsonify({'success': True, 'data': favorite_products})
 
 # 7. 添加收货地址
@@ -7,13 +7,26 @@ import os
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
 # ---------------------- 数据文件路径配置 ----------------------
-DATA_DIR = os.path.join(ROOT_DIR, 'data')
+# 数据目录可用环境变量 ECOMMERCE_DATA_DIR 指定（多实例部署、压力测试使用独立数据目录）
+DATA_DIR = os.environ.get('ECOMMERCE_DATA_DIR', os.path.join(ROOT_DIR, 'data'))
 PRODUCTS_CSV_PATH = os.path.join(DATA_DIR, 'products.csv')
 USERS_CSV_PATH = os.path.join(DATA_DIR, 'users.csv')
 ORDERS_CSV_PATH = os.path.join(DATA_DIR, 'orders.csv')
+ORDER_ITEMS_CSV_PATH = os.path.join(DATA_DIR, 'order_items.csv')  # 订单商品明细（每个商品一行）
 USER_ACTIONS_CSV_PATH = os.path.join(DATA_DIR, 'user_actions.csv')
 ADDRESSES_CSV_PATH = os.path.join(DATA_DIR, 'addresses.csv')
 CART_CSV_PATH = os.path.join(DATA_DIR, 'cart.csv')  # 新增：购物车数据文件路径
+FAVORITES_CSV_PATH = os.path.join(DATA_DIR, 'user_favorites.csv')  # 收藏数据文件路径
+
+# ---------------------- 存储引擎配置 ----------------------
+# csv：沿用 data/*.csv 文件；sqlite：嵌入式SQLite数据库（WAL模式，支持多进程并发写入）
+STORAGE_ENGINE = os.environ.get('ECOMMERCE_STORAGE_ENGINE', 'csv')
+SQLITE_DB_PATH = os.environ.get('ECOMMERCE_SQLITE_DB', os.path.join(DATA_DIR, 'ecommerce.db'))
+
+# ---------------------- ID序列配置 ----------------------
+SEQUENCE_DIR = os.path.join(DATA_DIR, 'sequences')  # CSV引擎的序列计数文件目录（每个数据表一个 .seq 文件）
+# 每次从持久化计数器预留的ID个数；大于1时各进程按块预留、块内分配无需访问存储（ID可能不连续）
+ID_BLOCK_SIZE = int(os.environ.get('ECOMMERCE_ID_BLOCK_SIZE', '1'))
 
 # ---------------------- 图片上传配置 ----------------------
 # 商品图片上传目录（前端静态资源目录）
@@ -23,11 +36,74 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 # 最大上传文件大小（5MB）
 MAX_CONTENT_LENGTH = 5 * 1024 * 1024
 
+# ---------------------- 用户行为日志写入配置 ----------------------
+ACTION_LOG_QUEUE_SIZE = 10000       # 内存队列上限（条）
+ACTION_LOG_BATCH_SIZE = 500         # 单批最多写入条数
+ACTION_LOG_FLUSH_INTERVAL = 1.0     # 最长刷盘间隔（秒）
+ACTION_LOG_BACKPRESSURE = 'block'   # 队列满时的策略：block（阻塞等待）/ drop（丢弃并计数）/ sync（直接同步写入）
+
+# ---------------------- 行为统计（看板物化聚合）配置 ----------------------
+ACTION_STATS_SNAPSHOT_PATH = os.path.join(DATA_DIR, 'action_stats.json')  # 统计快照（含日志读取游标）
+ACTION_STATS_SAVE_INTERVAL = 5.0    # 快照最短保存间隔（秒），进程退出时也会保存
+
+# ---------------------- 看板图表缓存配置 ----------------------
+CHART_CACHE_MAX_ENTRIES = 64        # 最多缓存的图表数据数（LRU淘汰）
+CHART_CACHE_TTL = 300               # 图表数据最长使用时间（秒），过期后后台重新计算
+
+# ---------------------- 数据导出配置 ----------------------
+EXPORT_CHUNK_SIZE = 5000            # 流式导出每次读取/输出的行数
+EXCEL_SPOOL_MAX_SIZE = 16 * 1024 * 1024  # Excel导出文件在内存中的上限（字节），超过后写入临时文件
+EXPORT_DIR = os.path.join(DATA_DIR, 'exports')  # 后台导出任务生成的文件（按数据版本缓存）与任务状态
+EXPORT_WORKERS = 2                  # 同时执行的导出任务数
+EXPORT_CACHE_MAX_FILES = 20         # 最多保留的导出文件数（超过时删除最早使用的）
+EXPORT_JOB_TTL = 24 * 3600          # 任务状态保留时间（秒）
+
+# ---------------------- 订单配置 ----------------------
+ORDER_PAGE_SIZE = 20                # 订单列表每页条数（游标分页）
+ORDER_PAGE_SIZE_MAX = 100           # 订单列表每页条数上限
+PURCHASE_MIGRATION_CHECKPOINT = os.path.join(DATA_DIR, 'purchase_migration.json')  # 购买记录迁移为订单的检查点
+PURCHASE_MIGRATION_CHUNK_SIZE = 5000  # 迁移时每次读取的行为记录数
+PURCHASE_MIGRATION_GROUP_WINDOW = 60  # 同一次购买的记录在日志中的时间跨度上限（秒）：读到比分组时间晚超过该值的记录后才写入该分组
+PURCHASE_MATCH_WINDOW = 5           # 用户在该时间（秒）内已有订单时，视为该次购买已由下单接口写入订单
+ORDER_HISTORY_PER_USER = 50         # "我的订单"每个用户保留的最新订单数
+ORDER_HISTORY_MAX_USERS = 10000     # 订单历史视图最多缓存的用户数（LRU淘汰）
+STOCK_RESERVATION_TTL = 600         # 打开结算页时为购物车商品预留库存的有效期（秒）
+
+# ---------------------- 商品搜索配置 ----------------------
+SEARCH_RESULT_LIMIT = 20            # 商品搜索默认返回条数
+SEARCH_RESULT_LIMIT_MAX = 100       # 商品搜索返回条数上限
+
+# ---------------------- 秒杀配置 ----------------------
+FLASH_SALE_PRODUCT_IDS = [int(pid) for pid in os.environ.get('ECOMMERCE_FLASH_SALE_PRODUCTS', '').split(',') if pid.strip().isdigit()]  # 默认开启秒杀的商品ID（本进程首次使用秒杀模式时按当前可售库存发放令牌）
+FLASH_SALE_BATCH_SIZE = 50          # 秒杀组提交时一个工作单元最多提交的订单数
+FLASH_SALE_QUEUE_SIZE = 500         # 秒杀准入队列长度（排队请求达到该值时直接拒绝）
+FLASH_SALE_QUEUE_TIMEOUT = 5        # 秒杀请求最长排队时间（秒）
+
 # ---------------------- Flask配置 ----------------------
 SECRET_KEY = 'ecommerce_2024_project_secret_key_123'  # 加密session用
 JSON_AS_ASCII = False  # 解决中文乱码
 
 # ---------------------- 初始化必要目录（程序启动时自动创建） ----------------------
+# ---------------------- 默认数据（新建数据表时写入，CSV与SQLite引擎一致） ----------------------
+DEFAULT_PRODUCTS = [{
+    'product_id': 1,
+    'name': '默认商品（后台可修改）',
+    'category': '测试分类',
+    'price': 99.0,
+    'stock': 100,
+    'description': '这是默认商品，管理员可在后台修改/新增商品',
+    'image': 'default_product.jpg'
+}]
+DEFAULT_USERS = [{
+    'user_id': 'anonymous',
+    'username': '匿名用户',
+    'password': '',  # 匿名用户无密码
+    'phone': '',
+    'balance': 0.0,
+    'favorites': '[]',  # 收藏商品ID列表（JSON字符串）
+    'is_admin': False
+}]
+
 def init_dirs():
     # 创建数据目录
     os.makedirs(DATA_DIR, exist_ok=True)
@@ -40,37 +116,24 @@ def create_default_csvs():
     # 1. 默认商品表
     if not os.path.exists(PRODUCTS_CSV_PATH):
         import pandas as pd
-        default_products = pd.DataFrame([{
-            'product_id': 1,
-            'name': '默认商品（后台可修改）',
-            'category': '测试分类',
-            'price': 99.0,
-            'stock': 100,
-            'description': '这是默认商品，管理员可在后台修改/新增商品',
-            'image': 'default_product.jpg'
-        }])
+        default_products = pd.DataFrame(DEFAULT_PRODUCTS)
         default_products.to_csv(PRODUCTS_CSV_PATH, index=False, encoding='utf-8-sig')
     
     # 2. 默认用户表（含匿名用户）
     if not os.path.exists(USERS_CSV_PATH):
         import pandas as pd
-        default_users = pd.DataFrame([{
-            'user_id': 'anonymous',
-            'username': '匿名用户',
-            'password': '',  # 匿名用户无密码
-            'balance': 0.0,
-            'favorites': '[]',  # 收藏商品ID列表（JSON字符串）
-            'is_admin': False
-        }])
+        default_users = pd.DataFrame(DEFAULT_USERS)
         default_users.to_csv(USERS_CSV_PATH, index=False, encoding='utf-8-sig')
     
     # 3. 其他空表（含购物车表）
     # 格式：(文件路径, 表头列名列表)
     csv_configs = [
-        (ORDERS_CSV_PATH, ['order_id', 'user_id', 'username', 'product_ids', 'product_names', 'quantities', 'total_amount', 'create_time', 'status']),
+        (ORDERS_CSV_PATH, ['order_id', 'user_id', 'username', 'total_amount', 'create_time', 'status']),
+        (ORDER_ITEMS_CSV_PATH, ['order_id', 'line_no', 'product_id', 'product_name', 'image', 'price', 'quantity']),
         (USER_ACTIONS_CSV_PATH, ['timestamp', 'user_id', 'username', 'product_id', 'product_name', 'product_category', 'action_type', 'session_id', 'quantity', 'total_amount']),
         (ADDRESSES_CSV_PATH, ['address_id', 'user_id', 'receiver', 'phone', 'province', 'city', 'detail_address', 'is_default']),
-        (CART_CSV_PATH, ['user_id', 'product_id', 'quantity'])  # 新增：购物车表结构
+        (CART_CSV_PATH, ['user_id', 'product_id', 'quantity']),  # 新增：购物车表结构
+        (FAVORITES_CSV_PATH, ['user_id', 'product_id', 'add_time'])
     ]
     
     # 循环创建空表
@@ -79,5 +142,58 @@ def create_default_csvs():
         if not os.path.exists(path):
             pd.DataFrame(columns=columns).to_csv(path, index=False, encoding='utf-8-sig')
 
+# ---------------------- 配置类（供 backend 各模块以 Config.XXX 方式引用） ----------------------
+class Config:
+    ROOT_DIR = ROOT_DIR
+    DATA_DIR = DATA_DIR
+    PRODUCTS_CSV_PATH = PRODUCTS_CSV_PATH
+    USERS_CSV_PATH = USERS_CSV_PATH
+    ORDERS_CSV_PATH = ORDERS_CSV_PATH
+    ORDER_ITEMS_CSV_PATH = ORDER_ITEMS_CSV_PATH
+    USER_ACTIONS_CSV_PATH = USER_ACTIONS_CSV_PATH
+    ADDRESSES_CSV_PATH = ADDRESSES_CSV_PATH
+    CART_CSV_PATH = CART_CSV_PATH
+    FAVORITES_CSV_PATH = FAVORITES_CSV_PATH
+    STORAGE_ENGINE = STORAGE_ENGINE
+    SQLITE_DB_PATH = SQLITE_DB_PATH
+    DEFAULT_PRODUCTS = DEFAULT_PRODUCTS
+    DEFAULT_USERS = DEFAULT_USERS
+    SEQUENCE_DIR = SEQUENCE_DIR
+    ID_BLOCK_SIZE = ID_BLOCK_SIZE
+    PRODUCT_UPLOAD_FOLDER = PRODUCT_UPLOAD_FOLDER
+    ALLOWED_EXTENSIONS = ALLOWED_EXTENSIONS
+    MAX_CONTENT_LENGTH = MAX_CONTENT_LENGTH
+    ACTION_LOG_QUEUE_SIZE = ACTION_LOG_QUEUE_SIZE
+    ACTION_LOG_BATCH_SIZE = ACTION_LOG_BATCH_SIZE
+    ACTION_LOG_FLUSH_INTERVAL = ACTION_LOG_FLUSH_INTERVAL
+    ACTION_LOG_BACKPRESSURE = ACTION_LOG_BACKPRESSURE
+    ACTION_STATS_SNAPSHOT_PATH = ACTION_STATS_SNAPSHOT_PATH
+    ACTION_STATS_SAVE_INTERVAL = ACTION_STATS_SAVE_INTERVAL
+    CHART_CACHE_MAX_ENTRIES = CHART_CACHE_MAX_ENTRIES
+    CHART_CACHE_TTL = CHART_CACHE_TTL
+    EXPORT_CHUNK_SIZE = EXPORT_CHUNK_SIZE
+    EXCEL_SPOOL_MAX_SIZE = EXCEL_SPOOL_MAX_SIZE
+    EXPORT_DIR = EXPORT_DIR
+    EXPORT_WORKERS = EXPORT_WORKERS
+    EXPORT_CACHE_MAX_FILES = EXPORT_CACHE_MAX_FILES
+    EXPORT_JOB_TTL = EXPORT_JOB_TTL
+    ORDER_PAGE_SIZE = ORDER_PAGE_SIZE
+    ORDER_PAGE_SIZE_MAX = ORDER_PAGE_SIZE_MAX
+    PURCHASE_MIGRATION_CHECKPOINT = PURCHASE_MIGRATION_CHECKPOINT
+    PURCHASE_MIGRATION_CHUNK_SIZE = PURCHASE_MIGRATION_CHUNK_SIZE
+    PURCHASE_MIGRATION_GROUP_WINDOW = PURCHASE_MIGRATION_GROUP_WINDOW
+    PURCHASE_MATCH_WINDOW = PURCHASE_MATCH_WINDOW
+    ORDER_HISTORY_PER_USER = ORDER_HISTORY_PER_USER
+    ORDER_HISTORY_MAX_USERS = ORDER_HISTORY_MAX_USERS
+    STOCK_RESERVATION_TTL = STOCK_RESERVATION_TTL
+    SEARCH_RESULT_LIMIT = SEARCH_RESULT_LIMIT
+    SEARCH_RESULT_LIMIT_MAX = SEARCH_RESULT_LIMIT_MAX
+    FLASH_SALE_PRODUCT_IDS = FLASH_SALE_PRODUCT_IDS
+    FLASH_SALE_BATCH_SIZE = FLASH_SALE_BATCH_SIZE
+    FLASH_SALE_QUEUE_SIZE = FLASH_SALE_QUEUE_SIZE
+    FLASH_SALE_QUEUE_TIMEOUT = FLASH_SALE_QUEUE_TIMEOUT
+    SECRET_KEY = SECRET_KEY
+    JSON_AS_ASCII = JSON_AS_ASCII
+
 # 程序启动时自动初始化目录和默认文件
 init_dirs()
\ No newline at end of file
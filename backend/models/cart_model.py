@@ -1,26 +1,25 @@
-import pandas as pd
-import os
 import json
-from backend.config import Config
+from backend.storage.engine import get_store
 
 class CartModel:
     @staticmethod
     def get_cart_items(user_id):
         """获取用户购物车所有商品（含商品详情）"""
-        if not os.path.exists(Config.CART_CSV_PATH):
+        store = get_store()
+        if not store.exists('cart'):
             return []
         
         # 读取购物车数据
-        cart_df = pd.read_csv(Config.CART_CSV_PATH, encoding='utf-8-sig')
-        user_cart = cart_df[cart_df['user_id'] == user_id]
-        if user_cart.empty:
+        user_cart = store.find('cart', user_id=user_id)
+        if not user_cart:
             return []
         
-        # 关联商品详情（从products.csv获取）
+        # 关联商品详情（一次批量读取购物车中的所有商品）
         from backend.models.product_model import ProductModel
+        products = ProductModel.get_products_by_ids(row['product_id'] for row in user_cart)
         cart_items = []
-        for _, row in user_cart.iterrows():
-            product = ProductModel.get_product_by_id(row['product_id'])
+        for row in user_cart:
+            product = products.get(row['product_id'])
             if product:
                 # 计算小计金额
                 subtotal = round(product['price'] * row['quantity'], 2)
@@ -38,69 +37,55 @@ class CartModel:
     @staticmethod
     def add_to_cart(user_id, product_id, quantity):
         """添加商品到购物车（已存在则更新数量）"""
-        if not os.path.exists(Config.CART_CSV_PATH):
+        store = get_store()
+        if not store.exists('cart'):
             return False
         
-        cart_df = pd.read_csv(Config.CART_CSV_PATH, encoding='utf-8-sig')
-        # 检查商品是否已在购物车
-        mask = (cart_df['user_id'] == user_id) & (cart_df['product_id'] == product_id)
+        # 检查商品是否已在购物车（查询与写入在同一锁内，避免并发重复插入）
+        criteria = {'user_id': user_id, 'product_id': product_id}
         
-        if mask.any():
-            # 已存在：更新数量
-            cart_df.loc[mask, 'quantity'] += quantity
-        else:
-            # 不存在：新增记录
-            new_item = pd.DataFrame([{
-                'user_id': user_id,
-                'product_id': product_id,
-                'quantity': quantity
-            }])
-            cart_df = pd.concat([cart_df, new_item], ignore_index=True)
-        
-        cart_df.to_csv(Config.CART_CSV_PATH, index=False, encoding='utf-8-sig')
+        with store.locked('cart'):
+            if store.find_one('cart', **criteria):
+                # 已存在：更新数量
+                store.adjust('cart', criteria, 'quantity', quantity)
+            else:
+                # 不存在：新增记录
+                store.insert('cart', {
+                    'user_id': user_id,
+                    'product_id': product_id,
+                    'quantity': quantity
+                })
         return True
     
     @staticmethod
     def remove_from_cart(user_id, product_id):
         """从购物车移除商品"""
-        if not os.path.exists(Config.CART_CSV_PATH):
-            return False
-        
-        cart_df = pd.read_csv(Config.CART_CSV_PATH, encoding='utf-8-sig')
-        mask = (cart_df['user_id'] == user_id) & (cart_df['product_id'] == product_id)
-        if not mask.any():
+        store = get_store()
+        if not store.exists('cart'):
             return False
         
-        # 过滤掉要移除的商品
-        cart_df = cart_df[~mask]
-        cart_df.to_csv(Config.CART_CSV_PATH, index=False, encoding='utf-8-sig')
-        return True
+        # 删除要移除的商品
+        return store.delete('cart', {'user_id': user_id, 'product_id': product_id}) > 0
     
     @staticmethod
     def update_cart_quantity(user_id, product_id, new_quantity):
         """更新购物车商品数量"""
-        if not os.path.exists(Config.CART_CSV_PATH):
-            return False
-        
-        cart_df = pd.read_csv(Config.CART_CSV_PATH, encoding='utf-8-sig')
-        mask = (cart_df['user_id'] == user_id) & (cart_df['product_id'] == product_id)
-        if not mask.any():
+        store = get_store()
+        if not store.exists('cart'):
             return False
         
-        cart_df.loc[mask, 'quantity'] = new_quantity
-        cart_df.to_csv(Config.CART_CSV_PATH, index=False, encoding='utf-8-sig')
-        return True
+        criteria = {'user_id': user_id, 'product_id': product_id}
+        return store.update('cart', criteria, {'quantity': new_quantity}) > 0
     
     @staticmethod
     def clear_cart(user_id):
         """清空用户购物车"""
-        if not os.path.exists(Config.CART_CSV_PATH):
+        store = get_store()
+        if not store.exists('cart'):
             return
         
-        cart_df = pd.read_csv(Config.CART_CSV_PATH, encoding='utf-8-sig')
-        # 保留非当前用户的购物车数据
-        cart_df = cart_df[cart_df['user_id'] != user_id]
-        cart_df.to_csv(Config.CART_CSV_PATH, index=False, encoding='utf-8-sig')
+        # 删除当前用户的购物车数据
+        store.delete('cart', {'user_id': user_id})
     
     @staticmethod
     def get_cart_total(user_id):
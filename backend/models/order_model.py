@@ -1,117 +1,231 @@
 #订单数据模型
 #功能：封装订单创建、查询、状态更新等逻辑
-import pandas as pd
-import os
-import json
 from backend.config import Config
+from backend.storage.engine import get_store
+from backend.storage.sequence import next_id
+from backend.storage.unit_of_work import UnitOfWork
+from backend.utils.catalog_cache import catalog_cache
+from backend.utils.order_history import order_history, summarize_order
+from backend.utils.order_index import order_id_key, order_index
+from backend.utils.order_items import attach_items, item_rows, order_items
+from backend.utils.stock_ledger import stock_ledger
+from backend.utils.user_index import user_index
+from datetime import datetime
+
+class CheckoutError(ValueError):
+    """结算校验失败（购物车为空、库存不足、余额不足等），消息可直接返回给用户；校验失败时不写入任何数据"""
+    
+    def __init__(self, msg, need_recharge=False):
+        super().__init__(msg)
+        self.need_recharge = need_recharge
 
 class OrderModel:
     @staticmethod
     def create_order(order_data):
-        """创建新订单"""
-        if not os.path.exists(Config.ORDERS_CSV_PATH):
+        """创建新订单：商品明细为 items（字典列表），或 product_ids / product_names / quantities 三个列表"""
+        store = get_store()
+        if not store.exists('orders'):
             return None
         
-        df = pd.read_csv(Config.ORDERS_CSV_PATH, encoding='utf-8-sig')
-        # 生成新订单ID（最大ID+1）
-        new_id = df['order_id'].max() + 1 if not df.empty else 1
+        # 商品明细写入 order_items 表，订单表只保存订单头
+        items = order_data.pop('items', None)
+        product_ids = order_data.pop('product_ids', [])
+        product_names = order_data.pop('product_names', [])
+        quantities = order_data.pop('quantities', [])
+        if items is None:
+            items = [{'product_id': pid, 'name': name, 'quantity': qty}
+                     for pid, name, qty in zip(product_ids, product_names, quantities)]
+        
+        # 生成新订单ID（序列分配，无需读取订单表）
+        new_id = next_id('orders')
         order_data['order_id'] = new_id
         
-        # 列表类型字段转换为字符串（CSV无法直接存储列表）
-        order_data['product_ids'] = json.dumps(order_data['product_ids'])
-        order_data['product_names'] = json.dumps(order_data['product_names'], ensure_ascii=False)
-        order_data['quantities'] = json.dumps(order_data['quantities'])
+        # 先写明细再追加订单头；提交后仍持有表锁时登记到用户订单历史（只更新该用户的视图）
+        summary = summarize_order(dict(order_data, items=items))
+        with UnitOfWork('order_items', 'orders') as uow:
+            history_version = order_history.version()
+            uow.insert_many('order_items', item_rows(new_id, items))
+            uow.insert('orders', order_data)
+            uow.on_commit(lambda: order_history.record([(order_data.get('user_id'), summary)], history_version))
         
-        # 追加新订单
-        new_order = pd.DataFrame([order_data])
-        df = pd.concat([df, new_order], ignore_index=True)
-        df.to_csv(Config.ORDERS_CSV_PATH, index=False, encoding='utf-8-sig')
+        # 释放表锁后增量登记订单明细与订单索引
+        order_items.refresh()
+        order_index.refresh()
         return new_id
     
+    @staticmethod
+    def checkout(user_id, username, cart_items=None, order_id=None, charge_balance=True, clear_cart=True, token=None):
+        """结算下单：在一个工作单元内校验库存（及余额），并一次提交订单明细、订单头、库存、余额与购物车
+        cart_items 为购物车商品（product_id / name / image / price / quantity / subtotal），为None时在锁内读取用户购物车表；
+        order_id 为空时按序列分配；charge_balance 扣减用户余额；clear_cart 清空用户购物车表；
+        token 为结算页预留库存时使用的会话标识（该会话的预留计入可售数量，提交后释放）
+        返回 {'order_id', 'total_amount', 'items'}；校验失败抛出 CheckoutError，不写入任何数据"""
+        result = OrderModel.checkout_batch([{
+            'user_id': user_id, 'username': username, 'cart_items': cart_items, 'order_id': order_id,
+            'charge_balance': charge_balance, 'clear_cart': clear_cart, 'token': token
+        }])[0]
+        if isinstance(result, CheckoutError):
+            raise result
+        return result
+    
+    @staticmethod
+    def checkout_batch(requests):
+        """批量结算（组提交）：requests 为 checkout 参数字典的列表，在一个工作单元内逐个校验并暂存，最后一次提交，
+        每张表整批只写一次；返回与 requests 等长的列表，元素为结果字典，或校验失败的 CheckoutError（不影响同批其他请求）"""
+        requests = [dict({'cart_items': None, 'order_id': None, 'charge_balance': True, 'clear_cart': True, 'token': None}, **request)
+                    for request in requests]
+        tables = ['products', 'order_items', 'orders']
+        if any(request['charge_balance'] for request in requests):
+            tables.append('users')
+        if any(request['clear_cart'] for request in requests):
+            tables.append('cart')
+        
+        results, orders = [], []
+        # 同一批中已暂存（尚未提交）的库存扣减、余额扣减、已结算的购物车与订单ID，后面的请求校验时需扣除
+        batch = {'stock': {}, 'spent': {}, 'carts': set(), 'order_ids': set()}
+        with UnitOfWork(*tables) as uow:
+            history_version = order_history.version()
+            for request in requests:
+                try:
+                    result = OrderModel._stage_checkout(uow, batch, **request)
+                except CheckoutError as e:
+                    results.append(e)
+                    continue
+                results.append(result)
+                order = result.pop('order')
+                orders.append((order['user_id'], summarize_order(order)))
+            if orders:
+                uow.on_commit(catalog_cache.invalidate)
+                # 提交后仍持有表锁时登记到用户订单历史（写入后的版本只包含本批写入，只更新下单用户的视图）
+                uow.on_commit(lambda: order_history.record(orders, history_version))
+        
+        # 提交后（已释放表锁）增量登记订单明细与订单索引
+        if orders:
+            order_items.refresh()
+            order_index.refresh()
+        return results
+    
+    @staticmethod
+    def _stage_checkout(uow, batch, user_id, username, cart_items, order_id, charge_balance, clear_cart, token):
+        """校验一个结算请求并在工作单元中暂存其写入（所有校验都在暂存写入之前完成，校验失败时不暂存任何写入）"""
+        from backend.models.cart_model import CartModel
+        # 1. 购物车（锁内读取：并发结算同一购物车时只有一次成功）
+        if cart_items is None:
+            cart_items = [] if user_id in batch['carts'] else CartModel.get_cart_items(user_id)
+        if not cart_items:
+            raise CheckoutError('购物车为空，无法创建订单')
+        total_amount = round(sum(item['subtotal'] for item in cart_items), 2)
+        
+        # 2. 商品与余额校验
+        quantities = {}
+        for item in cart_items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+        products = catalog_cache.get_many(quantities)
+        for item in cart_items:
+            if item['product_id'] not in products:
+                raise CheckoutError(f'商品《{item["name"]}》不存在')
+        if charge_balance:
+            user = user_index.get(user_id)
+            balance = round((user['balance'] if user else 0.0) - batch['spent'].get(user_id, 0.0), 2)
+            if balance < total_amount:
+                raise CheckoutError(f'余额不足（当前余额：{balance}元，订单金额：{total_amount}元）', need_recharge=True)
+        
+        # 3. 订单ID唯一性校验：明细按订单ID关联到订单，重复的ID会使两个订单的明细混在一起
+        #    （SQLite引擎由主键约束拒绝，但会使整批提交失败；CSV引擎没有约束），在锁内对订单表与本批逐个检查
+        order_id = order_id or next_id('orders')
+        if order_id_key(order_id) in batch['order_ids'] or order_index.get_orders_by_ids([order_id]):
+            raise CheckoutError(f'订单号{order_id}已存在')
+        
+        # 4. 库存校验并暂存扣减（库存账本在锁内与商品表同步，扣除其他会话的预留；同一商品的多行合并计算）
+        shortages = stock_ledger.stage_sale(uow, quantities, token, staged=batch['stock'])
+        for item in cart_items:
+            if item['product_id'] in shortages:
+                raise CheckoutError(f'商品《{item["name"]}》库存不足，仅剩{shortages[item["product_id"]]}件')
+        
+        # 5. 暂存其余写入：明细先于订单头提交，读取方看到订单时其明细已完整
+        batch['order_ids'].add(order_id_key(order_id))
+        items = [{
+            'product_id': item['product_id'],
+            'name': item['name'],
+            'image': item.get('image'),
+            'quantity': item['quantity'],
+            'price': item['price']
+        } for item in cart_items]
+        order_data = {
+            'order_id': order_id,
+            'user_id': user_id,
+            'username': username,
+            'total_amount': total_amount,
+            'create_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'status': '已支付'
+        }
+        uow.insert_many('order_items', item_rows(order_id, items))
+        if charge_balance:
+            user_index.stage_adjust(uow, user_id, 'balance', -total_amount, min_value=0.0)
+            batch['spent'][user_id] = batch['spent'].get(user_id, 0.0) + total_amount
+        if clear_cart:
+            uow.delete('cart', {'user_id': user_id})
+            batch['carts'].add(user_id)
+        uow.insert('orders', order_data)
+        return {'order_id': order_id, 'total_amount': total_amount, 'items': cart_items, 'order': dict(order_data, items=items)}
+    
     @staticmethod
     def get_order_by_id(order_id):
         """通过订单ID获取订单详情"""
-        if not os.path.exists(Config.ORDERS_CSV_PATH):
+        store = get_store()
+        if not store.exists('orders'):
             return None
         
-        df = pd.read_csv(Config.ORDERS_CSV_PATH, encoding='utf-8-sig')
-        order = df[df['order_id'] == order_id]
-        if order.empty:
+        order_dict = store.find_one('orders', order_id=order_id)
+        if order_dict is None:
             return None
         
-        # 字符串转列表（恢复原始数据格式）
-        order_dict = order.to_dict('records')[0]
-        try:
-            order_dict['product_ids'] = json.loads(order_dict['product_ids'])
-            order_dict['product_names'] = json.loads(order_dict['product_names'])
-            order_dict['quantities'] = json.loads(order_dict['quantities'])
-        except:
-            pass
-        
-        return order_dict
+        # 补充商品明细（兼容尚未转换的历史订单）
+        return attach_items([order_dict])[0]
     
     @staticmethod
     def get_orders_by_user_id(user_id):
         """获取用户的所有订单"""
-        if not os.path.exists(Config.ORDERS_CSV_PATH):
+        store = get_store()
+        if not store.exists('orders'):
             return []
         
-        df = pd.read_csv(Config.ORDERS_CSV_PATH, encoding='utf-8-sig')
-        user_orders = df[df['user_id'] == user_id]
-        if user_orders.empty:
-            return []
-        
-        # 转换列表字段并排序（按创建时间倒序）
-        orders = []
-        for _, row in user_orders.iterrows():
-            order_dict = row.to_dict()
-            try:
-                order_dict['product_ids'] = json.loads(order_dict['product_ids'])
-                order_dict['product_names'] = json.loads(order_dict['product_names'])
-                order_dict['quantities'] = json.loads(order_dict['quantities'])
-            except:
-                pass
-            orders.append(order_dict)
-        
-        # 按创建时间倒序排序（最新订单在前）
-        orders.sort(key=lambda x: x['create_time'], reverse=True)
-        return orders
+        # 从订单索引读取（已按创建时间倒序，最新订单在前），批量补充商品明细
+        return attach_items(order_index.get_user_orders(user_id, newest_first=True))
     
     @staticmethod
-    def get_all_orders():
-        """获取所有订单（后台管理用）"""
-        if not os.path.exists(Config.ORDERS_CSV_PATH):
-            return []
+    def get_orders_page(page_size=None, cursor=None, status=None, user_id=None):
+        """分页获取订单（后台管理用）：按下单时间倒序，可按状态/用户筛选
+        返回 (订单列表, 下一页游标)；没有更多订单时游标为None；游标无效时抛出 ValueError"""
+        store = get_store()
+        if not store.exists('orders'):
+            return [], None
         
-        df = pd.read_csv(Config.ORDERS_CSV_PATH, encoding='utf-8-sig')
-        if df.empty:
-            return []
+        # 游标分页：只读取一页订单，不读取整张订单表
+        page_size = min(page_size or Config.ORDER_PAGE_SIZE, Config.ORDER_PAGE_SIZE_MAX)
+        page, next_cursor = order_index.get_page(page_size, cursor=cursor, status=status, user_id=user_id)
         
-        # 转换列表字段并排序
-        orders = []
-        for _, row in df.iterrows():
-            order_dict = row.to_dict()
-            try:
-                order_dict['product_ids'] = json.loads(order_dict['product_ids'])
-                order_dict['product_names'] = json.loads(order_dict['product_names'])
-                order_dict['quantities'] = json.loads(order_dict['quantities'])
-            except:
-                pass
-            orders.append(order_dict)
-        
-        orders.sort(key=lambda x: x['create_time'], reverse=True)
-        return orders
+        # 批量补充商品明细
+        return attach_items(page), next_cursor
     
     @staticmethod
     def update_order_status(order_id, new_status):
         """更新订单状态（已支付/已取消/已发货等）"""
-        if not os.path.exists(Config.ORDERS_CSV_PATH):
+        store = get_store()
+        if not store.exists('orders'):
             return False
         
-        df = pd.read_csv(Config.ORDERS_CSV_PATH, encoding='utf-8-sig')
-        if order_id not in df['order_id'].values:
-            return False
+        # 在锁内取写入前后的版本，只更新该订单所属用户的订单历史视图
+        with store.locked('order_items', 'orders'):
+            history_version = order_history.version()
+            order = store.find_one('orders', order_id=order_id)
+            if order is None:
+                return False
+            updated = store.update('orders', {'order_id': order_id}, {'status': new_status}) > 0
+            if updated:
+                order_history.set_status(order['user_id'], order_id, new_status, history_version)
         
-        df.loc[df['order_id'] == order_id, 'status'] = new_status
-        df.to_csv(Config.ORDERS_CSV_PATH, index=False, encoding='utf-8-sig')
-        return True
\ No newline at end of file
+        # 释放表锁后同步订单索引
+        if updated:
+            order_index.refresh()
+        return updated
\ No newline at end of file
@@ -1,109 +1,124 @@
 #商品数据模型
 #功能：封装商品的增删改查、库存更新、行为记录等逻辑
-import pandas as pd
-import os
 from backend.config import Config
+from backend.storage.engine import get_store
+from backend.storage.sequence import next_id
+from backend.utils.catalog_cache import catalog_cache
+from backend.utils.product_search import product_search
+from backend.utils.action_log import submit_action
 from datetime import datetime
 
 class ProductModel:
     @staticmethod
     def get_all_products(category=None):
         """获取所有商品（支持分类筛选）"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
+        if not get_store().exists('products'):
             return []
         
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        # 分类筛选
-        if category and category != '全部商品':
-            df = df[df['category'] == category]
-        return df.to_dict('records')
+        # 从目录缓存读取（分类筛选走分类索引）
+        return catalog_cache.get_all(category)
     
     @staticmethod
     def get_product_by_id(product_id):
         """通过ID获取商品详情"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
+        if not get_store().exists('products'):
             return None
         
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        product = df[df['product_id'] == product_id]
-        return product.to_dict('records')[0] if not product.empty else None
+        return catalog_cache.get(product_id)
+    
+    @staticmethod
+    def get_products_by_ids(product_ids):
+        """批量获取商品详情：返回 {product_id(int): 商品}（不存在的商品不包含在结果中）
+        购物车、收藏夹等需要多个商品时使用，整批只访问一次商品目录"""
+        if not get_store().exists('products'):
+            return {}
+        
+        return catalog_cache.get_many(product_ids)
+    
+    @staticmethod
+    def search_products(query, limit=None, category=None):
+        """按关键词搜索商品（名称、分类、描述），按相关度从高到低返回商品列表（每个商品附带 score 字段）"""
+        if not get_store().exists('products'):
+            return []
+        
+        limit = min(limit or Config.SEARCH_RESULT_LIMIT, Config.SEARCH_RESULT_LIMIT_MAX)
+        hits = product_search.search(query, limit=limit, category=category)
+        products = catalog_cache.get_many(product_id for product_id, _ in hits)
+        results = []
+        for product_id, score in hits:
+            product = products.get(product_id)
+            if product is not None:
+                product['score'] = score
+                results.append(product)
+        return results
     
     @staticmethod
     def get_all_categories():
         """获取所有商品分类（去重）"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
+        if not get_store().exists('products'):
             return ['测试分类']
         
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        categories = df['category'].unique().tolist()
+        categories = catalog_cache.get_categories()
         return ['全部商品'] + categories  # 增加"全部商品"选项
     
     @staticmethod
     def add_product(product_data):
         """新增商品（后台管理用）"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
+        store = get_store()
+        if not store.exists('products'):
             return None
         
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        # 生成新商品ID（最大ID+1）
-        new_id = df['product_id'].max() + 1 if not df.empty else 1
+        # 生成新商品ID（序列分配，无需读取商品表）
+        new_id = next_id('products')
         product_data['product_id'] = new_id
         
         # 追加新商品
-        new_product = pd.DataFrame([product_data])
-        df = pd.concat([df, new_product], ignore_index=True)
-        df.to_csv(Config.PRODUCTS_CSV_PATH, index=False, encoding='utf-8-sig')
+        store.insert('products', product_data)
+        catalog_cache.invalidate()
+        product_search.add(new_id, product_data)
         return new_id
     
     @staticmethod
     def update_product(product_id, update_data):
         """修改商品信息（后台管理用）"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
+        store = get_store()
+        if not store.exists('products'):
             return False
         
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        if product_id not in df['product_id'].values:
+        # 更新指定字段（未知字段由存储引擎忽略）
+        updated = store.update('products', {'product_id': product_id}, update_data)
+        if not updated and not catalog_cache.exists(product_id):
             return False
-        
-        # 更新指定字段
-        for key, value in update_data.items():
-            if key in df.columns:
-                df.loc[df['product_id'] == product_id, key] = value
-        
-        df.to_csv(Config.PRODUCTS_CSV_PATH, index=False, encoding='utf-8-sig')
+        catalog_cache.invalidate()
+        product_search.update(product_id, update_data)
         return True
     
     @staticmethod
     def update_product_stock(product_id, stock_change):
         """更新商品库存（正数增加，负数减少）"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
-            return False
-        
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        if product_id not in df['product_id'].values:
+        store = get_store()
+        if not store.exists('products'):
             return False
         
         # 计算新库存（不能小于0）
-        current_stock = df.loc[df['product_id'] == product_id, 'stock'].iloc[0]
-        new_stock = max(current_stock + stock_change, 0)
-        df.loc[df['product_id'] == product_id, 'stock'] = new_stock
-        
-        df.to_csv(Config.PRODUCTS_CSV_PATH, index=False, encoding='utf-8-sig')
+        updated = store.adjust('products', {'product_id': product_id}, 'stock', stock_change, min_value=0)
+        if not updated:
+            return False
+        catalog_cache.invalidate()
         return True
     
     @staticmethod
     def delete_product(product_id):
         """删除商品（后台管理用）"""
-        if not os.path.exists(Config.PRODUCTS_CSV_PATH):
+        store = get_store()
+        if not store.exists('products'):
             return False
         
-        df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-        if product_id not in df['product_id'].values:
+        deleted = store.delete('products', {'product_id': product_id})
+        if not deleted:
             return False
-        
-        # 过滤掉要删除的商品
-        df = df[df['product_id'] != product_id]
-        df.to_csv(Config.PRODUCTS_CSV_PATH, index=False, encoding='utf-8-sig')
+        catalog_cache.invalidate()
+        product_search.remove(product_id)
         return True
     
     @staticmethod
@@ -122,13 +137,5 @@ class ProductModel:
             'total_amount': total_amount
         }
         
-        # 写入CSV
-        if os.path.exists(Config.USER_ACTIONS_CSV_PATH):
-            df = pd.read_csv(Config.USER_ACTIONS_CSV_PATH, encoding='utf-8-sig')
-        else:
-            df = pd.DataFrame(columns=action_data.keys())
-        
-        new_row = pd.DataFrame([action_data])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(Config.USER_ACTIONS_CSV_PATH, index=False, encoding='utf-8-sig')
-        return True
\ No newline at end of file
+        # 交给后台写入线程批量追加
+        return submit_action(action_data)
\ No newline at end of file
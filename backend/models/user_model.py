@@ -1,31 +1,27 @@
 #用户数据模型
 #功能：封装用户登录验证、余额充值、收藏管理、行为记录等逻辑
 import pandas as pd
-import os
 import json
-from backend.config import Config
+from backend.storage.engine import get_store
+from backend.utils.user_index import user_index
 from datetime import datetime
 
 class UserModel:
     @staticmethod
     def get_user_by_id(user_id):
         """通过user_id获取用户信息"""
-        if not os.path.exists(Config.USERS_CSV_PATH):
+        if not get_store().exists('users'):
             return None
         
-        df = pd.read_csv(Config.USERS_CSV_PATH, encoding='utf-8-sig')
-        user = df[df['user_id'] == user_id]
-        return user.to_dict('records')[0] if not user.empty else None
+        return user_index.get(user_id)
     
     @staticmethod
     def get_user_by_username(username):
         """通过用户名获取用户信息"""
-        if not os.path.exists(Config.USERS_CSV_PATH):
+        if not get_store().exists('users'):
             return None
         
-        df = pd.read_csv(Config.USERS_CSV_PATH, encoding='utf-8-sig')
-        user = df[df['username'] == username]
-        return user.to_dict('records')[0] if not user.empty else None
+        return user_index.get_by_username(username)
     
     @staticmethod
     def verify_login(username, password):
@@ -50,20 +46,11 @@ class UserModel:
     @staticmethod
     def recharge_balance(user_id, amount):
         """充值/扣减用户余额（amount为正充值，为负扣减）"""
-        if not os.path.exists(Config.USERS_CSV_PATH):
-            return False
-        
-        df = pd.read_csv(Config.USERS_CSV_PATH, encoding='utf-8-sig')
-        if user_id not in df['user_id'].values:
+        if not get_store().exists('users'):
             return False
         
         # 计算新余额（不能小于0）
-        current_balance = df.loc[df['user_id'] == user_id, 'balance'].iloc[0]
-        new_balance = max(current_balance + amount, 0.0)
-        df.loc[df['user_id'] == user_id, 'balance'] = new_balance
-        
-        df.to_csv(Config.USERS_CSV_PATH, index=False, encoding='utf-8-sig')
-        return True
+        return user_index.adjust(user_id, 'balance', amount, min_value=0.0) is not None
     
     @staticmethod
     def get_user_favorites(user_id):
@@ -104,19 +91,12 @@ class UserModel:
     @staticmethod
     def _update_favorites(user_id, favorites):
         """内部方法：更新用户收藏列表到CSV"""
-        if not os.path.exists(Config.USERS_CSV_PATH):
-            return False
-        
-        df = pd.read_csv(Config.USERS_CSV_PATH, encoding='utf-8-sig')
-        if user_id not in df['user_id'].values:
+        if not get_store().exists('users'):
             return False
         
         # 转换为JSON字符串存储
         favorites_str = json.dumps(favorites, ensure_ascii=False)
-        df.loc[df['user_id'] == user_id, 'favorites'] = favorites_str
-        
-        df.to_csv(Config.USERS_CSV_PATH, index=False, encoding='utf-8-sig')
-        return True
+        return user_index.update(user_id, {'favorites': favorites_str})
     
     @staticmethod
     def record_user_action(user_id, product_id, action_type, quantity=1, total_amount=0, product_name='', product_category=''):
@@ -0,0 +1,120 @@
+#存储引擎接口
+#功能：定义模型层调用的数据访问方法，CSV / SQLite 引擎分别实现
+#约定：criteria 为 {列名: 值} 的等值条件（多列为 AND），行数据统一使用 dict 表示
+
+
+class BaseStore:
+    engine = None
+
+    def exists(self, table):
+        """数据表是否已存在"""
+        raise NotImplementedError
+
+    def is_empty(self, table):
+        """数据表不存在或没有数据行"""
+        return not self.exists(table) or self.count(table) == 0
+
+    def stamp(self, table):
+        """数据表版本标记（数据变化后改变，供缓存判断是否失效；表不存在时返回None）"""
+        raise NotImplementedError
+
+    def read_table(self, table):
+        """读取整张表为DataFrame（统计/导出等批量场景使用）"""
+        raise NotImplementedError
+
+    def iter_chunks(self, table, chunk_size, columns=None):
+        """分块读取整张表（导出等大表场景），每次产出不超过 chunk_size 行的DataFrame；columns 为要读取的列"""
+        df = self.read_table(table)
+        if columns is not None:
+            df = df[columns]
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+    def read_appended(self, table, cursor=None, limit=None):
+        """增量读取追加写入的行（用于日志类表的增量统计）
+        返回 (rows, new_cursor, reset)：cursor 为上次返回的游标；cursor 为空或已失效
+        （表被重写/清空）时 reset=True，rows 为整张表的全部行，调用方应丢弃之前的累计结果
+        limit 为本次最多读取的行数（分块读取大表，用返回的游标继续读取下一块）"""
+        raise NotImplementedError
+
+    def count(self, table):
+        """表的行数"""
+        return len(self.read_table(table))
+
+    def find(self, table, **criteria):
+        """按等值条件查询，返回行字典列表"""
+        raise NotImplementedError
+
+    def find_in(self, table, column, values):
+        """查询 column 取值在 values 中的所有行（批量按主键/索引读取），返回行字典列表"""
+        wanted = set(values)
+        return [row for row in self.find(table) if row.get(column) in wanted]
+
+    def find_page(self, table, order_by, limit, before=None, **criteria):
+        """按等值条件查询并按 order_by 各列（按文本比较，空值视为空字符串）倒序取前 limit 行（keyset分页）
+        before 为上一页最后一行在 order_by 各列上的取值（元组），只返回排在它之后的行"""
+        def key(row):
+            return tuple('' if row.get(col) is None else str(row.get(col)) for col in order_by)
+        rows = sorted(self.find(table, **criteria), key=key, reverse=True)
+        if before is not None:
+            rows = [row for row in rows if key(row) < tuple(before)]
+        return rows[:limit]
+
+    def find_one(self, table, **criteria):
+        """按等值条件查询单行，不存在返回None"""
+        rows = self.find(table, **criteria)
+        return rows[0] if rows else None
+
+    def insert(self, table, row):
+        """插入单行"""
+        return self.insert_many(table, [row])
+
+    def insert_many(self, table, rows):
+        """批量插入（追加到表尾）"""
+        raise NotImplementedError
+
+    def update(self, table, criteria, values):
+        """更新满足条件的行，返回更新行数"""
+        return self.update_many(table, [(criteria, values)])
+
+    def update_many(self, table, updates):
+        """批量更新：updates 为 [(criteria, values), ...]，一次写入完成，返回更新行数"""
+        raise NotImplementedError
+
+    def adjust(self, table, criteria, column, delta, min_value=None):
+        """数值列增减（如库存、余额），可指定下限；返回更新行数"""
+        raise NotImplementedError
+
+    def delete(self, table, criteria):
+        """删除满足条件的行，返回删除行数"""
+        raise NotImplementedError
+
+    def apply_batch(self, table, ops):
+        """按顺序执行一张表的一批写操作（工作单元提交时调用，调用方已锁定该表）
+        ops 元素：('insert', rows) / ('update', criteria, values) / ('adjust', criteria, column, delta, min_value) / ('delete', criteria)"""
+        for op in ops:
+            kind, args = op[0], op[1:]
+            if kind == 'insert':
+                self.insert_many(table, *args)
+            elif kind == 'update':
+                self.update(table, *args)
+            elif kind == 'adjust':
+                self.adjust(table, *args)
+            elif kind == 'delete':
+                self.delete(table, *args)
+            else:
+                raise ValueError(f'未知的写操作：{kind}')
+
+    def replace_table(self, table, df):
+        """用DataFrame整体替换表内容"""
+        raise NotImplementedError
+
+    def reserve_ids(self, table, column, count=1):
+        """原子地从表的持久化序列中预留 count 个连续ID，返回第一个ID
+        （序列首次使用时以该列现有最大值为起点）"""
+        raise NotImplementedError
+
+    def locked(self, *tables):
+        """读-改-写事务：返回上下文管理器，期间对指定表的写入与其他线程/进程互斥
+        （CSV引擎为文件锁，SQLite引擎为 BEGIN IMMEDIATE 事务），块内可继续调用本引擎的读写方法"""
+        raise NotImplementedError
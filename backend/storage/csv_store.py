@@ -0,0 +1,362 @@
+#CSV存储引擎
+#功能：沿用 data/*.csv 文件布局；读取使用pandas，插入以追加方式写入，更新/删除重写整个文件
+#并发：所有写操作持有该文件的跨进程排他锁，重写通过临时文件 + os.replace 原子完成（见 file_lock.py）
+import csv
+import io
+import math
+import os
+import threading
+import pandas as pd
+from backend.config import Config
+from backend.storage.base import BaseStore
+from backend.storage.file_lock import atomic_write, atomic_write_csv, file_lock, file_locks
+from backend.storage.schema import get_table, text_columns
+
+_append_lock = threading.Lock()
+_header_cache = {}  # (文件路径, inode) -> 现有表头（避免每次追加都读取首行）
+
+
+def _read_header(path):
+    """读取已有文件的表头（兼容带BOM的utf-8-sig文件）"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), None)
+
+
+def _forget_header(path):
+    """文件被整体重写后表头可能变化，清除该文件的表头缓存"""
+    with _append_lock:
+        for key in [key for key in _header_cache if key[0] == path]:
+            del _header_cache[key]
+
+
+def _csv_value(value):
+    """空值写为空字符串，与pandas的to_csv输出一致"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return value
+
+
+def append_csv_rows(path, rows, default_fields, fsync=True):
+    """以追加方式写入多行：新文件先写带BOM的表头，已有文件按其表头列顺序追加"""
+    with file_lock(path), _append_lock:
+        try:
+            st = os.stat(path)
+            new_file = st.st_size == 0
+        except FileNotFoundError:
+            new_file = True
+        if new_file:
+            fieldnames = list(default_fields)
+        else:
+            key = (path, st.st_ino)
+            fieldnames = _header_cache.get(key)
+            if fieldnames is None:
+                fieldnames = _header_cache[key] = _read_header(path) or list(default_fields)
+
+        with open(path, 'a', encoding='utf-8-sig' if new_file else 'utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore', lineterminator=os.linesep)
+            if new_file:
+                writer.writeheader()
+            writer.writerows({k: _csv_value(v) for k, v in row.items()} for row in rows)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+    return True
+
+
+def parse_csv_value(value, col_type):
+    """CSV文本按表结构转换类型（与pandas读取结果一致：空字符串为NaN）"""
+    if value == '':
+        return math.nan
+    if col_type == 'TEXT':
+        return value
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    if col_type == 'REAL':
+        return number
+    return int(number) if number.is_integer() and '.' not in value else number
+
+
+def scan_csv_records(f, start, on_record):
+    """从二进制文件 f 的 start 位置开始逐条解析完整的CSV记录（含表头行），对每条记录调用
+    on_record(字段列表, 偏移, 长度)；返回扫描结束位置（不含末尾尚未写完的记录），供增量索引下次从此处继续"""
+    f.seek(start)
+    position = start
+    pending = b''
+    pending_start = start
+    for line in iter(f.readline, b''):
+        if not pending:
+            pending_start = position
+        pending += line
+        position += len(line)
+        # 引号成对且以换行结尾才是完整记录（字段内可能含换行）
+        if pending.count(b'"') % 2 or not pending.endswith(b'\n'):
+            continue
+        text = pending.decode('utf-8-sig' if pending_start == 0 else 'utf-8')
+        pending = b''
+        on_record(next(csv.reader(io.StringIO(text)), []), pending_start, position - pending_start)
+    return position - len(pending)
+
+
+def _records_end(f, start, limit):
+    """从 start 开始至多 limit 条完整记录之后的位置（引号成对且以换行结尾才是完整记录）"""
+    f.seek(start)
+    position = end = start
+    quotes = 0
+    count = 0
+    while count < limit:
+        line = f.readline()
+        if not line:
+            break
+        position += len(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0 and line.endswith(b'\n'):
+            count += 1
+            end = position
+            quotes = 0
+    return end
+
+
+def read_csv_record(f, offset, length):
+    """按偏移和长度读取一条CSV记录，返回字段列表"""
+    f.seek(offset)
+    text = f.read(length).decode('utf-8-sig' if offset == 0 else 'utf-8')
+    return next(csv.reader(io.StringIO(text)), [])
+
+
+def _mask(df, criteria):
+    mask = pd.Series(True, index=df.index)
+    for column, value in criteria.items():
+        if column not in df.columns:
+            return pd.Series(False, index=df.index)
+        series = df[column]
+        if not pd.api.types.is_numeric_dtype(series) and not isinstance(value, str):
+            # 混合类型列（如订单表中同时存在数字ID与字符串ID）按文本比较
+            mask &= series.astype(str) == str(value)
+        else:
+            mask &= series == value
+    return mask
+
+
+def _assign(df, mask, column, value):
+    """按掩码赋值；类型不兼容时（如数值列写入字符串）先转为object列"""
+    try:
+        df.loc[mask, column] = value
+    except (TypeError, ValueError):
+        df[column] = df[column].astype(object)
+        df.loc[mask, column] = value
+
+
+class CsvStore(BaseStore):
+    engine = 'csv'
+
+    def _path(self, table):
+        return get_table(table)['path']
+
+    def _columns(self, table):
+        return list(get_table(table)['columns'].keys())
+
+    def _write(self, table, df):
+        path = self._path(table)
+        atomic_write_csv(path, df)
+        _forget_header(path)
+
+    def locked(self, *tables):
+        return file_locks(self._path(table) for table in tables)
+
+    def exists(self, table):
+        return os.path.exists(self._path(table))
+
+    def is_empty(self, table):
+        # 只读取表头之后的第一行，不解析整个文件
+        try:
+            with open(self._path(table), 'rb') as f:
+                f.readline()
+                return not f.readline().strip()
+        except FileNotFoundError:
+            return True
+
+    def stamp(self, table):
+        try:
+            st = os.stat(self._path(table))
+        except OSError:
+            return None
+        # 原子替换会生成新inode，即使mtime精度不足也能识别文件已变化
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def read_table(self, table):
+        path = self._path(table)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return pd.DataFrame(columns=self._columns(table))
+        return pd.read_csv(path, encoding='utf-8-sig', dtype={col: str for col in text_columns(table)})
+
+    def count(self, table):
+        # 只解析第一列并分块计数，不把整表读入内存
+        path = self._path(table)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return 0
+        reader = pd.read_csv(path, encoding='utf-8-sig', usecols=[0], dtype=str, chunksize=100000)
+        return sum(len(chunk) for chunk in reader)
+
+    def iter_chunks(self, table, chunk_size, columns=None):
+        # 打开文件后按块解析：读取期间文件即使被原子替换，读到的仍是打开时的那份数据
+        path = self._path(table)
+        try:
+            f = open(path, 'r', encoding='utf-8-sig', newline='')
+        except FileNotFoundError:
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            # 文件中缺少的列（如旧布局的订单表）按空值输出
+            usecols = (lambda col: col in columns) if columns is not None else None
+            reader = pd.read_csv(f, chunksize=chunk_size, usecols=usecols,
+                                 dtype={col: str for col in text_columns(table)})
+            for chunk in reader:
+                yield chunk.reindex(columns=columns) if columns is not None else chunk
+
+    def read_appended(self, table, cursor=None, limit=None):
+        # 游标为 [文件inode, 已读取到的字节位置]；文件被原子替换（inode变化）或变短时视为失效
+        path = self._path(table)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return [], None, True
+        with f:
+            st = os.fstat(f.fileno())
+            reset = not cursor or cursor[0] != st.st_ino or cursor[1] > st.st_size
+            start = 0 if reset else cursor[1]
+            if limit is not None:
+                # 分块读取：只读到第 limit 条完整记录（从文件开头读取时表头也算一条）
+                end = _records_end(f, start, limit + (start == 0)) - start
+                f.seek(start)
+                data = f.read(end)
+            else:
+                f.seek(start)
+                data = f.read(st.st_size - start)
+                # 只处理完整的记录：截到最后一个换行（且引号成对，避免截断字段内的换行）
+                end = data.rfind(b'\n') + 1
+                while end and data[:end].count(b'"') % 2:
+                    end = data.rfind(b'\n', 0, end - 1) + 1
+                data = data[:end]
+            if not reset and data:
+                # 增量部分补上表头再交给pandas解析
+                f.seek(0)
+                data = f.readline() + data
+        new_cursor = [st.st_ino, start + end]
+        if not data.strip():
+            return [], new_cursor, reset
+        df = pd.read_csv(io.BytesIO(data), encoding='utf-8-sig', dtype={col: str for col in text_columns(table)})
+        return df.to_dict('records'), new_cursor, reset
+
+    def find(self, table, **criteria):
+        df = self.read_table(table)
+        if criteria:
+            df = df[_mask(df, criteria)]
+        return df.to_dict('records')
+
+    def insert_many(self, table, rows):
+        if not rows:
+            return 0
+        path = self._path(table)
+        with file_lock(path):
+            header = _read_header(path) if os.path.exists(path) and os.path.getsize(path) > 0 else None
+            # 新文件的表头按行数据中列出现的顺序确定（与pandas由行字典建表一致）
+            fields = list(dict.fromkeys(key for row in rows for key in row))
+            if header is None or set(fields).issubset(header):
+                # 列一致：直接追加，无需读取整个文件
+                append_csv_rows(path, rows, header or fields)
+            else:
+                # 出现新列：按pandas合并列后整体重写（保持原有行为）
+                df = pd.concat([self.read_table(table), pd.DataFrame(rows)], ignore_index=True)
+                self._write(table, df)
+        return len(rows)
+
+    def update_many(self, table, updates):
+        with self.locked(table):
+            df = self.read_table(table)
+            updated = 0
+            for criteria, values in updates:
+                mask = _mask(df, criteria)
+                count = int(mask.sum())
+                if not count:
+                    continue
+                for column, value in values.items():
+                    if column in df.columns:
+                        _assign(df, mask, column, value)
+                updated += count
+            if updated:
+                self._write(table, df)
+        return updated
+
+    def adjust(self, table, criteria, column, delta, min_value=None):
+        with self.locked(table):
+            df = self.read_table(table)
+            mask = _mask(df, criteria)
+            count = int(mask.sum())
+            if not count:
+                return 0
+            new_values = df.loc[mask, column] + delta
+            if min_value is not None:
+                new_values = new_values.clip(lower=min_value)
+            _assign(df, mask, column, new_values)
+            self._write(table, df)
+        return count
+
+    def delete(self, table, criteria):
+        with self.locked(table):
+            df = self.read_table(table)
+            mask = _mask(df, criteria)
+            count = int(mask.sum())
+            if count:
+                self._write(table, df[~mask])
+        return count
+
+    def apply_batch(self, table, ops):
+        # 只有插入：合并为一次追加；否则读取一次整表，在内存中依次执行后重写一次
+        if all(op[0] == 'insert' for op in ops):
+            return self.insert_many(table, [row for op in ops for row in op[1]])
+        with self.locked(table):
+            df = self.read_table(table)
+            for op in ops:
+                kind = op[0]
+                if kind == 'insert':
+                    if op[1]:
+                        df = pd.concat([df, pd.DataFrame(op[1])], ignore_index=True)
+                    continue
+                mask = _mask(df, op[1])
+                if kind == 'update':
+                    for column, value in op[2].items():
+                        if column in df.columns:
+                            _assign(df, mask, column, value)
+                elif kind == 'adjust':
+                    _, _, column, delta, min_value = op
+                    new_values = df.loc[mask, column] + delta
+                    if min_value is not None:
+                        new_values = new_values.clip(lower=min_value)
+                    _assign(df, mask, column, new_values)
+                elif kind == 'delete':
+                    df = df[~mask]
+                else:
+                    raise ValueError(f'未知的写操作：{kind}')
+            self._write(table, df)
+
+    def replace_table(self, table, df):
+        with self.locked(table):
+            self._write(table, df)
+
+    def reserve_ids(self, table, column, count=1):
+        # 每张表一个计数文件，内容为已分配的最大ID
+        path = os.path.join(Config.SEQUENCE_DIR, f'{table}.seq')
+        with file_lock(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    current = int(f.read().strip() or 0)
+            except FileNotFoundError:
+                os.makedirs(Config.SEQUENCE_DIR, exist_ok=True)
+                # 首次使用：扫描一次现有数据确定起点（非数字ID忽略；文件为原子替换，无需加表锁）
+                values = pd.to_numeric(self.read_table(table)[column], errors='coerce')
+                current = 0 if values.dropna().empty else int(values.max())
+            atomic_write(path, lambda f: f.write(str(current + count)), encoding='utf-8')
+        return current + 1
@@ -0,0 +1,35 @@
+#存储引擎入口
+#功能：按配置（Config.STORAGE_ENGINE）创建进程内唯一的存储引擎实例，模型层统一通过 get_store() 访问数据
+import threading
+from backend.config import Config
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_store(engine=None):
+    """创建指定类型的存储引擎（csv / sqlite）"""
+    engine = engine or Config.STORAGE_ENGINE
+    if engine == 'csv':
+        from backend.storage.csv_store import CsvStore
+        return CsvStore()
+    if engine == 'sqlite':
+        from backend.storage.sqlite_store import SqliteStore
+        return SqliteStore(Config.SQLITE_DB_PATH)
+    raise ValueError(f"不支持的存储引擎：{engine}")
+
+
+def get_store():
+    """获取当前配置的存储引擎（单例）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def data_version(*tables):
+    """多张表的数据版本：各表的存储版本标记（CSV为文件inode/mtime/大小，SQLite为表版本号），任一表变化即改变"""
+    store = get_store()
+    return tuple(store.stamp(table) for table in tables)
@@ -0,0 +1,117 @@
+#跨进程文件锁与原子替换
+#功能：CSV引擎的写操作在 <文件>.lock 上加排他锁（POSIX使用fcntl.flock，Windows使用msvcrt.locking），
+#      重写文件时先写临时文件再 os.replace，多进程（如gunicorn多worker）并发写入不会互相覆盖，
+#      读取方也不会读到写了一半的文件
+#约定：同一线程内对同一文件可重入加锁（外层读-改-写事务内再调用存储引擎的写方法）
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_local = threading.local()
+
+
+def _held():
+    """当前线程已持有的锁：锁文件路径 -> [文件句柄, 重入次数]"""
+    held = getattr(_local, 'held', None)
+    if held is None or getattr(_local, 'pid', None) != os.getpid():
+        # fork后的子进程不继承父进程线程持有的锁
+        held = _local.held = {}
+        _local.pid = os.getpid()
+    return held
+
+
+def _acquire(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:  # LK_LOCK 重试约10秒后仍未获得锁会抛出异常，继续等待
+            time.sleep(0.05)
+
+
+def _release(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path):
+    """对数据文件加跨进程排他锁（锁文件为 path + '.lock'，数据文件本身可被原子替换）"""
+    lock_path = os.path.abspath(path) + '.lock'
+    held = _held()
+    entry = held.get(lock_path)
+    if entry is not None:
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+        return
+
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    f = open(lock_path, 'a+b')
+    try:
+        _acquire(f)
+        held[lock_path] = [f, 1]
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            _release(f)
+    finally:
+        f.close()
+
+
+@contextmanager
+def file_locks(paths):
+    """同时锁定多个文件（按路径排序加锁，避免不同进程交叉加锁导致死锁）"""
+    paths = sorted(set(os.path.abspath(p) for p in paths))
+    if not paths:
+        yield
+        return
+    with file_lock(paths[0]):
+        with file_locks(paths[1:]):
+            yield
+
+
+def atomic_write(path, write_func, mode='w', **open_kwargs):
+    """先写同目录临时文件并fsync，再用 os.replace 原子替换目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp创建的文件权限为0600，沿用原文件权限
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_csv(path, df):
+    """DataFrame原子写入CSV（utf-8-sig编码，与原有 to_csv 输出一致）"""
+    atomic_write(path, lambda f: df.to_csv(f, index=False), encoding='utf-8-sig', newline='')
@@ -0,0 +1,57 @@
+#数据迁移命令
+#功能：把现有 data/*.csv 导入SQLite数据库（切换 STORAGE_ENGINE=sqlite 前执行一次）
+#用法：python -m backend.storage.migrate [--db data/ecommerce.db] [--tables products,users] [--replace]
+import argparse
+from backend.config import Config
+from backend.storage.csv_store import CsvStore
+from backend.storage.schema import TABLES
+from backend.storage.sqlite_store import SqliteStore
+
+
+def migrate_csv_to_sqlite(db_path=None, tables=None, replace=False):
+    """逐表导入CSV数据；replace=True 时先清空目标表，否则跳过已有数据的表"""
+    source = CsvStore()
+    # 新建的数据库不写入默认商品/用户，由CSV数据导入
+    target = SqliteStore(db_path or Config.SQLITE_DB_PATH, seed_defaults=False)
+    result = {}
+    for table in tables or TABLES:
+        if not source.exists(table):
+            print(f"• {table}：CSV文件不存在，跳过")
+            continue
+        df = source.read_table(table)
+        primary_key = TABLES[table]['primary_key']
+        if primary_key and not df.empty:
+            # CSV中可能存在重复主键，保留最后一条
+            df = df.drop_duplicates(subset=primary_key, keep='last')
+        with target.transaction():
+            existing = target.count(table)
+            if existing and not replace:
+                print(f"• {table}：目标表已有{existing}条数据，跳过（使用 --replace 覆盖）")
+                continue
+            if existing:
+                target.delete(table, {})
+            target.insert_many(table, df.to_dict('records'))
+        result[table] = len(df)
+        print(f"✅ {table}：导入{len(df)}条")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把 data/*.csv 导入SQLite数据库')
+    parser.add_argument('--db', default=Config.SQLITE_DB_PATH, help='SQLite数据库文件路径')
+    parser.add_argument('--tables', default='', help='只迁移指定表（逗号分隔），默认全部')
+    parser.add_argument('--replace', action='store_true', help='覆盖目标表中已有的数据')
+    args = parser.parse_args()
+
+    tables = [t for t in args.tables.split(',') if t] or None
+    unknown = [t for t in tables or [] if t not in TABLES]
+    if unknown:
+        parser.error(f"未知数据表：{', '.join(unknown)}")
+
+    print(f"===== 数据迁移开始：CSV → {args.db} =====")
+    migrate_csv_to_sqlite(args.db, tables, args.replace)
+    print("===== 数据迁移结束 =====")
+
+
+if __name__ == '__main__':
+    main()
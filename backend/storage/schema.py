@@ -0,0 +1,89 @@
+#数据表结构定义
+#功能：集中描述各数据表的列、主键和索引，CSV 与 SQLite 两种存储引擎共用
+from backend.config import Config
+
+# 列类型使用SQLite类型名；CSV引擎中 TEXT 列按字符串读取，其余列由pandas推断
+# orders 为订单主表，商品明细保存在 order_items（每个商品一行）；
+# orders 中的 product_ids/product_names/quantities 与 items 为两种历史订单布局的列，只读兼容，新订单不再写入
+TABLES = {
+    'products': {
+        'path': Config.PRODUCTS_CSV_PATH,
+        'columns': {
+            'product_id': 'INTEGER', 'name': 'TEXT', 'category': 'TEXT', 'price': 'REAL',
+            'stock': 'INTEGER', 'description': 'TEXT', 'image': 'TEXT'
+        },
+        'primary_key': ['product_id'],
+        'indexes': [['category']],
+    },
+    'users': {
+        'path': Config.USERS_CSV_PATH,
+        'columns': {
+            'user_id': 'TEXT', 'username': 'TEXT', 'password': 'TEXT', 'phone': 'TEXT',
+            'balance': 'REAL', 'favorites': 'TEXT', 'is_admin': 'BOOLEAN'
+        },
+        'primary_key': ['user_id'],
+        'indexes': [['username'], ['phone']],
+    },
+    'orders': {
+        'path': Config.ORDERS_CSV_PATH,
+        'columns': {
+            'order_id': '', 'user_id': 'TEXT', 'username': 'TEXT', 'product_ids': 'TEXT',
+            'product_names': 'TEXT', 'quantities': 'TEXT', 'total_amount': 'REAL',
+            'create_time': 'TEXT', 'status': 'TEXT', 'items': 'TEXT'
+        },
+        'primary_key': ['order_id'],
+        'indexes': [['user_id', 'create_time'], ['create_time', 'order_id'], ['status', 'create_time']],
+    },
+    'order_items': {
+        'path': Config.ORDER_ITEMS_CSV_PATH,
+        'columns': {
+            'order_id': 'TEXT', 'line_no': 'INTEGER', 'product_id': 'INTEGER', 'product_name': 'TEXT',
+            'image': 'TEXT', 'price': 'REAL', 'quantity': 'INTEGER'
+        },
+        'primary_key': ['order_id', 'line_no'],
+        'indexes': [['product_id']],
+    },
+    'user_actions': {
+        'path': Config.USER_ACTIONS_CSV_PATH,
+        'columns': {
+            'timestamp': 'TEXT', 'user_id': 'TEXT', 'username': 'TEXT', 'product_id': 'INTEGER',
+            'product_name': 'TEXT', 'product_category': 'TEXT', 'action_type': 'TEXT',
+            'session_id': 'TEXT', 'quantity': 'INTEGER', 'total_amount': 'REAL'
+        },
+        'primary_key': [],
+        'indexes': [['user_id', 'action_type'], ['product_id']],
+    },
+    'addresses': {
+        'path': Config.ADDRESSES_CSV_PATH,
+        'columns': {
+            'address_id': 'INTEGER', 'user_id': 'TEXT', 'receiver': 'TEXT', 'phone': 'TEXT',
+            'province': 'TEXT', 'city': 'TEXT', 'detail_address': 'TEXT', 'is_default': 'BOOLEAN'
+        },
+        'primary_key': ['address_id'],
+        'indexes': [['user_id']],
+    },
+    'cart': {
+        'path': Config.CART_CSV_PATH,
+        'columns': {'user_id': 'TEXT', 'product_id': 'INTEGER', 'quantity': 'INTEGER'},
+        'primary_key': ['user_id', 'product_id'],
+        'indexes': [],
+    },
+    'user_favorites': {
+        'path': Config.FAVORITES_CSV_PATH,
+        'columns': {'user_id': 'TEXT', 'product_id': 'INTEGER', 'add_time': 'TEXT'},
+        'primary_key': ['user_id', 'product_id'],
+        'indexes': [],
+    },
+}
+
+
+def get_table(table):
+    """获取表定义（未知表名抛出KeyError）"""
+    if table not in TABLES:
+        raise KeyError(f"未知数据表：{table}")
+    return TABLES[table]
+
+
+def text_columns(table):
+    """需要按字符串读取的列（避免手机号、用户ID被推断为数字）"""
+    return [col for col, col_type in get_table(table)['columns'].items() if col_type == 'TEXT']
@@ -0,0 +1,42 @@
+#ID序列分配器
+#功能：为商品/订单/地址等实体分配自增ID，替代“读取整表求 max()+1”的做法
+#      持久化计数由存储引擎保存（CSV引擎为 data/sequences/<表名>.seq 文件，SQLite引擎为 _sequences 表），
+#      分配在跨进程锁/事务内完成，并发创建不会得到重复ID；每次分配为O(1)，不再读取整张表
+#      Config.ID_BLOCK_SIZE 大于1时，每个进程一次预留一段ID，段内分配只在内存中进行
+import os
+import threading
+from backend.config import Config
+from backend.storage.engine import get_store
+from backend.storage.schema import get_table
+
+
+class SequenceAllocator:
+    def __init__(self, block_size=None):
+        self.block_size = max(1, block_size or Config.ID_BLOCK_SIZE)
+        self._lock = threading.Lock()
+        self._blocks = {}  # 表名 -> [下一个可用ID, 本段结束ID(不含)]
+        self._pid = os.getpid()
+
+    def next_id(self, table, column=None):
+        """分配一个新ID（column 默认为表的主键列）"""
+        column = column or get_table(table)['primary_key'][0]
+        with self._lock:
+            if self._pid != os.getpid():
+                # fork出的子进程不能复用父进程预留的ID段
+                self._blocks = {}
+                self._pid = os.getpid()
+            block = self._blocks.get(table)
+            if block is None or block[0] >= block[1]:
+                start = get_store().reserve_ids(table, column, self.block_size)
+                block = self._blocks[table] = [start, start + self.block_size]
+            new_id = block[0]
+            block[0] += 1
+            return new_id
+
+
+sequence_allocator = SequenceAllocator()
+
+
+def next_id(table, column=None):
+    """从全局分配器获取表的下一个ID"""
+    return sequence_allocator.next_id(table, column)
@@ -0,0 +1,301 @@
+#SQLite存储引擎
+#功能：嵌入式数据库存储（WAL模式），按主键/索引查询与单行更新为O(log n)，支持多进程并发写入
+#      _table_versions 表由触发器维护每张表的修改计数，作为跨进程一致的缓存版本标记
+#建表：首次连接新数据库时创建全部数据表，并写入默认商品与匿名用户（与CSV引擎 init_dirs 创建的默认文件一致）
+import json
+import math
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from backend.config import Config
+from backend.storage.base import BaseStore
+from backend.storage.schema import TABLES, get_table
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _adapt(value):
+    """Python/pandas值转换为SQLite可存储的值"""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if hasattr(value, 'item'):  # numpy标量
+        return _adapt(value.item())
+    return value
+
+
+def _where(criteria):
+    if not criteria:
+        return '', []
+    clause = ' AND '.join(f'{_quote(col)} = ?' for col in criteria)
+    return ' WHERE ' + clause, [_adapt(v) for v in criteria.values()]
+
+
+class SqliteStore(BaseStore):
+    engine = 'sqlite'
+
+    def __init__(self, db_path, seed_defaults=True):
+        self.db_path = db_path
+        self.seed_defaults = seed_defaults
+        self._local = threading.local()
+        self._columns_cache = {}
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    # ---------------------- 连接与事务 ----------------------
+    def _conn(self):
+        """每个线程（及fork出的进程）使用独立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._ensure_schema(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """写事务：BEGIN IMMEDIATE 立即获取写锁，多进程写入串行化"""
+        conn = self._conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def locked(self, *tables):
+        # 写事务已锁定整个数据库，tables 仅用于与CSV引擎保持一致的调用方式
+        return self.transaction()
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                created = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '_table_versions'").fetchone() is None
+                conn.execute('CREATE TABLE IF NOT EXISTS _table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)')
+                conn.execute('CREATE TABLE IF NOT EXISTS _sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+                for table, spec in TABLES.items():
+                    cols = [f'{_quote(col)} {col_type}'.strip() for col, col_type in spec['columns'].items()]
+                    if spec['primary_key']:
+                        cols.append('PRIMARY KEY (' + ', '.join(_quote(c) for c in spec['primary_key']) + ')')
+                    conn.execute(f'CREATE TABLE IF NOT EXISTS {_quote(table)} ({", ".join(cols)})')
+                    for index_cols in spec['indexes']:
+                        index_name = _quote(f'idx_{table}_' + '_'.join(index_cols))
+                        conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {_quote(table)} ({", ".join(_quote(c) for c in index_cols)})')
+                    conn.execute('INSERT OR IGNORE INTO _table_versions (name, version) VALUES (?, 0)', (table,))
+                    for event in ('INSERT', 'UPDATE', 'DELETE'):
+                        trigger = _quote(f'trg_{table}_{event.lower()}_version')
+                        conn.execute(
+                            f'CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {_quote(table)} '
+                            f"BEGIN UPDATE _table_versions SET version = version + 1 WHERE name = '{table}'; END"
+                        )
+                if created and self.seed_defaults:
+                    for table, rows in (('products', Config.DEFAULT_PRODUCTS), ('users', Config.DEFAULT_USERS)):
+                        for row in rows:
+                            conn.execute(f'INSERT INTO {_quote(table)} ({", ".join(_quote(k) for k in row)}) '
+                                         f'VALUES ({", ".join("?" for _ in row)})', [_adapt(v) for v in row.values()])
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._schema_ready = True
+
+    def _table_columns(self, conn, table):
+        columns = self._columns_cache.get(table)
+        if columns is None:
+            columns = [row['name'] for row in conn.execute(f'PRAGMA table_info({_quote(table)})')]
+            self._columns_cache[table] = columns
+        return columns
+
+    def _ensure_columns(self, conn, table, keys):
+        """插入数据出现新列时自动加列（与CSV引擎合并列的行为一致）"""
+        columns = self._table_columns(conn, table)
+        if any(key not in columns for key in keys):
+            # 其他进程可能已加列，先刷新列缓存
+            self._columns_cache.pop(table, None)
+            columns = self._table_columns(conn, table)
+        for key in keys:
+            if key not in columns:
+                conn.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(key)}')
+                columns.append(key)
+
+    # ---------------------- 读取 ----------------------
+    def exists(self, table):
+        # 全部数据表在建库时创建（与CSV引擎启动时创建全部CSV文件一致），表中是否有数据由 is_empty 判断
+        get_table(table)
+        return True
+
+    def is_empty(self, table):
+        get_table(table)
+        return self._conn().execute(f'SELECT 1 FROM {_quote(table)} LIMIT 1').fetchone() is None
+
+    def stamp(self, table):
+        row = self._conn().execute('SELECT version FROM _table_versions WHERE name = ?', (table,)).fetchone()
+        return row['version'] if row else None
+
+    def read_table(self, table):
+        get_table(table)
+        return pd.read_sql_query(f'SELECT * FROM {_quote(table)}', self._conn())
+
+    def iter_chunks(self, table, chunk_size, columns=None):
+        get_table(table)
+        select = ', '.join(_quote(col) for col in columns) if columns is not None else '*'
+        yield from pd.read_sql_query(f'SELECT {select} FROM {_quote(table)} ORDER BY rowid', self._conn(), chunksize=chunk_size)
+
+    def find(self, table, **criteria):
+        get_table(table)
+        where, params = _where(criteria)
+        rows = self._conn().execute(f'SELECT * FROM {_quote(table)}{where}', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_in(self, table, column, values):
+        get_table(table)
+        values = list(dict.fromkeys(_adapt(v) for v in values))
+        rows = []
+        # 分批查询，避免超过SQLite单条语句的参数个数上限
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            sql = f'SELECT * FROM {_quote(table)} WHERE {_quote(column)} IN ({", ".join("?" for _ in batch)})'
+            rows.extend(dict(row) for row in self._conn().execute(sql, batch))
+        return rows
+
+    def find_page(self, table, order_by, limit, before=None, **criteria):
+        get_table(table)
+        where, params = _where(criteria)
+        columns = get_table(table)['columns']
+        # TEXT列直接比较（可使用索引），其余列转为文本比较
+        keys = [_quote(col) if columns.get(col) == 'TEXT' else f'CAST({_quote(col)} AS TEXT)' for col in order_by]
+        if before is not None:
+            # 首列的范围条件让 (status, create_time) / (create_time, order_id) 等索引直接定位到游标处，只扫描一页
+            condition = (f'{keys[0]} <= ? AND ({", ".join(keys)}) < ({", ".join("?" for _ in keys)})'
+                         if len(keys) > 1 else f'{keys[0]} < ?')
+            where = f'{where} AND {condition}' if where else f' WHERE {condition}'
+            params = params + ([before[0]] if len(keys) > 1 else []) + list(before)
+        order = ', '.join(f'{key} DESC' for key in keys)
+        rows = self._conn().execute(f'SELECT * FROM {_quote(table)}{where} ORDER BY {order} LIMIT ?',
+                                    params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def read_appended(self, table, cursor=None, limit=None):
+        # 游标为 [最后读取的rowid, 该行内容]；该行不存在或内容不同（表被清空重建）时视为失效
+        get_table(table)
+        conn = self._conn()
+        reset = not cursor
+        if not reset and cursor[0]:
+            row = conn.execute(f'SELECT * FROM {_quote(table)} WHERE rowid = ?', (cursor[0],)).fetchone()
+            reset = row is None or json.dumps(list(row), ensure_ascii=False, default=str) != cursor[1]
+        last_rowid = 0 if reset else cursor[0]
+        sql = f'SELECT rowid AS _rowid, * FROM {_quote(table)} WHERE rowid > ? ORDER BY rowid'
+        params = [last_rowid]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return [], cursor if not reset else [0, None], reset
+        last = dict(rows[-1])
+        last_rowid = last.pop('_rowid')
+        new_cursor = [last_rowid, json.dumps(list(last.values()), ensure_ascii=False, default=str)]
+        records = []
+        for row in rows:
+            record = dict(row)
+            record.pop('_rowid')
+            records.append(record)
+        return records, new_cursor, reset
+
+    def count(self, table):
+        return self._conn().execute(f'SELECT COUNT(*) FROM {_quote(table)}').fetchone()[0]
+
+    # ---------------------- 写入 ----------------------
+    def insert_many(self, table, rows):
+        get_table(table)
+        if not rows:
+            return 0
+        keys = list(dict.fromkeys(key for row in rows for key in row))
+        sql = f'INSERT INTO {_quote(table)} ({", ".join(_quote(k) for k in keys)}) VALUES ({", ".join("?" for _ in keys)})'
+        with self.transaction() as conn:
+            self._ensure_columns(conn, table, keys)
+            conn.executemany(sql, [[_adapt(row.get(k)) for k in keys] for row in rows])
+        return len(rows)
+
+    def update_many(self, table, updates):
+        get_table(table)
+        updated = 0
+        with self.transaction() as conn:
+            columns = self._table_columns(conn, table)
+            for criteria, values in updates:
+                values = {k: v for k, v in values.items() if k in columns}
+                if not values:
+                    continue
+                where, params = _where(criteria)
+                assignments = ', '.join(f'{_quote(col)} = ?' for col in values)
+                cursor = conn.execute(f'UPDATE {_quote(table)} SET {assignments}{where}',
+                                      [_adapt(v) for v in values.values()] + params)
+                updated += cursor.rowcount
+        return updated
+
+    def adjust(self, table, criteria, column, delta, min_value=None):
+        get_table(table)
+        where, params = _where(criteria)
+        expr = f'{_quote(column)} + ?'
+        expr_params = [_adapt(delta)]
+        if min_value is not None:
+            expr = f'MAX({expr}, ?)'
+            expr_params.append(_adapt(min_value))
+        with self.transaction() as conn:
+            cursor = conn.execute(f'UPDATE {_quote(table)} SET {_quote(column)} = {expr}{where}', expr_params + params)
+        return cursor.rowcount
+
+    def delete(self, table, criteria):
+        get_table(table)
+        where, params = _where(criteria)
+        with self.transaction() as conn:
+            cursor = conn.execute(f'DELETE FROM {_quote(table)}{where}', params)
+        return cursor.rowcount
+
+    def reserve_ids(self, table, column, count=1):
+        get_table(table)
+        with self.transaction() as conn:
+            row = conn.execute('SELECT value FROM _sequences WHERE name = ?', (table,)).fetchone()
+            if row is None:
+                # 首次使用：以现有最大数字ID为起点（含从CSV导入的数字文本；订单表中的字符串ID不参与）
+                col = _quote(column)
+                row = conn.execute(f"SELECT MAX(CAST({col} AS INTEGER)) FROM {_quote(table)} "
+                                   f"WHERE typeof({col}) IN ('integer', 'real') "
+                                   f"OR ({col} GLOB '[0-9]*' AND {col} NOT GLOB '*[^0-9]*')").fetchone()
+                current = int(row[0] or 0)
+                conn.execute('INSERT INTO _sequences (name, value) VALUES (?, ?)', (table, current + count))
+            else:
+                current = row['value']
+                conn.execute('UPDATE _sequences SET value = ? WHERE name = ?', (current + count, table))
+        return current + 1
+
+    def replace_table(self, table, df):
+        rows = df.to_dict('records')
+        with self.transaction():
+            self.delete(table, {})
+            self.insert_many(table, rows)
@@ -0,0 +1,74 @@
+#工作单元（一次提交的多表写入）
+#功能：一次业务操作（如下单结算）涉及多张表时，先在锁内读取、校验并暂存全部写入，校验通过后按表批量提交：
+#      每张表只写一次（CSV引擎：只有插入时追加一次，有更新/删除时读取一次、重写一次；SQLite引擎：同一事务内执行）
+#      块内抛出异常（如校验失败）时丢弃所有暂存的写入，不修改任何数据
+#并发：进入时锁定涉及的所有表（CSV引擎为按路径排序的文件锁，SQLite引擎为 BEGIN IMMEDIATE 事务），
+#      校验读取与提交在同一把锁内完成，并发的操作不会基于旧数据互相覆盖
+#原子性：SQLite引擎整批在一个事务中提交或回滚；CSV引擎逐个文件原子替换/追加（提交期间其他写入方被锁阻塞），
+#        进程在提交中途崩溃时已写入的文件不会回滚
+#用法：
+#    with UnitOfWork('products', 'orders') as uow:
+#        ...读取并校验，失败时抛出异常...
+#        uow.update('products', {'product_id': 1}, {'stock': 9})
+#        uow.insert('orders', order)
+from contextlib import ExitStack
+from backend.storage.engine import get_store
+
+
+class UnitOfWork:
+    def __init__(self, *tables):
+        self.tables = tables
+        self.store = get_store()
+        self._ops = {}          # 表名 -> [写操作, ...]（按首次暂存的顺序提交各表）
+        self._callbacks = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        self._stack.enter_context(self.store.locked(*self.tables))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stack, self._stack = self._stack, None
+        if exc_type is not None:
+            # 丢弃暂存的写入并释放锁（SQLite引擎回滚事务）
+            self._ops, self._callbacks = {}, []
+            return stack.__exit__(exc_type, exc, tb)
+        with stack:
+            self._commit()
+        return False
+
+    def _stage(self, table, op):
+        if table not in self.tables:
+            raise ValueError(f'数据表 {table} 未在工作单元中锁定')
+        self._ops.setdefault(table, []).append(op)
+
+    # ---------------------- 暂存写入 ----------------------
+    def insert(self, table, row):
+        self.insert_many(table, [row])
+
+    def insert_many(self, table, rows):
+        if rows:
+            self._stage(table, ('insert', list(rows)))
+
+    def update(self, table, criteria, values):
+        self._stage(table, ('update', criteria, values))
+
+    def adjust(self, table, criteria, column, delta, min_value=None):
+        self._stage(table, ('adjust', criteria, column, delta, min_value))
+
+    def delete(self, table, criteria):
+        self._stage(table, ('delete', criteria))
+
+    def on_commit(self, func):
+        """登记提交成功后执行的回调（仍持有锁，用于增量维护缓存/索引；回滚时不执行）"""
+        self._callbacks.append(func)
+
+    # ---------------------- 提交 ----------------------
+    def _commit(self):
+        ops, self._ops = self._ops, {}
+        callbacks, self._callbacks = self._callbacks, []
+        for table, table_ops in ops.items():
+            self.store.apply_batch(table, table_ops)
+        for func in callbacks:
+            func()
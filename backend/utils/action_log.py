@@ -0,0 +1,229 @@
+#用户行为日志写入工具
+#功能：以追加方式写入 user_actions.csv（表头只在新文件时写一次），单条写入成本与历史记录数无关
+#      请求线程通过 submit_action 把记录放入内存队列，由后台写入线程按批次（条数/时间）写入存储引擎
+import atexit
+import os
+import queue
+import threading
+import time
+from backend.config import Config
+from backend.storage.csv_store import append_csv_rows
+from backend.storage.engine import get_store
+
+# 与 config.create_default_csvs 中的表头保持一致（看板/导出依赖该列顺序）
+ACTION_FIELDS = ['timestamp', 'user_id', 'username', 'product_id', 'product_name', 'product_category', 'action_type', 'session_id', 'quantity', 'total_amount']
+
+
+_batch_listeners = []
+
+
+def register_batch_listener(listener):
+    """注册批次写入回调 listener(table, rows)：每批记录成功写入存储后在写入线程中调用（如增量统计）"""
+    _batch_listeners.append(listener)
+
+
+def append_actions(rows, path=None, fsync=True):
+    """直接以追加方式写入CSV行为日志（一次打开文件、一次刷盘）"""
+    if not rows:
+        return True
+    return append_csv_rows(path or Config.USER_ACTIONS_CSV_PATH, rows, ACTION_FIELDS, fsync=fsync)
+
+
+def append_action(row, path=None, fsync=True):
+    """直接追加单条行为记录"""
+    return append_actions([row], path=path, fsync=fsync)
+
+
+class BufferedActionWriter:
+    """有界内存队列 + 专用写入线程：按条数或时间间隔批量刷盘"""
+
+    BACKPRESSURE_POLICIES = ('block', 'drop', 'sync')
+
+    def __init__(self, table='user_actions', queue_size=None, batch_size=None, flush_interval=None, backpressure=None):
+        self.table = table
+        self.queue_size = queue_size or Config.ACTION_LOG_QUEUE_SIZE
+        self.batch_size = batch_size or Config.ACTION_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.ACTION_LOG_FLUSH_INTERVAL
+        self.backpressure = backpressure or Config.ACTION_LOG_BACKPRESSURE
+        if self.backpressure not in self.BACKPRESSURE_POLICIES:
+            raise ValueError(f"不支持的背压策略：{self.backpressure}")
+
+        self._lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._metrics = {
+            'events_submitted': 0,
+            'events_written': 0,
+            'events_dropped': 0,
+            'sync_writes': 0,
+            'write_errors': 0,
+            'batches_flushed': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def _ensure_started(self):
+        """首次提交时启动写入线程（fork出的子进程会重新创建队列和线程）"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='action-log-writer', daemon=True)
+            self._thread.start()
+
+    def _count(self, key, n=1):
+        with self._metrics_lock:
+            self._metrics[key] += n
+
+    def submit(self, row):
+        """提交一条行为记录；返回是否被接受（drop策略下队列满时返回False）"""
+        self._ensure_started()
+        self._count('events_submitted')
+        if self.backpressure == 'block':
+            self._queue.put(row)
+            return True
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            if self.backpressure == 'drop':
+                self._count('events_dropped')
+                return False
+            # sync策略：队列满时在请求线程直接写入
+            self._count('sync_writes')
+            self._write_batch([row])
+            return True
+
+    def flush(self, timeout=None):
+        """等待此前提交的记录全部落盘"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """停止写入线程（退出前刷完队列中剩余记录）"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def get_metrics(self):
+        """写入指标：队列深度、丢弃数、刷盘耗时等"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        batches = metrics['batches_flushed']
+        metrics['avg_flush_ms'] = round(metrics['total_flush_ms'] / batches, 3) if batches else 0.0
+        metrics['queue_depth'] = self._queue.qsize() if self._queue is not None else 0
+        metrics['queue_size'] = self.queue_size
+        metrics['backpressure'] = self.backpressure
+        return metrics
+
+    def _write_batch(self, rows):
+        start = time.perf_counter()
+        try:
+            get_store().insert_many(self.table, rows)
+        except Exception as e:
+            self._count('write_errors')
+            print(f"行为日志批量写入失败（{len(rows)}条）：{e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for listener in _batch_listeners:
+            try:
+                listener(self.table, rows)
+            except Exception as e:
+                print(f"行为日志批次回调失败：{e}")
+        with self._metrics_lock:
+            m = self._metrics
+            m['events_written'] += len(rows)
+            m['batches_flushed'] += 1
+            m['last_batch_size'] = len(rows)
+            m['last_flush_ms'] = round(elapsed_ms, 3)
+            m['max_flush_ms'] = round(max(m['max_flush_ms'], elapsed_ms), 3)
+            m['total_flush_ms'] += elapsed_ms
+
+    def _run(self):
+        q = self._queue
+        stopping = False
+        while not stopping:
+            item = q.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            # 攒批：直到达到批大小、超过刷盘间隔，或遇到flush/停止信号
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if stopping:
+                # 停止前取出队列中剩余的全部记录
+                while True:
+                    try:
+                        item = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif item is not None:
+                        batch.append(item)
+            if batch:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_action_writer(table='user_actions'):
+    """获取指定日志表的缓冲写入器（每张表一个写入线程）"""
+    writer = _writers.get(table)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(table)
+            if writer is None:
+                writer = _writers[table] = BufferedActionWriter(table)
+    return writer
+
+
+def submit_action(row, table='user_actions'):
+    """请求线程调用：把行为记录交给后台写入线程"""
+    return get_action_writer(table).submit(row)
+
+
+def flush_actions(timeout=None):
+    """等待所有缓冲中的行为记录落盘（读取日志前调用以保证读到最新数据）"""
+    for writer in list(_writers.values()):
+        writer.flush(timeout)
+
+
+def get_action_log_metrics():
+    """所有写入器的指标（按日志表名）"""
+    return {table: writer.get_metrics() for table, writer in list(_writers.items())}
+
+
+@atexit.register
+def _close_writers():
+    for writer in list(_writers.values()):
+        writer.close()
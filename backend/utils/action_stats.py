@@ -0,0 +1,178 @@
+#用户行为统计（物化聚合）
+#功能：维护看板所需的累计统计——各行为类型次数、购买总额、独立用户、每日/各分类行为数、每个商品的浏览/购买数，
+#      看板读取时为常数时间，不再读取整个 user_actions 表重新计算
+#更新方式：行为日志每写入一批，从上次的读取位置（游标）增量读取新追加的行并累加，多进程写入的记录同样会被统计到；
+#          统计结果连同游标定期保存到快照文件，重启后从快照继续增量统计；
+#          快照/游标失效（日志被重写或清空）时整表重建
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from backend.config import Config
+from backend.storage.engine import get_store
+from backend.storage.file_lock import atomic_write
+from backend.utils.action_log import flush_actions, register_batch_listener
+
+SNAPSHOT_VERSION = 1
+
+
+def _empty():
+    return {
+        'total_actions': 0,
+        'by_type': {},        # 行为类型 -> 次数
+        'revenue': 0.0,       # 购买行为 total_amount 合计
+        'users': set(),       # 独立用户ID
+        'by_day': {},         # 日期(YYYY-MM-DD) -> 次数
+        'by_category': {},    # 商品分类 -> 次数
+        'products': {},       # 商品ID -> {'name': 商品名, 'view': 浏览数, 'purchase': 购买数}
+    }
+
+
+def _valid(value):
+    return value is not None and not (isinstance(value, float) and math.isnan(value)) and value != ''
+
+
+def _inc(counter, key, n=1):
+    counter[key] = counter.get(key, 0) + n
+
+
+class ActionStats:
+    def __init__(self, table='user_actions', snapshot_path=None, save_interval=None):
+        self.table = table
+        self.snapshot_path = snapshot_path or Config.ACTION_STATS_SNAPSHOT_PATH
+        self.save_interval = Config.ACTION_STATS_SAVE_INTERVAL if save_interval is None else save_interval
+        self._lock = threading.Lock()
+        self._stats = None       # 尚未加载
+        self._cursor = None
+        self._dirty = False
+        self._last_save = 0.0
+
+    # ---------------------- 累加 ----------------------
+    def _apply(self, rows):
+        s = self._stats
+        for row in rows:
+            action_type = row.get('action_type')
+            s['total_actions'] += 1
+            if _valid(action_type):
+                _inc(s['by_type'], action_type)
+            if _valid(row.get('user_id')):
+                s['users'].add(str(row['user_id']))
+            timestamp = row.get('timestamp')
+            if _valid(timestamp):
+                _inc(s['by_day'], str(timestamp)[:10])
+            if _valid(row.get('product_category')):
+                _inc(s['by_category'], row['product_category'])
+            if action_type == 'purchase' and _valid(row.get('total_amount')):
+                try:
+                    s['revenue'] += float(row['total_amount'])
+                except (TypeError, ValueError):
+                    pass
+            if action_type in ('view', 'purchase') and _valid(row.get('product_id')):
+                try:
+                    product_id = str(int(float(row['product_id'])))
+                except (TypeError, ValueError):
+                    product_id = str(row['product_id'])
+                product = s['products'].setdefault(product_id, {'name': '', 'view': 0, 'purchase': 0})
+                if _valid(row.get('product_name')):
+                    product['name'] = row['product_name']
+                product[action_type] += 1
+
+    # ---------------------- 快照 ----------------------
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != SNAPSHOT_VERSION or data.get('engine') != get_store().engine:
+            return False
+        stats = data['stats']
+        stats['users'] = set(stats['users'])
+        self._stats = stats
+        self._cursor = data['cursor']
+        return True
+
+    def _save_snapshot(self):
+        stats = dict(self._stats, users=sorted(self._stats['users']))
+        data = {'version': SNAPSHOT_VERSION, 'engine': get_store().engine, 'cursor': self._cursor, 'stats': stats}
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        atomic_write(self.snapshot_path, lambda f: json.dump(data, f, ensure_ascii=False), encoding='utf-8')
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def save(self):
+        """立即保存快照"""
+        with self._lock:
+            if self._stats is not None and self._dirty:
+                self._save_snapshot()
+
+    # ---------------------- 刷新 ----------------------
+    def refresh(self):
+        """增量读取游标之后新追加的行为记录并累加；游标失效时整表重建"""
+        with self._lock:
+            if self._stats is None and not self._load_snapshot():
+                self._stats, self._cursor = _empty(), None
+            rows, cursor, reset = get_store().read_appended(self.table, self._cursor)
+            if reset:
+                print(f"行为统计：游标失效或首次统计，重建全部统计（{len(rows)}条记录）")
+                self._stats = _empty()
+            self._apply(rows)
+            changed = reset or bool(rows) or cursor != self._cursor
+            self._cursor = cursor
+            if changed:
+                self._dirty = True
+            if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+                self._save_snapshot()
+
+    def rebuild(self):
+        """丢弃累计结果与游标，整表重新统计"""
+        with self._lock:
+            self._stats, self._cursor = _empty(), None
+        self.refresh()
+
+    def _on_batch_written(self, table, rows):
+        if table == self.table:
+            self.refresh()
+
+    # ---------------------- 读取 ----------------------
+    def get_summary(self):
+        """看板统计（刷新后返回副本）"""
+        self.refresh()
+        with self._lock:
+            s = self._stats
+            by_type = dict(s['by_type'])
+            views = by_type.get('view', 0)
+            carts = by_type.get('add_to_cart', 0)
+            purchases = by_type.get('purchase', 0)
+            return {
+                'total_users': len(s['users']),
+                'total_actions': s['total_actions'],
+                'total_purchases': purchases,
+                'total_revenue': round(s['revenue'], 2),
+                'conversion_rates': {
+                    'view_to_cart': round(carts / views * 100, 2) if views > 0 else 0,
+                    'cart_to_purchase': round(purchases / carts * 100, 2) if carts > 0 else 0,
+                    'view_to_purchase': round(purchases / views * 100, 2) if views > 0 else 0
+                },
+                'by_type': by_type,
+                'by_day': dict(sorted(s['by_day'].items())),
+                'by_category': dict(s['by_category']),
+                'products': {pid: dict(p) for pid, p in s['products'].items()},
+            }
+
+
+# 进程级单例：行为日志每写入一批即增量更新
+action_stats = ActionStats()
+register_batch_listener(action_stats._on_batch_written)
+
+
+@atexit.register
+def _save_on_exit():
+    # 先等待写入线程刷完队列（写入后会触发增量统计），再保存最终快照
+    try:
+        flush_actions(timeout=5.0)
+        action_stats.save()
+    except Exception as e:
+        print(f"行为统计快照保存失败：{e}")
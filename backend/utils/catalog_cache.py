@@ -0,0 +1,112 @@
+#商品目录缓存
+#功能：进程内缓存商品表，维护 ID→商品、分类→ID列表 两个索引，读操作为O(1)字典查询
+#失效机制：写路径调用 invalidate() 递增版本号；存储引擎的表版本标记（CSV为文件mtime/大小）作为外部修改的兜底检测
+import threading
+import pandas as pd
+from backend.storage.engine import get_store
+
+
+class CatalogCache:
+    def __init__(self, table='products'):
+        self.table = table
+        self._lock = threading.Lock()
+        self._version = 0           # 写路径递增的版本号
+        self._loaded_version = -1   # 当前缓存对应的版本号
+        self._loaded_stamp = None   # 当前缓存对应的表版本标记
+        # 快照：(按文件顺序排列的商品记录, product_id->记录, 分类->[product_id, ...])
+        # 整体替换，保证并发读取时三者一致
+        self._snapshot = ([], {}, {})
+
+    @property
+    def version(self):
+        """当前数据版本号（写操作后递增）"""
+        return self._version
+
+    def invalidate(self):
+        """写路径调用：递增版本号，下次读取时重新加载"""
+        with self._lock:
+            self._version += 1
+
+    def _table_stamp(self):
+        return get_store().stamp(self.table)
+
+    def _is_fresh(self, stamp):
+        return self._loaded_version == self._version and self._loaded_stamp == stamp
+
+    def _ensure_loaded(self):
+        """版本号或文件时间戳变化时重新加载，否则直接使用缓存；返回当前快照"""
+        if self._is_fresh(self._table_stamp()):
+            return self._snapshot
+        with self._lock:
+            stamp = self._table_stamp()
+            if self._is_fresh(stamp):
+                return self._snapshot
+            version = self._version
+            records = []
+            if stamp is not None:
+                df = get_store().read_table(self.table)
+                # 确保product_id为整数类型
+                df['product_id'] = pd.to_numeric(df['product_id'], errors='coerce').fillna(0).astype(int)
+                records = df.to_dict('records')
+
+            by_id = {}
+            by_category = {}
+            for record in records:
+                by_id[record['product_id']] = record
+                by_category.setdefault(record['category'], []).append(record['product_id'])
+
+            self._snapshot = (records, by_id, by_category)
+            self._loaded_version = version
+            self._loaded_stamp = stamp
+            return self._snapshot
+
+    def get_all(self, category=None):
+        """获取所有商品（支持分类筛选），返回记录副本，调用方可自由修改"""
+        records, by_id, by_category = self._ensure_loaded()
+        if category and category != '全部商品':
+            return [dict(by_id[pid]) for pid in by_category.get(category, [])]
+        return [dict(record) for record in records]
+
+    def records(self):
+        """当前快照中的全部商品记录（只读，不复制；供需要遍历整个目录的索引使用，快照重新加载后返回新的列表）"""
+        return self._ensure_loaded()[0]
+
+    def get(self, product_id):
+        """通过ID获取商品（不存在返回None）"""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+        record = self._ensure_loaded()[1].get(product_id)
+        return dict(record) if record is not None else None
+
+    def get_many(self, product_ids):
+        """批量获取商品：返回 {product_id: 商品记录副本}（不存在的ID不包含在结果中）
+        所有商品取自同一份快照，整批只检查一次缓存是否过期"""
+        by_id = self._ensure_loaded()[1]
+        result = {}
+        for product_id in product_ids:
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                continue
+            record = by_id.get(product_id)
+            if record is not None and product_id not in result:
+                result[product_id] = dict(record)
+        return result
+
+    def exists(self, product_id):
+        """判断商品是否存在"""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return False
+        return product_id in self._ensure_loaded()[1]
+
+    def get_categories(self):
+        """获取所有分类（按首次出现顺序去重）"""
+        return list(self._ensure_loaded()[2].keys())
+
+
+# 进程级单例：app.py 与 backend 模型共用同一份缓存
+catalog_cache = CatalogCache()
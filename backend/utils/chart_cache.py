@@ -0,0 +1,91 @@
+#图表数据缓存
+#功能：缓存看板图表的数据序列（图表由浏览器绘制），键为 (图表名, 数据版本, 参数)，LRU淘汰 + TTL过期
+#刷新方式：数据版本变化或缓存过期时，先返回旧数据，同时在后台线程重新计算（同一图表同时只计算一次）；
+#          从未计算过的图表才在请求中同步计算
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from backend.config import Config
+from backend.storage.engine import data_version
+
+
+class ChartCache:
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or Config.CHART_CACHE_MAX_ENTRIES
+        self.ttl = Config.CHART_CACHE_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (图表名, 参数) -> (数据版本, 计算时间, 结果)，按最近使用排序
+        self._pending = set()           # 正在后台重新计算的 (图表名, 参数)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chart-refresh')
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def _render(self, slot, version, render):
+        result = render()
+        with self._lock:
+            self._entries[slot] = (version, time.monotonic(), result)
+            self._entries.move_to_end(slot)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def _render_in_background(self, slot, version, render):
+        def run():
+            try:
+                self._render(slot, version, render)
+            except Exception as e:
+                print(f"图表数据后台计算失败（{slot[0]}）：{e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(slot)
+
+        self._executor.submit(run)
+
+    def get(self, name, version, render, params=()):
+        """获取图表数据：版本一致且未过期直接返回；否则返回旧结果并后台重新计算；无缓存时同步计算
+        params 须可哈希（如元组）；render 为无参函数，返回图表数据"""
+        slot = (name, params)
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is not None:
+                self._entries.move_to_end(slot)
+                cached_version, rendered_at, result = entry
+                if cached_version == version and time.monotonic() - rendered_at < self.ttl:
+                    self.hits += 1
+                    return result
+                self.stale_hits += 1
+                if slot not in self._pending:
+                    self._pending.add(slot)
+                    self._render_in_background(slot, version, render)
+                return result
+            self.misses += 1
+        return self._render(slot, version, render)
+
+    def invalidate(self, name=None):
+        """清除缓存（name为空时清除全部）"""
+        with self._lock:
+            for slot in [s for s in self._entries if name is None or s[0] == name]:
+                del self._entries[slot]
+
+    def metrics(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits,
+                    'stale_hits': self.stale_hits, 'misses': self.misses}
+
+
+# 进程级单例：看板的图表数据（chart_utils）共用
+chart_cache = ChartCache()
+
+
+def cached_chart(name, *tables):
+    """装饰器：按 (图表名, 依赖表的数据版本, 调用参数) 缓存图表数据函数的返回值"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            return chart_cache.get(name, data_version(*tables), lambda: func(*args), params=args)
+        wrapper.render = func   # 不经缓存直接计算
+        return wrapper
+    return decorator
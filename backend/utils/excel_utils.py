@@ -1,47 +1,108 @@
 #excel导出工具
 #功能：提供 CSV 数据导出为 Excel 的通用工具函数
-import pandas as pd
-import os  # 新增：导入os模块
-from io import BytesIO
+#      按块读取数据表，经 openpyxl 只写模式（write_only）逐行写入，工作簿保存到临时文件（小文件在内存，超过阈值落盘），
+#      内存占用只与块大小有关；单个工作表超过Excel行数上限（1,048,576行）时自动拆分到新的工作表
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask import send_file
+from openpyxl import Workbook
 from backend.config import Config
+from backend.storage.engine import get_store
+from backend.utils.export_stream import EXPORT_TABLES, export_columns, iter_export_chunks, parse_export_options
+
+EXCEL_MAX_ROWS = 1048576  # 单个工作表的最大行数（含表头）
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
 def export_orders_to_excel():
     """导出订单数据为Excel"""
-    if not os.path.exists(Config.ORDERS_CSV_PATH):  # 现在os已定义
-        return None
-    
-    df = pd.read_csv(Config.ORDERS_CSV_PATH, encoding='utf-8-sig')
-    return _df_to_excel(df, '订单数据.xlsx')
+    return _table_to_excel('orders', '订单数据.xlsx')
 
 def export_user_actions_to_excel():
     """导出用户行为数据为Excel"""
-    if not os.path.exists(Config.USER_ACTIONS_CSV_PATH):  # 现在os已定义
-        return None
-    
-    df = pd.read_csv(Config.USER_ACTIONS_CSV_PATH, encoding='utf-8-sig')
-    return _df_to_excel(df, '用户行为数据.xlsx')
+    return _table_to_excel('user_actions', '用户行为数据.xlsx')
 
 def export_products_to_excel():
     """导出商品数据为Excel"""
-    if not os.path.exists(Config.PRODUCTS_CSV_PATH):  # 现在os已定义
-        return None
-    
-    df = pd.read_csv(Config.PRODUCTS_CSV_PATH, encoding='utf-8-sig')
-    return _df_to_excel(df, '商品数据.xlsx')
-
-def _df_to_excel(df, filename):
-    """内部方法：将DataFrame转换为Excel文件流"""
-    output = BytesIO()
-    # 使用openpyxl引擎保存Excel
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name=filename.split('.')[0])
+    return _table_to_excel('products', '商品数据.xlsx')
+
+def export_table_to_excel(table, options, filename):
+    """按导出选项（筛选/选列，见 export_stream.parse_export_options）导出为Excel，返回Flask send_file对象"""
+    output = tempfile.SpooledTemporaryFile(max_size=Config.EXCEL_SPOOL_MAX_SIZE)
+    write_excel(iter_export_chunks(table, options), output, EXPORT_TABLES[table]['name'],
+                default_columns=export_columns(table, options))
     # 重置文件指针到开头
     output.seek(0)
-    # 返回Flask send_file对象
-    return send_file(
-        output,
-        download_name=filename,
-        as_attachment=True,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
\ No newline at end of file
+    return send_file(output, download_name=filename, as_attachment=True, mimetype=XLSX_MIMETYPE)
+
+def write_excel(chunks, output, sheet_name, default_columns=None, max_rows=EXCEL_MAX_ROWS):
+    """将DataFrame块逐行写入只写模式工作簿并保存到 output（文件路径或文件对象），返回写入的数据行数
+    单个工作表达到 max_rows 行（含表头）后自动新建工作表：sheet_name、sheet_name_2、sheet_name_3 ..."""
+    wb = Workbook(write_only=True)
+    total, _ = write_sheets(wb, chunks, sheet_name, default_columns, max_rows)
+    wb.save(output)
+    return total
+
+def write_workbook(parts, output, workers=None, max_rows=EXCEL_MAX_ROWS):
+    """多个数据集写入同一个工作簿，各数据集的工作表在线程池中同时生成，返回 {工作表名: 数据行数}
+    parts 为 [(工作表名, 返回DataFrame块迭代器的函数, 空表时的表头), ...]；工作表按 parts 的顺序排列
+    （只写模式下每个工作表写入各自的临时文件、字符串内联存储，不同工作表可并发追加行；新建工作表加锁）"""
+    wb = Workbook(write_only=True)
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=workers or len(parts) or 1) as pool:
+        futures = [pool.submit(write_sheets, wb, make_chunks(), sheet_name, default_columns, max_rows, lock)
+                   for sheet_name, make_chunks, default_columns in parts]
+        results = [future.result() for future in futures]
+    # 按数据集顺序排列工作表（拆分出的工作表紧跟在原工作表之后）
+    ordered = [ws for _, sheets in results for ws in sheets]
+    for index, ws in enumerate(ordered):
+        wb.move_sheet(ws.title, offset=index - wb.index(ws))
+    wb.save(output)
+    return {sheet_name: rows for (sheet_name, _, _), (rows, _) in zip(parts, results)}
+
+def write_sheets(wb, chunks, sheet_name, default_columns=None, max_rows=EXCEL_MAX_ROWS, lock=None):
+    """将DataFrame块写入工作簿 wb 的一个或多个工作表，返回 (数据行数, [工作表, ...])"""
+    sheets = []
+    header = None
+    sheet_rows = 0
+    total = 0
+
+    def new_sheet():
+        nonlocal sheet_rows
+        title = sheet_name if not sheets else f'{sheet_name}_{len(sheets) + 1}'
+        if lock is not None:
+            with lock:
+                ws = wb.create_sheet(title)
+        else:
+            ws = wb.create_sheet(title)
+        ws.append(header)
+        sheets.append(ws)
+        sheet_rows = 1
+        return ws
+
+    ws = None
+    for chunk in chunks:
+        if header is None:
+            header = [str(col) for col in chunk.columns]
+            ws = new_sheet()
+        # 空值写为空单元格
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if sheet_rows >= max_rows:
+                ws = new_sheet()
+            ws.append(row)
+            sheet_rows += 1
+            total += 1
+
+    if header is None:
+        # 空表：只输出表头
+        header = list(default_columns or [])
+        new_sheet()
+    return total, sheets
+
+def _table_to_excel(table, filename):
+    """内部方法：整表导出为Excel文件流（表不存在返回None）"""
+    if not get_store().exists(table):
+        return None
+
+    return export_table_to_excel(table, parse_export_options(table, {'format': 'xlsx'}), filename)
\ No newline at end of file
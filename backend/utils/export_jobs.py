@@ -0,0 +1,195 @@
+#导出任务队列
+#功能：大数据量导出改为后台任务，在本地线程池中生成文件，Web请求只负责提交任务、查询进度和下载结果
+#      每个任务有ID、进度（已扫描行数/总行数）与下载地址；任务状态保存到 data/exports/jobs/<任务ID>.json，多进程部署时任一进程都可查询
+#缓存：生成的文件以 (数据集, 导出选项, 数据版本) 为键保存在 data/exports/ 下，数据未变化时重复导出直接返回已有文件；
+#      超过 EXPORT_CACHE_MAX_FILES 个文件时删除最早使用的文件
+#全部数据：data_type=all 时生成一个包含商品/订单/订单明细/用户/行为五个工作表的Excel，各工作表同时生成
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from backend.config import Config
+from backend.storage.engine import data_version, get_store
+from backend.storage.file_lock import atomic_write
+from backend.utils.action_log import flush_actions
+from backend.utils.excel_utils import write_excel, write_workbook
+from backend.utils.export_stream import (EXPORT_TABLES, export_columns, export_file_name, iter_export_chunks,
+                                         iter_export_csv, parse_export_options)
+
+EXPORT_ALL = 'all'
+ALL_TABLES = ['products', 'orders', 'order_items', 'users', 'user_actions']  # 全部数据工作簿中的工作表顺序
+PROGRESS_SAVE_INTERVAL = 0.5  # 进度写入状态文件的最短间隔（秒）
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ExportJobs:
+    def __init__(self, directory=None, workers=None, max_files=None):
+        self.directory = directory or Config.EXPORT_DIR
+        self.max_files = max_files or Config.EXPORT_CACHE_MAX_FILES
+        self._executor = ThreadPoolExecutor(max_workers=workers or Config.EXPORT_WORKERS, thread_name_prefix='export-job')
+        self._lock = threading.Lock()
+        self._jobs = {}      # 任务ID -> 任务状态（本进程提交的任务）
+        self._running = {}   # 缓存键 -> 任务ID（同一导出正在生成时复用该任务）
+
+    # ---------------------- 任务状态 ----------------------
+    def _job_path(self, job_id):
+        return os.path.join(self.directory, 'jobs', f'{job_id}.json')
+
+    def _save(self, job):
+        os.makedirs(os.path.join(self.directory, 'jobs'), exist_ok=True)
+        data = dict(job)
+        atomic_write(self._job_path(job['job_id']), lambda f: json.dump(data, f, ensure_ascii=False), encoding='utf-8')
+
+    def get(self, job_id):
+        """查询任务状态（返回副本，不存在返回None）"""
+        if not _JOB_ID.match(str(job_id)):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        try:
+            with open(self._job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # ---------------------- 提交 ----------------------
+    def _plan(self, data_key, args):
+        """解析导出请求，返回 (涉及的数据表, {表: 导出选项}, 文件格式, 下载文件名)"""
+        if data_key == EXPORT_ALL:
+            options = {table: parse_export_options(table, {'format': 'xlsx'}) for table in ALL_TABLES}
+            return ALL_TABLES, options, 'xlsx', f"全部数据_{datetime.now().strftime('%Y%m%d')}.xlsx"
+        options = parse_export_options(data_key, args)
+        return [data_key], {data_key: options}, options['format'], export_file_name(data_key, options)
+
+    def submit(self, data_key, args):
+        """提交导出任务：数据未变化且已有生成好的文件时直接完成；参数不合法时抛出 ValueError"""
+        tables, options, file_format, file_name = self._plan(data_key, args)
+        if 'user_actions' in tables:
+            flush_actions()  # 确保缓冲中的行为记录已落盘，再计算数据版本
+        key = json.dumps([data_key, options, data_version(*tables)], sort_keys=True, default=str)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        extension = file_format + ('.gz' if options[tables[0]].get('gzip') else '')
+        artifact = os.path.join(self.directory, f'{data_key}_{digest}.{extension}')
+
+        with self._lock:
+            running = self._running.get(digest)
+            if running is not None and running in self._jobs:
+                return dict(self._jobs[running])
+            job = {
+                'job_id': uuid.uuid4().hex, 'data_type': data_key, 'format': file_format, 'file_name': file_name,
+                'artifact': artifact, 'status': 'pending', 'progress': 0, 'rows_scanned': 0, 'rows_total': None,
+                'rows_written': None, 'cached': False, 'error': None,
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'finished_at': None,
+            }
+            if os.path.exists(artifact):
+                # 数据未变化：直接使用已生成的文件（更新使用时间，避免被当作最早使用的文件清理）
+                os.utime(artifact)
+                job.update(status='done', progress=100, cached=True, finished_at=job['created_at'])
+            else:
+                self._running[digest] = job['job_id']
+            self._jobs[job['job_id']] = job
+            self._save(job)
+            snapshot = dict(job)
+        if job['status'] == 'pending':
+            self._executor.submit(self._run, job['job_id'], digest, tables, options)
+        return snapshot
+
+    # ---------------------- 执行 ----------------------
+    def _update(self, job_id, save=True, **values):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(values)
+            if save:
+                self._save(job)
+
+    def _run(self, job_id, digest, tables, options):
+        store = get_store()
+        job = self.get(job_id)
+        try:
+            total = sum(store.count(table) for table in tables if store.exists(table))
+            self._update(job_id, status='running', rows_total=total)
+            last_save = [time.monotonic()]
+
+            def on_scanned(rows):
+                with self._lock:
+                    current = self._jobs[job_id]
+                    current['rows_scanned'] += rows
+                    current['progress'] = min(99, current['rows_scanned'] * 100 // total) if total else 99
+                    if time.monotonic() - last_save[0] >= PROGRESS_SAVE_INTERVAL:
+                        last_save[0] = time.monotonic()
+                        self._save(current)
+
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{job['artifact']}.{job_id}.tmp"
+            try:
+                written = self._generate(job, tables, options, temp_path, on_scanned)
+                os.replace(temp_path, job['artifact'])
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self._update(job_id, status='done', progress=100, rows_written=written,
+                         finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        except Exception as e:
+            print(f"导出任务失败（{job_id}）：{e}")
+            self._update(job_id, status='failed', error=str(e),
+                         finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        finally:
+            with self._lock:
+                self._running.pop(digest, None)
+            self._prune()
+
+    def _generate(self, job, tables, options, path, on_scanned):
+        """生成导出文件，返回写入的数据行数"""
+        if job['data_type'] == EXPORT_ALL:
+            parts = [(EXPORT_TABLES[table]['name'],
+                      lambda table=table: iter_export_chunks(table, options[table], on_scanned=on_scanned),
+                      export_columns(table, options[table]))
+                     for table in tables]
+            return sum(write_workbook(parts, path).values())
+        table = tables[0]
+        if job['format'] == 'xlsx':
+            return write_excel(iter_export_chunks(table, options[table], on_scanned=on_scanned), path,
+                               EXPORT_TABLES[table]['name'], default_columns=export_columns(table, options[table]))
+        with open(path, 'wb') as f:
+            for data in iter_export_csv(table, options[table], on_scanned=on_scanned):
+                f.write(data)
+        return None
+
+    def _prune(self):
+        """清理导出缓存：保留最近使用的 max_files 个文件；删除超过 EXPORT_JOB_TTL 的任务状态文件"""
+        try:
+            files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if not name.endswith('.tmp') and os.path.isfile(os.path.join(self.directory, name))]
+            files.sort(key=os.path.getmtime, reverse=True)
+            for path in files[self.max_files:]:
+                os.remove(path)
+            jobs_dir = os.path.join(self.directory, 'jobs')
+            expire = time.time() - Config.EXPORT_JOB_TTL
+            for name in os.listdir(jobs_dir) if os.path.isdir(jobs_dir) else []:
+                path = os.path.join(jobs_dir, name)
+                if os.path.getmtime(path) < expire:
+                    os.remove(path)
+                    with self._lock:
+                        self._jobs.pop(name[:-len('.json')], None)
+        except OSError as e:
+            print(f"导出缓存清理失败：{e}")
+
+
+def public_job(job):
+    """返回给前端的任务信息（不包含服务器文件路径）"""
+    info = {k: v for k, v in job.items() if k != 'artifact'}
+    if job['status'] == 'done':
+        info['download_url'] = f"/admin/api/export_jobs/{job['job_id']}/download"
+    return info
+
+
+# 进程级单例
+export_jobs = ExportJobs()
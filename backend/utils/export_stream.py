@@ -0,0 +1,136 @@
+#流式数据导出
+#功能：按块读取数据表并逐块生成CSV（可选gzip压缩），配合Flask流式响应边读边下载，
+#      内存占用只与块大小有关，与表的大小无关；支持时间范围、用户、状态、行为类型等服务端筛选和列选择
+import zlib
+from datetime import datetime
+from backend.config import Config
+from backend.storage.engine import get_store
+from backend.storage.schema import get_table
+
+# 可导出的数据表：显示名称、时间范围筛选使用的列、其余筛选参数对应的列
+EXPORT_TABLES = {
+    'products': {'name': '商品数据', 'time_column': None,
+                 'filters': {'category': 'category'}},
+    'users': {'name': '用户数据', 'time_column': None,
+              'filters': {'user_id': 'user_id'}},
+    'orders': {'name': '订单数据', 'time_column': 'create_time',
+               'filters': {'user_id': 'user_id', 'status': 'status'}},
+    'order_items': {'name': '订单明细数据', 'time_column': None,
+                    'filters': {'order_id': 'order_id', 'product_id': 'product_id'}},
+    'user_actions': {'name': '用户行为数据', 'time_column': 'timestamp',
+                     'filters': {'user_id': 'user_id', 'action_type': 'action_type', 'category': 'product_category'}},
+}
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name}格式应为YYYY-MM-DD：{value}')
+
+
+def parse_export_options(table, args):
+    """从请求参数解析导出选项：start_date / end_date / 各表的筛选参数 / columns（逗号分隔）/
+    format（csv 或 xlsx）/ gzip（仅CSV）；参数不合法时抛出 ValueError；空值与该表不支持的筛选参数忽略"""
+    if table not in EXPORT_TABLES:
+        raise ValueError('不支持的数据类型')
+    spec = EXPORT_TABLES[table]
+    file_format = str(args.get('format') or 'csv').lower()
+    if file_format not in ('csv', 'xlsx'):
+        raise ValueError(f'不支持的导出格式：{file_format}')
+    options = {'start_date': None, 'end_date': None, 'filters': {}, 'columns': None, 'format': file_format,
+               'gzip': file_format == 'csv' and str(args.get('gzip', '')).lower() in ('1', 'true', 'yes')}
+
+    if spec['time_column']:
+        if args.get('start_date'):
+            options['start_date'] = _parse_date(args['start_date'], '开始日期')
+        if args.get('end_date'):
+            options['end_date'] = _parse_date(args['end_date'], '结束日期')
+
+    for param, column in spec['filters'].items():
+        if args.get(param):
+            options['filters'][column] = str(args[param])
+
+    if args.get('columns'):
+        columns = [col.strip() for col in args['columns'].split(',') if col.strip()]
+        unknown = [col for col in columns if col not in get_table(table)['columns']]
+        if unknown:
+            raise ValueError(f"不存在的列：{', '.join(unknown)}")
+        options['columns'] = list(dict.fromkeys(columns))
+    return options
+
+
+def export_file_name(table, options):
+    name = f"{EXPORT_TABLES[table]['name']}_{datetime.now().strftime('%Y%m%d')}.{options['format']}"
+    return name + '.gz' if options['gzip'] else name
+
+
+def _filter_chunk(chunk, table, options):
+    """对一个数据块应用筛选条件（文本比较：时间列取前10位日期）"""
+    mask = None
+
+    def combine(condition):
+        nonlocal mask
+        mask = condition if mask is None else mask & condition
+
+    time_column = EXPORT_TABLES[table]['time_column']
+    if (options['start_date'] or options['end_date']) and time_column in chunk.columns:
+        dates = chunk[time_column].astype(str).str[:10]
+        if options['start_date']:
+            combine(dates >= options['start_date'])
+        if options['end_date']:
+            combine(dates <= options['end_date'])
+    for column, value in options['filters'].items():
+        if column in chunk.columns:
+            combine(chunk[column].astype(str) == value)
+    return chunk[mask] if mask is not None else chunk
+
+
+def iter_export_chunks(table, options, chunk_size=None, on_scanned=None):
+    """逐块产出筛选、选列后的DataFrame（CSV与Excel导出共用）；on_scanned(行数) 在每读取一块后调用（用于进度）"""
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_SIZE
+    read_columns = options['columns']
+    if read_columns is not None:
+        # 筛选用到但未被选中的列也需读取，输出前再去掉
+        needed = list(options['filters'])
+        if options['start_date'] or options['end_date']:
+            needed.append(EXPORT_TABLES[table]['time_column'])
+        read_columns = read_columns + [col for col in needed if col not in read_columns]
+
+    for chunk in get_store().iter_chunks(table, chunk_size, columns=read_columns):
+        if on_scanned is not None:
+            on_scanned(len(chunk))
+        chunk = _filter_chunk(chunk, table, options)
+        if options['columns'] is not None:
+            chunk = chunk[options['columns']]
+        yield chunk
+
+
+def export_columns(table, options):
+    """空表时输出的表头"""
+    return options['columns'] or list(get_table(table)['columns'])
+
+
+def iter_export_csv(table, options, chunk_size=None, on_scanned=None):
+    """逐块产出CSV字节（UTF-8带BOM，便于Excel打开；gzip=True 时产出压缩后的字节）"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if options['gzip'] else None
+
+    def emit(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor is not None else data
+
+    header_written = False
+    for chunk in iter_export_chunks(table, options, chunk_size, on_scanned):
+        text = chunk.to_csv(index=False, header=not header_written)
+        if not header_written:
+            text = '\ufeff' + text
+            header_written = True
+        data = emit(text)
+        if data:
+            yield data
+
+    if not header_written:
+        # 空表：只输出表头
+        yield emit('\ufeff' + ','.join(export_columns(table, options)) + '\n')
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,147 @@
+#秒杀模式
+#功能：为指定商品开启秒杀后，下单请求先领取内存中的库存令牌（按商品预分配，数量为开启时的可售库存）：
+#      令牌领完后的请求立即返回"已售罄"，不读写任何数据文件；
+#      领到令牌的请求进入有界的准入队列，按组提交：同一时刻只有一个请求（组长）执行结算，
+#      一次取出队列中至多 FLASH_SALE_BATCH_SIZE 个请求在一个工作单元内提交（每张表整批只写一次），
+#      其余请求等待组长返回结果，不再各自争抢同一数据文件的锁；
+#      排队请求数达到 FLASH_SALE_QUEUE_SIZE 或排队超过 FLASH_SALE_QUEUE_TIMEOUT 秒时立即拒绝并归还令牌
+#正确性：令牌只是快速拒绝的前置闸门，结算仍在工作单元锁内校验库存，不会超卖；结算失败时归还令牌
+#配置：FLASH_SALE_PRODUCT_IDS 中的商品在本进程首次使用秒杀模式时开启（与启动方式无关，python app.py 与WSGI服务器均生效），
+#      之后可通过后台接口开启/关闭
+#范围：令牌与队列只在本进程内有效（多进程部署时各进程按开启时的库存各自发放令牌，超出实际库存的部分由结算校验拒绝）
+import threading
+import time
+from backend.config import Config
+from backend.utils.stock_ledger import stock_ledger
+
+
+class FlashSale:
+    def __init__(self, batch_size=None, queue_size=None, timeout=None):
+        self.batch_size = batch_size or Config.FLASH_SALE_BATCH_SIZE
+        self.queue_size = queue_size or Config.FLASH_SALE_QUEUE_SIZE
+        self.timeout = timeout or Config.FLASH_SALE_QUEUE_TIMEOUT
+        self._configured = False
+        self._configure_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._tokens = {}       # product_id -> 剩余令牌数
+        self._queue = []        # 等待提交的请求
+        self._committing = False
+        self._counts = {'admitted': 0, 'sold_out': 0, 'busy': 0, 'returned': 0, 'batches': 0}
+
+    # ---------------------- 开启与关闭 ----------------------
+    def _configure(self):
+        """首次使用时为配置的秒杀商品按当前可售库存发放令牌（只执行一次）"""
+        if self._configured:
+            return
+        with self._configure_lock:
+            if self._configured:
+                return
+            if Config.FLASH_SALE_PRODUCT_IDS:
+                tokens = {int(pid): stock_ledger.available(pid) for pid in Config.FLASH_SALE_PRODUCT_IDS}
+                with self._lock:
+                    self._tokens.update(tokens)
+                print(f"秒杀商品令牌：{tokens}")
+            self._configured = True
+
+    def start(self, product_ids):
+        """为商品开启秒杀（已开启的商品按当前可售库存重新发放令牌），返回 {product_id: 令牌数}"""
+        self._configure()
+        tokens = {int(pid): stock_ledger.available(pid) for pid in product_ids}
+        with self._lock:
+            self._tokens.update(tokens)
+        return tokens
+
+    def stop(self, product_ids=None):
+        """关闭商品的秒杀（product_ids 为空时全部关闭）"""
+        self._configure()
+        with self._lock:
+            if product_ids is None:
+                self._tokens.clear()
+            for pid in product_ids or []:
+                self._tokens.pop(int(pid), None)
+
+    def covers(self, product_ids):
+        """商品中是否有处于秒杀模式的"""
+        self._configure()
+        tokens = self._tokens
+        return any(int(pid) in tokens for pid in product_ids)
+
+    # ---------------------- 令牌 ----------------------
+    def claim(self, quantities):
+        """为 {product_id: 数量} 中的秒杀商品领取令牌（全部领到才扣减），返回领取的令牌 {product_id: 数量}；
+        任一秒杀商品令牌不足返回None（售罄）"""
+        self._configure()
+        with self._lock:
+            wanted = {int(pid): qty for pid, qty in quantities.items() if int(pid) in self._tokens}
+            if any(self._tokens[pid] < qty for pid, qty in wanted.items()):
+                self._counts['sold_out'] += 1
+                return None
+            for pid, qty in wanted.items():
+                self._tokens[pid] -= qty
+            return wanted
+
+    def give_back(self, claim):
+        """结算失败时归还令牌（秒杀已关闭的商品不再归还）"""
+        if not claim:
+            return
+        with self._lock:
+            for pid, qty in claim.items():
+                if pid in self._tokens:
+                    self._tokens[pid] += qty
+            self._counts['returned'] += 1
+
+    # ---------------------- 准入队列（组提交） ----------------------
+    def submit(self, job, commit_batch):
+        """把结算请求加入准入队列，返回 commit_batch 为它给出的结果；队列已满或排队超时返回None
+        commit_batch(jobs) 在一个工作单元内提交一批请求，返回与 jobs 等长的结果列表"""
+        entry = {'job': job, 'commit': commit_batch, 'done': False, 'result': None}
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                self._counts['busy'] += 1
+                return None
+            self._queue.append(entry)
+            deadline = time.monotonic() + self.timeout
+            while not entry['done']:
+                if not self._committing:
+                    self._lead()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and entry in self._queue:
+                    # 排队超时（尚未被组长取走）
+                    self._queue.remove(entry)
+                    self._counts['busy'] += 1
+                    return None
+                self._cond.wait(max(remaining, 0.05))
+            return entry['result']
+
+    def _lead(self):
+        """成为组长：取出一批请求，释放锁后提交，再唤醒等待结果的请求（需持有 self._cond）"""
+        batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+        self._committing = True
+        self._cond.release()
+        try:
+            try:
+                results = list(batch[0]['commit']([entry['job'] for entry in batch]))
+                assert len(results) == len(batch), f'组提交返回{len(results)}个结果，应为{len(batch)}个'
+            except Exception as e:
+                results = [e] * len(batch)
+        finally:
+            self._cond.acquire()
+        # 每个取出的请求都必须标记完成（否则其等待者会在空队列上成为组长）；缺少结果的请求以异常作为结果
+        for i, entry in enumerate(batch):
+            entry['result'] = results[i] if i < len(results) else RuntimeError('组提交未返回该请求的结果')
+            entry['done'] = True
+        self._counts['admitted'] += len(batch)
+        self._counts['batches'] += 1
+        self._committing = False
+        self._cond.notify_all()
+
+    def status(self):
+        self._configure()
+        with self._lock:
+            return dict(self._counts, products=dict(self._tokens), waiting=len(self._queue))
+
+
+# 进程级单例
+flash_sale = FlashSale()
@@ -0,0 +1,110 @@
+#订单编解码
+#功能：批量解码订单中以JSON文本存储的列表字段，统一两种订单格式：
+#      后台格式（product_ids / product_names / quantities 三列）与前台格式（items 列，商品明细字典列表）
+#      解码后每个订单同时具有 product_ids / product_names / quantities / items 四个列表字段
+#批量解析：同一列的所有JSON文本拼接为一个JSON数组，只调用一次 json.loads（C解析器一次完成），
+#          避免逐行调用的函数开销；出现格式错误的行时退回逐行解析，错误的值解码为空列表
+#          大批量解码期间暂停循环垃圾回收（一次生成大量新容器对象会反复触发回收）
+import ast
+import gc
+import json
+from contextlib import contextmanager
+
+LIST_COLUMNS = ('product_ids', 'product_names', 'quantities', 'items')
+GC_PAUSE_MIN_ORDERS = 1000  # 订单数达到该值时解码期间暂停垃圾回收
+
+
+@contextmanager
+def _gc_paused(enabled=True):
+    paused = enabled and gc.isenabled()
+    if paused:
+        gc.disable()
+    try:
+        yield
+    finally:
+        if paused:
+            gc.enable()
+
+
+def _loads_one(value):
+    """逐行解析：兼容JSON与Python列表字面量（旧数据），无法解析时返回空列表"""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        return []
+    try:
+        result = json.loads(value)
+    except ValueError:
+        try:
+            result = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    return result if isinstance(result, list) else []
+
+
+def decode_column(values):
+    """批量解码一列JSON列表文本，返回与 values 等长的列表（已是列表的值原样保留，空值为[]）"""
+    texts = []
+    for value in values:
+        if type(value) is str and value:
+            # 每个值必须自成一个JSON数组，否则拼接后可能与相邻的值粘连
+            if value[0] != '[' or value[-1] != ']':
+                return [_loads_one(value) for value in values]
+            texts.append(value)
+        elif isinstance(value, list):
+            texts.append(json.dumps(value, ensure_ascii=False))
+        else:
+            texts.append('[]')
+    if not texts:
+        return []
+    try:
+        decoded = json.loads('[' + ','.join(texts) + ']')
+    except ValueError:
+        decoded = None
+    if decoded is None or len(decoded) != len(texts):
+        return [_loads_one(value) for value in values]
+    return decoded
+
+
+def decode_orders(orders):
+    """批量解码订单字典列表（就地修改并返回），两种订单格式统一为四个列表字段"""
+    if not orders:
+        return orders
+    with _gc_paused(len(orders) >= GC_PAUSE_MIN_ORDERS):
+        return _decode_orders(orders)
+
+
+def _decode_orders(orders):
+    # 只解码出现过的列（后台格式的订单没有 items 列，前台格式的订单没有三个列表列）
+    columns = {col: decode_column([order.get(col) for order in orders])
+               if any(order.get(col) for order in orders) else [[] for _ in orders]
+               for col in LIST_COLUMNS}
+    for i, order in enumerate(orders):
+        items = [item for item in columns['items'][i] if isinstance(item, dict)]
+        product_ids = columns['product_ids'][i]
+        if items:
+            # 前台格式：由商品明细生成三个列表
+            order['product_ids'] = [item.get('product_id') for item in items]
+            order['product_names'] = [item.get('name', '未知商品') for item in items]
+            order['quantities'] = [item.get('quantity', 1) for item in items]
+        else:
+            # 后台格式：由三个列表生成商品明细
+            names = columns['product_names'][i]
+            quantities = columns['quantities'][i]
+            items = [{
+                'product_id': pid,
+                'name': names[j] if j < len(names) else '未知商品',
+                'quantity': quantities[j] if j < len(quantities) else 1
+            } for j, pid in enumerate(product_ids)]
+            order['product_ids'] = product_ids
+            order['product_names'] = names
+            order['quantities'] = quantities
+        order['items'] = items
+    return orders
+
+
+def decode_order(order):
+    """解码单个订单（不存在返回None）"""
+    if order is None:
+        return None
+    return decode_orders([order])[0]
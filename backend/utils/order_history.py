@@ -0,0 +1,142 @@
+#用户订单历史（物化视图）
+#功能：为"我的订单"页面维护每个用户最近的订单摘要（订单头 + 商品明细，已按模板需要的格式整理），
+#      命中时为O(1)查找，不读取订单表；每个用户最多保留 ORDER_HISTORY_PER_USER 个最新订单，
+#      最多缓存 ORDER_HISTORY_MAX_USERS 个用户（LRU淘汰）
+#更新方式：本进程的写入（下单、修改订单状态）在持有表锁时先取 version()，写入后仍在锁内调用 record() / set_status()，
+#          只更新受影响用户的视图，其他用户的视图继续有效；
+#          订单表/明细表的整表版本只用于发现未登记的写入（其他进程写入）：读取时版本与已登记的不一致则全部视图作废，
+#          之后各用户的视图在下次读取时按订单索引重新构建（只读取该用户最新的若干订单，与订单表大小无关）
+import math
+import threading
+from collections import OrderedDict
+from backend.config import Config
+from backend.storage.engine import data_version
+from backend.utils.catalog_cache import catalog_cache
+from backend.utils.order_index import order_id_key, order_index
+from backend.utils.order_items import attach_items
+
+TABLES = ('orders', 'order_items')
+
+
+def summarize_order(order):
+    """订单（含 items）整理为订单历史页面使用的摘要；商品名称/图片/价格优先使用商品目录中的当前信息"""
+    items = []
+    for item in order.get('items') or []:
+        product = catalog_cache.get(item.get('product_id')) or {}
+        items.append({
+            'name': product.get('name', item.get('name', '未知商品')),
+            'image': product.get('image', item.get('image', 'default.jpg')),
+            'quantity': int(item.get('quantity', 1)),
+            'price': product.get('price', item.get('price', 0))
+        })
+    try:
+        total_amount = float(order.get('total_amount'))
+    except (TypeError, ValueError):
+        total_amount = math.nan
+    status = order.get('status')
+    return {
+        'order_id': order.get('order_id'),
+        'create_time': order.get('create_time') or '',
+        'total_amount': 0.0 if math.isnan(total_amount) else round(total_amount, 2),
+        'status': status if isinstance(status, str) and status else '已支付',
+        'items': items,
+        'product_count': len(items)
+    }
+
+
+class OrderHistory:
+    def __init__(self, per_user=None, max_users=None):
+        self.per_user = per_user or Config.ORDER_HISTORY_PER_USER
+        self.max_users = max_users or Config.ORDER_HISTORY_MAX_USERS
+        self._lock = threading.Lock()
+        self._version = None          # 视图所反映的订单表/明细表版本（登记本进程的写入时随之推进）
+        self._views = OrderedDict()   # user_id -> [订单摘要, ...]（最新在前）
+        self._hits = 0
+        self._rebuilds = 0
+
+    def _build(self, user_id):
+        orders, _ = order_index.get_page(self.per_user, user_id=user_id)
+        return [summarize_order(order) for order in attach_items(orders)]
+
+    def _store(self, user_id, summaries):
+        # 调用方需持有 self._lock
+        self._views[user_id] = summaries
+        self._views.move_to_end(user_id)
+        while len(self._views) > self.max_users:
+            self._views.popitem(last=False)
+
+    def _sync(self, version):
+        # 调用方需持有 self._lock：当前版本与已登记的版本不一致，说明有未登记的写入（其他进程），全部视图作废
+        if version != self._version:
+            self._views.clear()
+            self._version = version
+
+    def get(self, user_id):
+        """获取用户最近的订单摘要（最新在前，返回副本）"""
+        user_id = str(user_id)
+        version = data_version(*TABLES)
+        with self._lock:
+            self._sync(version)
+            summaries = self._views.get(user_id)
+            if summaries is not None:
+                self._views.move_to_end(user_id)
+                self._hits += 1
+                return [dict(order) for order in summaries]
+        # 视图不存在或已作废：按订单索引重建该用户的视图
+        summaries = self._build(user_id)
+        with self._lock:
+            self._rebuilds += 1
+            # 构建期间登记了新的写入时不保存（无法确定构建结果是否已包含该写入）
+            if self._version == version:
+                self._store(user_id, summaries)
+        return [dict(order) for order in summaries]
+
+    def version(self):
+        """当前数据版本（写入方持有表锁后、写入前获取，写入后传给 record / set_status）"""
+        return data_version(*TABLES)
+
+    def _apply(self, user_id, previous_version, change):
+        # 须在写入方仍持有表锁时调用：此时的版本只包含本次写入
+        version = data_version(*TABLES)
+        with self._lock:
+            if self._version == previous_version:
+                self._version = version
+            elif self._version != version:
+                return  # 写入前已有未登记的写入，全部视图将在下次读取时作废
+            # 版本已推进到写入后（同一次提交中的其他订单已登记）或刚刚推进：只更新该用户的视图
+            summaries = self._views.get(str(user_id))
+            if summaries is not None:
+                self._views[str(user_id)] = change(summaries)
+
+    def record(self, orders, previous_version):
+        """登记本进程新写入的订单：orders 为 (user_id, 订单摘要) 列表（摘要由 summarize_order 生成）
+        须在提交后仍持有订单表/明细表的锁时调用（如工作单元的 on_commit 回调），previous_version 为写入前的 version()"""
+        for user_id, summary in orders:
+            def change(summaries, summary=summary):
+                # 与订单索引的顺序一致：按 (下单时间, 订单ID) 倒序
+                merged = [summary] + [o for o in summaries if o['order_id'] != summary['order_id']]
+                merged.sort(key=lambda o: (o['create_time'], order_id_key(o['order_id'])), reverse=True)
+                return merged[:self.per_user]
+            self._apply(user_id, previous_version, change)
+
+    def set_status(self, user_id, order_id, status, previous_version):
+        """登记本进程对订单状态的修改（调用要求同 record）"""
+        order_id = str(order_id)
+        self._apply(user_id, previous_version,
+                    lambda summaries: [dict(o, status=status) if str(o['order_id']) == order_id else o for o in summaries])
+
+    def invalidate(self, user_id=None):
+        """清除某个用户（或全部用户）的视图"""
+        with self._lock:
+            if user_id is None:
+                self._views.clear()
+            else:
+                self._views.pop(str(user_id), None)
+
+    def metrics(self):
+        with self._lock:
+            return {'users': len(self._views), 'hits': self._hits, 'rebuilds': self._rebuilds}
+
+
+# 进程级单例
+order_history = OrderHistory()
@@ -0,0 +1,193 @@
+#订单索引
+#功能：维护按 (create_time, order_id) 排序的订单索引：全部订单、每个用户、每种状态各一份有序列表，
+#      查询某个用户的订单只按偏移随机读取其自己的记录，耗时与该用户订单数成正比，而不是扫描整个订单表；
+#      后台订单列表按游标分页（keyset），读取第N页只需二分定位游标位置再读取一页记录，与订单总数无关
+#CSV引擎：索引保存每条记录在 orders.csv 中的字节偏移和长度；新订单追加到文件末尾时只增量扫描新增部分，
+#         文件被整体重写（inode变化或文件变短）时重新构建
+#SQLite引擎：直接使用 (user_id, create_time) / (status, create_time) / (create_time, order_id) 索引查询
+import base64
+import bisect
+import json
+import math
+import os
+import threading
+from backend.storage.csv_store import parse_csv_value, read_csv_record, scan_csv_records
+from backend.storage.engine import get_store
+from backend.storage.schema import get_table
+
+
+def _sort_key(create_time):
+    return create_time if isinstance(create_time, str) else ''
+
+
+def order_id_key(order_id):
+    """order_id 统一按文本比较（表中同时存在数字ID与 USER_ORDER_xxx 形式的ID）"""
+    if order_id is None or (isinstance(order_id, float) and math.isnan(order_id)):
+        return ''
+    if isinstance(order_id, float) and order_id.is_integer():
+        order_id = int(order_id)
+    return str(order_id)
+
+
+def encode_cursor(order):
+    """分页游标：上一页最后一条订单的 (create_time, order_id)，编码为URL安全的字符串"""
+    key = [_sort_key(order.get('create_time')), order_id_key(order.get('order_id'))]
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """解析分页游标，格式不正确时抛出 ValueError"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('无效的分页游标')
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(v, str) for v in key)):
+        raise ValueError('无效的分页游标')
+    return tuple(key)
+
+
+class OrderIndex:
+    def __init__(self, table='orders'):
+        self.table = table
+        self._lock = threading.Lock()
+        self._header = None
+        # 索引项为 (create_time, order_id文本, 偏移, 长度, 状态)，各列表按 (create_time, order_id) 升序
+        self._all = []
+        self._by_user = {}       # user_id -> [索引项, ...]
+        self._by_status = {}     # 状态 -> [索引项, ...]
+        self._by_id = {}         # order_id文本 -> 索引项
+        self._file_id = None     # 已索引文件的inode
+        self._indexed_size = 0   # 已索引到的字节位置（最后一条完整记录之后）
+
+    # ---------------------- CSV 索引维护 ----------------------
+    def _path(self):
+        return get_table(self.table)['path']
+
+    def _add(self, values, offset, length):
+        """登记一条订单记录（第一条记录为表头）"""
+        if self._header is None:
+            self._header = values
+            return
+        if not values:
+            return
+        record = dict(zip(self._header, values))
+        entry = (_sort_key(record.get('create_time', '')), record.get('order_id', ''),
+                 offset, length, record.get('status', ''))
+        bisect.insort(self._all, entry)
+        bisect.insort(self._by_user.setdefault(record.get('user_id', ''), []), entry)
+        bisect.insort(self._by_status.setdefault(entry[4], []), entry)
+        self._by_id[entry[1]] = entry
+
+    def _sync(self, f):
+        """按已打开的订单文件同步索引：同一文件只扫描新追加的部分，文件被重写（inode变化或变短）时重建"""
+        st = os.fstat(f.fileno())
+        if st.st_ino == self._file_id and st.st_size == self._indexed_size:
+            return
+        if st.st_ino != self._file_id or st.st_size < self._indexed_size:
+            self._header, self._all, self._by_user, self._by_status, self._by_id = None, [], {}, {}, {}
+            self._indexed_size = 0
+        self._indexed_size = scan_csv_records(f, self._indexed_size, self._add)
+        self._file_id = st.st_ino
+
+    def refresh(self):
+        """同步索引到订单表的最新状态（写入订单后调用；读取时也会自动同步）"""
+        if get_store().engine != 'csv':
+            return
+        try:
+            f = open(self._path(), 'rb')
+        except FileNotFoundError:
+            return
+        with f, self._lock:
+            self._sync(f)
+
+    def _read_csv_orders(self, select):
+        """在索引锁内用 select() 选出索引项，再按偏移读取这些订单"""
+        try:
+            f = open(self._path(), 'rb')
+        except FileNotFoundError:
+            return []
+        columns = get_table(self.table)['columns']
+        with f:
+            # 索引与读取使用同一个文件句柄：期间文件即使被原子替换，偏移仍对应这份文件
+            with self._lock:
+                self._sync(f)
+                entries = select()
+                header = self._header
+            orders = []
+            for _, _, offset, length, _ in entries:
+                values = read_csv_record(f, offset, length)
+                orders.append({col: parse_csv_value(value, columns.get(col, '')) for col, value in zip(header, values)})
+        return orders
+
+    def _select_page(self, limit, before, status, user_id):
+        """从有序索引中倒序取出游标之前的 limit 条索引项（需持有索引锁）"""
+        if user_id is not None:
+            entries = self._by_user.get(str(user_id), [])
+        elif status is not None:
+            entries = self._by_status.get(status, [])
+        else:
+            entries = self._all
+        end = bisect.bisect_left(entries, before) if before is not None else len(entries)
+        selected = []
+        for i in range(end - 1, -1, -1):
+            if len(selected) >= limit:
+                break
+            # 同时按用户和状态筛选时，在该用户的订单中逐条判断状态
+            if status is None or entries[i][4] == status:
+                selected.append(entries[i])
+        return selected
+
+    # ---------------------- 查询 ----------------------
+    def get_user_orders(self, user_id, newest_first=False):
+        """获取某个用户的所有订单（按create_time排序）"""
+        store = get_store()
+        if not store.exists(self.table):
+            return []
+        if store.engine == 'csv':
+            orders = self._read_csv_orders(lambda: list(self._by_user.get(str(user_id), [])))
+        else:
+            orders = store.find(self.table, user_id=user_id)
+        orders.sort(key=lambda o: (_sort_key(o.get('create_time')), order_id_key(o.get('order_id'))))
+        if newest_first:
+            orders.reverse()
+        return orders
+
+    def get_orders_by_ids(self, order_ids):
+        """批量按订单ID读取订单，返回 {order_id文本: 订单}（不存在的ID不包含在结果中）"""
+        keys = list(dict.fromkeys(order_id_key(order_id) for order_id in order_ids))
+        store = get_store()
+        if not keys or not store.exists(self.table):
+            return {}
+        if store.engine == 'csv':
+            orders = self._read_csv_orders(lambda: [self._by_id[key] for key in keys if key in self._by_id])
+        else:
+            # 订单表中数字ID按整数存储，同时按文本与整数查询
+            values = keys + [int(key) for key in keys if key.isdigit()]
+            orders = store.find_in(self.table, 'order_id', values)
+        return {order_id_key(order.get('order_id')): order for order in orders}
+
+    def get_page(self, limit=20, cursor=None, status=None, user_id=None):
+        """按 (create_time, order_id) 倒序分页（最新订单在前），可按状态/用户筛选
+        cursor 为上一页返回的 next_cursor（为空表示第一页）；返回 (订单列表, next_cursor)，没有更多数据时 next_cursor 为None
+        cursor 格式不正确时抛出 ValueError"""
+        before = decode_cursor(cursor) if cursor else None
+        store = get_store()
+        if not store.exists(self.table) or limit <= 0:
+            return [], None
+        criteria = {}
+        if user_id is not None:
+            criteria['user_id'] = str(user_id)
+        if status is not None:
+            criteria['status'] = status
+        # 多取一条用于判断是否还有下一页
+        if store.engine == 'csv':
+            orders = self._read_csv_orders(lambda: self._select_page(limit + 1, before, status, user_id))
+        else:
+            orders = store.find_page(self.table, ['create_time', 'order_id'], limit + 1, before, **criteria)
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        return orders, encode_cursor(orders[-1]) if has_more else None
+
+
+# 进程级单例：app.py 与 backend 模型共用同一份索引
+order_index = OrderIndex()
@@ -0,0 +1,227 @@
+#订单商品明细
+#功能：订单主表 orders 只保存订单头（用户、金额、状态、时间），商品明细保存在规范化的 order_items 表
+#      （每个商品一行：order_id / line_no / product_id / product_name / image / price / quantity），
+#      一次索引查找即可取出多个订单的明细，订单详情与按商品统计销量不再解析订单中的JSON字段
+#兼容：尚未转换的历史订单（product_ids/product_names/quantities 或 items 布局）读取时退回 order_codec 批量解码；
+#      convert_legacy_orders() 把历史订单的明细逐块写入 order_items（只追加，可在系统运行期间执行，重复执行不会重复写入）
+#      用法：python -m backend.utils.order_items [--chunk-size 5000]
+#CSV引擎：索引保存每条明细在 order_items.csv 中的偏移（按 order_id / product_id），追加写入后只增量扫描新增部分；
+#         同步索引时持有该文件的写锁，不会读到一批写了一半的明细
+#SQLite引擎：主键 (order_id, line_no) 与 product_id 索引
+import argparse
+import math
+import os
+import threading
+from backend.config import Config
+from backend.storage.csv_store import parse_csv_value, read_csv_record, scan_csv_records
+from backend.storage.engine import get_store
+from backend.storage.file_lock import file_lock
+from backend.storage.schema import get_table
+from backend.utils.order_codec import LIST_COLUMNS, decode_orders
+from backend.utils.order_index import order_id_key, order_index
+
+CANCELED_STATUS = '已取消'
+
+
+def _present(value):
+    return value is not None and not (isinstance(value, float) and math.isnan(value))
+
+
+def item_rows(order_id, items):
+    """订单商品明细（order_codec 格式的字典列表）转换为 order_items 表的行"""
+    return [{
+        'order_id': order_id_key(order_id),
+        'line_no': line_no,
+        'product_id': item.get('product_id'),
+        'product_name': item.get('name'),
+        'image': item.get('image'),
+        'price': item.get('price'),
+        'quantity': item.get('quantity', 1),
+    } for line_no, item in enumerate(items, 1)]
+
+
+def _item(row):
+    """order_items 表的行转换为商品明细字典（与历史 items 字段格式一致，缺失的字段不输出）"""
+    item = {'product_id': row.get('product_id'), 'name': row.get('product_name'),
+            'image': row.get('image'), 'price': row.get('price'), 'quantity': row.get('quantity')}
+    return {key: value for key, value in item.items() if _present(value)}
+
+
+class OrderItemsIndex:
+    def __init__(self, table='order_items'):
+        self.table = table
+        self._lock = threading.Lock()
+        self._header = None
+        self._by_order = {}      # order_id文本 -> [(偏移, 长度), ...]
+        self._by_product = {}    # product_id文本 -> [(偏移, 长度), ...]
+        self._file_id = None
+        self._indexed_size = 0
+
+    # ---------------------- CSV 索引维护 ----------------------
+    def _path(self):
+        return get_table(self.table)['path']
+
+    def _add(self, values, offset, length):
+        if self._header is None:
+            self._header = values
+            return
+        if not values:
+            return
+        record = dict(zip(self._header, values))
+        entry = (offset, length)
+        self._by_order.setdefault(record.get('order_id', ''), []).append(entry)
+        self._by_product.setdefault(record.get('product_id', ''), []).append(entry)
+
+    def _sync(self, f):
+        st = os.fstat(f.fileno())
+        if st.st_ino == self._file_id and st.st_size == self._indexed_size:
+            return
+        # 持有写锁扫描：一次追加写入的多条明细要么全部登记，要么都不登记
+        with file_lock(self._path()):
+            st = os.fstat(f.fileno())
+            if st.st_ino != self._file_id or st.st_size < self._indexed_size:
+                self._header, self._by_order, self._by_product = None, {}, {}
+                self._indexed_size = 0
+            self._indexed_size = scan_csv_records(f, self._indexed_size, self._add)
+            self._file_id = st.st_ino
+
+    def refresh(self):
+        """同步索引到明细表的最新状态（写入明细后调用；读取时也会自动同步）"""
+        if get_store().engine != 'csv':
+            return
+        try:
+            f = open(self._path(), 'rb')
+        except FileNotFoundError:
+            return
+        with f, self._lock:
+            self._sync(f)
+
+    def _read_csv_rows(self, index, keys):
+        try:
+            f = open(self._path(), 'rb')
+        except FileNotFoundError:
+            return []
+        columns = get_table(self.table)['columns']
+        with f:
+            with self._lock:
+                self._sync(f)
+                entries = [entry for key in keys for entry in getattr(self, index).get(key, [])]
+                header = self._header
+            rows = []
+            for offset, length in entries:
+                values = read_csv_record(f, offset, length)
+                rows.append({col: parse_csv_value(value, columns.get(col, '')) for col, value in zip(header, values)})
+        return rows
+
+    def _find(self, column, keys):
+        store = get_store()
+        if not keys or not store.exists(self.table):
+            return []
+        if store.engine == 'csv':
+            return self._read_csv_rows('_by_order' if column == 'order_id' else '_by_product', keys)
+        return store.find_in(self.table, column, keys)
+
+    # ---------------------- 查询 ----------------------
+    def get_items(self, order_ids):
+        """批量读取多个订单的明细行，返回 {order_id文本: [行, ...]}（按 line_no 排序；没有明细的订单不包含在结果中）"""
+        keys = list(dict.fromkeys(order_id_key(order_id) for order_id in order_ids))
+        result = {}
+        for row in self._find('order_id', keys):
+            result.setdefault(order_id_key(row.get('order_id')), []).append(row)
+        for rows in result.values():
+            rows.sort(key=lambda row: row.get('line_no') or 0)
+        return result
+
+    def get_product_rows(self, product_ids):
+        """读取若干商品的所有明细行（按 product_id 索引）"""
+        keys = list(dict.fromkeys(str(product_id) for product_id in product_ids))
+        if get_store().engine != 'csv':
+            keys = [int(key) for key in keys if key.lstrip('-').isdigit()]
+        return self._find('product_id', keys)
+
+
+# 进程级单例
+order_items = OrderItemsIndex()
+
+
+def attach_items(orders):
+    """为订单列表批量补充商品明细（就地修改并返回）：每个订单具有 items / product_ids / product_names / quantities 字段
+    明细从 order_items 一次批量读取；没有明细行的历史订单由 order_codec 解码其JSON字段"""
+    if not orders:
+        return orders
+    found = order_items.get_items(order.get('order_id') for order in orders)
+    legacy = []
+    for order in orders:
+        rows = found.get(order_id_key(order.get('order_id')))
+        if rows is None:
+            legacy.append(order)
+            continue
+        items = [_item(row) for row in rows]
+        order['items'] = items
+        order['product_ids'] = [item.get('product_id') for item in items]
+        order['product_names'] = [item.get('name', '未知商品') for item in items]
+        order['quantities'] = [item.get('quantity', 1) for item in items]
+    decode_orders(legacy)
+    return orders
+
+
+def get_product_sales(product_ids):
+    """按商品统计销量：返回 {product_id: {'quantity': 件数, 'amount': 金额, 'orders': 订单数}}（不含已取消的订单）"""
+    rows = order_items.get_product_rows(product_ids)
+    statuses = {key: order.get('status') for key, order in
+                order_index.get_orders_by_ids(row.get('order_id') for row in rows).items()}
+    sales = {product_id: {'quantity': 0, 'amount': 0.0, 'orders': 0} for product_id in product_ids}
+    counted = set()
+    for row in rows:
+        key = order_id_key(row.get('order_id'))
+        if key not in statuses or statuses[key] == CANCELED_STATUS:
+            continue
+        entry = sales.setdefault(row.get('product_id'), {'quantity': 0, 'amount': 0.0, 'orders': 0})
+        quantity = int(row.get('quantity') or 0)
+        price = row.get('price')
+        entry['quantity'] += quantity
+        entry['amount'] = round(entry['amount'] + (price * quantity if _present(price) else 0.0), 2)
+        if (key, row.get('product_id')) not in counted:
+            counted.add((key, row.get('product_id')))
+            entry['orders'] += 1
+    return sales
+
+
+def convert_legacy_orders(chunk_size=None):
+    """把历史订单（JSON字段布局）的商品明细写入 order_items：按块读取订单表，每块一次批量写入
+    已有明细的订单跳过（重复执行不会重复写入）；只追加明细，不重写订单表。返回本次转换的订单数"""
+    store = get_store()
+    if not store.exists('orders'):
+        return 0
+    converted = 0
+    seen = set()
+    for chunk in store.iter_chunks('orders', chunk_size or Config.EXPORT_CHUNK_SIZE):
+        legacy = [order for order in chunk.to_dict('records')
+                  if any(isinstance(order.get(col), str) and order[col].strip() for col in LIST_COLUMNS)
+                  and _present(order.get('order_id')) and order_id_key(order['order_id']) not in seen]
+        if not legacy:
+            continue
+        existing = order_items.get_items(order['order_id'] for order in legacy)
+        pending = [order for order in legacy if order_id_key(order['order_id']) not in existing]
+        seen.update(order_id_key(order['order_id']) for order in legacy)
+        rows = [row for order in decode_orders(pending) for row in item_rows(order['order_id'], order['items'])]
+        if rows:
+            store.insert_many('order_items', rows)
+            order_items.refresh()
+        converted += len(pending)
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把历史订单的商品明细转换到 order_items 表')
+    parser.add_argument('--chunk-size', type=int, default=Config.EXPORT_CHUNK_SIZE, help='每次读取的订单数')
+    args = parser.parse_args()
+
+    print("===== 订单明细转换开始 =====")
+    converted = convert_legacy_orders(args.chunk_size)
+    print(f"✅ 转换{converted}个订单")
+    print("===== 订单明细转换结束 =====")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#商品搜索
+#功能：进程内维护商品的倒排索引（名称、分类、描述），按BM25排序返回匹配的商品
+#分词：中文按相邻两字切分（二元组；单独出现的一个字按单字收录，单字查询匹配包含该字的所有二元组），
+#      英文与数字按连续的字母/数字切分（不区分大小写）
+#存储：倒排表为压缩的numpy数组（词 -> 数组区间，每条记录为 商品槽位 + 加权词频），查询时向量化计算BM25得分后取前N名；
+#      新增/修改的商品先追加到尾部倒排表，修改/删除的商品旧槽位标记为失效，尾部或失效槽位累积到一定数量后合并为新的压缩数组
+#更新方式：ProductModel 新增/修改/删除商品后调用 add/update/remove 增量修改索引；
+#          商品目录快照变化（其他进程写入、后台直接改表）时在下次查询时与快照比对，只重建文本有变化的商品
+import math
+import re
+import threading
+from array import array
+import numpy as np
+from backend.utils.catalog_cache import catalog_cache
+
+FIELDS = ('name', 'category', 'description')
+FIELD_WEIGHTS = {'name': 3, 'category': 2, 'description': 1}  # 词在各字段中出现一次计入的词频
+K1 = 1.2
+B = 0.75
+MERGE_MIN = 1000        # 尾部商品数或失效槽位数达到该值（且超过索引商品数的 MERGE_RATIO）时合并
+MERGE_RATIO = 0.05
+
+_CJK = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'  # 中日韩统一表意文字（含扩展A、兼容区）
+_TOKEN_RE = re.compile(f'[{_CJK}]+|[a-z]+|[0-9]+')
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+
+def _runs(text):
+    """切分为词：中文取二元组（只有一个字时取单字），英文/数字取整词"""
+    tokens = []
+    for run in _TOKEN_RE.findall(_text(text).lower()):
+        if len(run) > 1 and not run.isascii():
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def tokenize(doc):
+    """商品 (名称, 分类, 描述) 切分为 {词: 加权词频}"""
+    terms = {}
+    for field, text in zip(FIELDS, doc):
+        weight = FIELD_WEIGHTS[field]
+        for token in _runs(text):
+            terms[token] = terms.get(token, 0) + weight
+    return terms
+
+
+def query_terms(query):
+    """查询切分为词（去重，保持顺序）"""
+    return list(dict.fromkeys(_runs(query)))
+
+
+class ProductSearch:
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._records = None     # 已同步的目录快照（商品记录列表，按对象判断快照是否重新加载）
+        self._docs = {}          # product_id -> (名称, 分类, 描述)，与快照比对用
+        self._slots = {}         # product_id -> 当前槽位
+        # 按槽位存放的数组（容量按需倍增，前 self._size 个有效）
+        self._size = 0
+        self._slot_ids = np.zeros(0, np.int64)      # 槽位 -> product_id
+        self._lengths = np.zeros(0, np.float32)     # 槽位 -> 加权文档长度
+        self._categories = np.zeros(0, np.int32)    # 槽位 -> 分类编号
+        self._alive = np.zeros(0, bool)             # 槽位是否有效（商品修改/删除后旧槽位失效）
+        self._category_codes = {}
+        self._live = 0
+        self._dead = 0
+        self._total_length = 0.0
+        # 压缩倒排表：词 -> (起, 止)，对应 self._post_slots / self._post_freqs 中的区间
+        self._vocab = {}
+        self._post_slots = np.zeros(0, np.int32)
+        self._post_freqs = np.zeros(0, np.float32)
+        self._tail = {}          # 上次合并后新增的倒排记录：词 -> (槽位数组, 词频数组)
+        self._tail_docs = 0
+        self._char_terms = {}    # 中文单字 -> 包含该字的词（单字查询用）
+
+    # ---------------------- 索引维护（需持有 self._lock） ----------------------
+    def _grow(self, size):
+        capacity = len(self._lengths)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        for name in ('_slot_ids', '_lengths', '_categories', '_alive'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _add_char_terms(self, term):
+        if not term.isascii():
+            for char in set(term):
+                self._char_terms.setdefault(char, set()).add(term)
+
+    def _add(self, product_id, doc):
+        self._remove(product_id)
+        slot = self._size
+        self._size += 1
+        self._grow(self._size)
+        terms = tokenize(doc)
+        for term, freq in terms.items():
+            postings = self._tail.get(term)
+            if postings is None:
+                postings = self._tail[term] = (array('i'), array('f'))
+                if term not in self._vocab:
+                    self._add_char_terms(term)
+            postings[0].append(slot)
+            postings[1].append(freq)
+        length = sum(terms.values())
+        self._slot_ids[slot] = product_id
+        self._lengths[slot] = length
+        self._categories[slot] = self._category_codes.setdefault(doc[1], len(self._category_codes))
+        self._alive[slot] = True
+        self._slots[product_id] = slot
+        self._docs[product_id] = doc
+        self._live += 1
+        self._total_length += length
+        self._tail_docs += 1
+
+    def _remove(self, product_id):
+        slot = self._slots.pop(product_id, None)
+        if slot is None:
+            return
+        self._alive[slot] = False
+        self._live -= 1
+        self._dead += 1
+        self._total_length -= float(self._lengths[slot])
+        del self._docs[product_id]
+
+    def _maybe_merge(self):
+        threshold = max(MERGE_MIN, MERGE_RATIO * self._live)
+        if self._tail_docs >= threshold or self._dead >= threshold:
+            self._merge()
+
+    def _merge(self):
+        """尾部倒排表并入压缩数组，同时去掉失效槽位（槽位重新编号）"""
+        size = self._size
+        alive = self._alive[:size]
+        remap = np.full(size, -1, np.int32)
+        remap[alive] = np.arange(self._live, dtype=np.int32)
+
+        # 所有倒排记录（压缩数组 + 尾部）按词编号排序，去掉失效槽位
+        terms = list(self._vocab)
+        index = {term: i for i, term in enumerate(terms)}
+        counts = [end - start for start, end in self._vocab.values()]
+        id_parts = [np.repeat(np.arange(len(terms), dtype=np.int32), counts)]
+        slot_parts, freq_parts = [self._post_slots], [self._post_freqs]
+        for term, (slots, freqs) in self._tail.items():
+            if term not in index:
+                index[term] = len(terms)
+                terms.append(term)
+            id_parts.append(np.full(len(slots), index[term], np.int32))
+            slot_parts.append(np.frombuffer(slots, np.int32))
+            freq_parts.append(np.frombuffer(freqs, np.float32))
+        term_ids = np.concatenate(id_parts)
+        slots = remap[np.concatenate(slot_parts)]
+        freqs = np.concatenate(freq_parts)
+        keep = slots >= 0
+        term_ids, slots, freqs = term_ids[keep], slots[keep], freqs[keep]
+        order = np.argsort(term_ids, kind='stable')
+        self._post_slots = slots[order]
+        self._post_freqs = freqs[order]
+
+        self._vocab = {}
+        self._char_terms = {}
+        start = 0
+        for term, end in zip(terms, np.cumsum(np.bincount(term_ids, minlength=len(terms))).tolist()):
+            if end > start:
+                self._vocab[term] = (start, end)
+                self._add_char_terms(term)
+            start = end
+
+        for name in ('_slot_ids', '_lengths', '_categories'):
+            setattr(self, name, getattr(self, name)[:size][alive].copy())
+        self._alive = np.ones(self._live, bool)
+        self._slots = dict(zip(self._slot_ids.tolist(), range(self._live)))
+        self._size = self._live
+        self._dead = 0
+        self._tail = {}
+        self._tail_docs = 0
+
+    def _postings(self, term):
+        """词的有效倒排记录 (槽位数组, 词频数组)（没有时返回None）"""
+        parts = []
+        span = self._vocab.get(term)
+        if span is not None:
+            parts.append((self._post_slots[span[0]:span[1]], self._post_freqs[span[0]:span[1]]))
+        tail = self._tail.get(term)
+        if tail is not None:
+            parts.append((np.frombuffer(tail[0], np.int32), np.frombuffer(tail[1], np.float32)))
+        if not parts:
+            return None
+        slots, freqs = parts[0] if len(parts) == 1 else (np.concatenate([p[0] for p in parts]),
+                                                         np.concatenate([p[1] for p in parts]))
+        if self._dead:
+            valid = self._alive[slots]
+            slots, freqs = slots[valid], freqs[valid]
+        return (slots, freqs) if len(slots) else None
+
+    def _sync(self):
+        """目录快照重新加载后与快照比对：新增/文本变化的商品重建，已删除的商品移除"""
+        records = catalog_cache.records()
+        if records is self._records:
+            return
+        seen = set()
+        docs = self._docs
+        for record in records:
+            product_id = record['product_id']
+            seen.add(product_id)
+            doc = (record.get('name'), record.get('category'), record.get('description'))
+            if docs.get(product_id) != doc:
+                # 只有文本与索引中不同（或含空值、数字）时才规范化后再比较
+                doc = tuple(map(_text, doc))
+                if docs.get(product_id) != doc:
+                    self._add(product_id, doc)
+        for product_id in [pid for pid in self._docs if pid not in seen]:
+            self._remove(product_id)
+        self._records = records
+        self._maybe_merge()
+
+    # ---------------------- 增量更新（ProductModel 写入成功后调用） ----------------------
+    def add(self, product_id, product):
+        """登记新增的商品（索引尚未构建时忽略，首次查询时整体构建）"""
+        with self._lock:
+            if self._records is not None:
+                self._add(int(product_id), tuple(_text(product.get(field)) for field in FIELDS))
+                self._maybe_merge()
+
+    def update(self, product_id, update_data):
+        """登记商品修改（update_data 只含修改的字段；未涉及名称/分类/描述时不改动索引）"""
+        product_id = int(product_id)
+        with self._lock:
+            doc = self._docs.get(product_id)
+            if doc is None or not any(field in update_data for field in FIELDS):
+                return
+            self._add(product_id, tuple(_text(update_data[field]) if field in update_data else old
+                                        for field, old in zip(FIELDS, doc)))
+            self._maybe_merge()
+
+    def remove(self, product_id):
+        """登记商品删除"""
+        with self._lock:
+            self._remove(int(product_id))
+            self._maybe_merge()
+
+    def refresh(self):
+        """按商品目录同步索引（启动时预先构建，避免首次查询时构建）"""
+        with self._lock:
+            self._sync()
+
+    # ---------------------- 查询 ----------------------
+    def search(self, query, limit=20, category=None):
+        """按BM25得分返回匹配的商品 [(product_id, 得分), ...]（得分从高到低，同分按ID升序，至多 limit 个）
+        包含任一查询词的商品都参与排序，包含的查询词越多、越集中在名称中得分越高；category 不为空时只返回该分类的商品"""
+        terms = query_terms(query)
+        if not terms or limit <= 0:
+            return []
+        with self._lock:
+            self._sync()
+            if len(terms) == 1 and len(terms[0]) == 1 and not terms[0].isascii():
+                terms = sorted(self._char_terms.get(terms[0], set()) | {terms[0]})
+            postings = [p for p in map(self._postings, terms) if p is not None]
+            if not postings:
+                return []
+            k1, b = self.k1, self.b
+            live, size = self._live, self._size
+            scale = k1 * b * live / self._total_length
+            scores = np.zeros(size, np.float32)
+            for slots, freqs in postings:
+                idf = math.log(1 + (live - len(slots) + 0.5) / (len(slots) + 0.5))
+                scores[slots] += (idf * (k1 + 1)) * freqs / (freqs + k1 * (1 - b) + scale * self._lengths[slots])
+            # 只有一个词时其倒排记录即为全部候选，不必扫描整个得分数组
+            candidates = postings[0][0] if len(postings) == 1 else np.flatnonzero(scores > 0)
+            if category and category != '全部商品':
+                candidates = candidates[self._categories[candidates] == self._category_codes.get(category, -1)]
+            if not len(candidates):
+                return []
+            # 取第 limit 名的得分，得分不低于它的商品按 (得分降序, ID升序) 排序后取前 limit 个（同分时结果稳定）
+            count = min(limit, len(candidates))
+            candidate_scores = scores[candidates]
+            cutoff = -np.partition(-candidate_scores, count - 1)[count - 1]
+            selected = candidates[candidate_scores >= cutoff]
+            product_ids = self._slot_ids[selected]
+            top_scores = scores[selected]
+        order = np.lexsort((product_ids, -top_scores))[:count]
+        return [(int(product_ids[i]), round(float(top_scores[i]), 4)) for i in order]
+
+    def metrics(self):
+        with self._lock:
+            return {'products': self._live, 'terms': len(self._vocab), 'postings': len(self._post_slots),
+                    'tail_products': self._tail_docs, 'dead_slots': self._dead}
+
+
+# 进程级单例
+product_search = ProductSearch()
+
+
+def start_background():
+    """在后台线程中构建索引，不阻塞启动（构建完成前到达的搜索请求等待构建完成）"""
+    def run():
+        try:
+            product_search.refresh()
+            print(f"✅ 商品搜索索引构建完成：{product_search.metrics()}")
+        except Exception as e:
+            print(f"❌ 商品搜索索引构建失败（首次搜索时重新构建）：{e}")
+
+    thread = threading.Thread(target=run, name='product-search-index', daemon=True)
+    thread.start()
+    return thread
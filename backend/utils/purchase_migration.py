@@ -0,0 +1,255 @@
+#购买记录迁移为订单
+#功能：把 user_actions 中的购买行为（purchase）按 (用户, 时间, 会话) 合并为订单，写入 orders（订单头）与 order_items（明细）
+#流式：按块增量读取行为日志（store.read_appended 的游标），内存占用只与块大小有关；
+#      每处理完一块保存检查点（游标 + 可能延续到下一块的购买记录），中断后从检查点继续；
+#      分组（同一次购买的记录可能跨块、与其他会话的记录交错）在读到比分组时间晚 PURCHASE_MIGRATION_GROUP_WINDOW 秒以上的
+#      记录之前都留到下一块，之后才写入，不会因订单已存在而丢失后续明细；迁移结果与块大小无关
+#幂等：订单ID由 (用户, 时间, 会话) 生成，已存在的订单跳过；用户在 PURCHASE_MATCH_WINDOW 秒内已有其他订单
+#      （下单接口直接写入的订单）时视为同一次购买，也跳过
+#执行：不在启动流程中同步执行——python -m backend.utils.purchase_migration，或由 start_background() 在后台线程中执行
+#用法：python -m backend.utils.purchase_migration [--chunk-size 5000] [--restart]
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+from datetime import datetime
+from backend.config import Config
+from backend.storage.engine import get_store
+from backend.storage.file_lock import atomic_write
+from backend.utils.action_log import flush_actions
+from backend.utils.catalog_cache import catalog_cache
+from backend.utils.order_index import order_id_key, order_index
+from backend.utils.order_items import item_rows, order_items
+
+CHECKPOINT_VERSION = 1
+ORDER_ID_PREFIX = 'USER_ORDER_M'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_running = threading.Lock()  # 同一进程内只允许一个迁移在执行
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value)
+
+
+def _number(value, default=0):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if math.isnan(number) else number
+
+
+def _group_key(row):
+    return (_text(row.get('user_id')), _text(row.get('timestamp')), _text(row.get('session_id')))
+
+
+def migrated_order_id(key):
+    """迁移生成的订单ID：由 (用户, 时间, 会话) 确定，重复执行得到同一个ID"""
+    return ORDER_ID_PREFIX + hashlib.sha1('\x1f'.join(key).encode('utf-8')).hexdigest()[:16]
+
+
+def _parse_time(value):
+    try:
+        return datetime.strptime(_text(value)[:19], TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+# ---------------------- 检查点 ----------------------
+def _new_state():
+    return {'version': CHECKPOINT_VERSION, 'cursor': None, 'pending': [], 'migrated': 0, 'skipped': 0,
+            'done': False, 'updated_at': None}
+
+
+def load_checkpoint(path=None):
+    """读取检查点（不存在或版本不符返回None）"""
+    try:
+        with open(path or Config.PURCHASE_MIGRATION_CHECKPOINT, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('version') == CHECKPOINT_VERSION else None
+
+
+def _save_checkpoint(path, state):
+    state['updated_at'] = datetime.now().strftime(TIME_FORMAT)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, lambda f: json.dump(state, f, ensure_ascii=False), encoding='utf-8')
+
+
+# ---------------------- 写入订单 ----------------------
+class _LiveOrders:
+    """用户已有的非迁移订单的下单时间（按用户缓存，同一次迁移中只读取一次）"""
+
+    def __init__(self, window):
+        self.window = window
+        self._times = {}
+
+    def has_order_near(self, user_id, create_time):
+        if user_id not in self._times:
+            self._times[user_id] = [t for t in (_parse_time(o.get('create_time'))
+                                                for o in order_index.get_user_orders(user_id)
+                                                if not order_id_key(o.get('order_id')).startswith(ORDER_ID_PREFIX))
+                                    if t is not None]
+        when = _parse_time(create_time)
+        return when is not None and any(abs((when - t).total_seconds()) <= self.window for t in self._times[user_id])
+
+
+def _build_order(order_id, rows):
+    first = rows[0]
+    items = []
+    for row in rows:
+        product_id = row.get('product_id')
+        quantity = int(_number(row.get('quantity'), 1)) or 1
+        amount = _number(row.get('total_amount'))
+        product = catalog_cache.get(product_id) or {}
+        items.append({
+            'product_id': int(_number(product_id)) if _text(product_id) else None,
+            'name': _text(row.get('product_name')) or product.get('name', '未知商品'),
+            'image': product.get('image'),
+            'quantity': quantity,
+            'price': round(amount / quantity, 2)
+        })
+    header = {
+        'order_id': order_id,
+        'user_id': _text(first.get('user_id')),
+        'username': _text(first.get('username')) or '未知用户',
+        'total_amount': round(sum(_number(row.get('total_amount')) for row in rows), 2),
+        'status': '已支付',
+        'create_time': _text(first.get('timestamp')),
+    }
+    return header, items
+
+
+def _write_groups(groups, live):
+    """把若干组购买记录写入订单表，返回 (写入的订单数, 跳过的订单数)"""
+    if not groups:
+        return 0, 0
+    ids = [migrated_order_id(key) for key, _ in groups]
+    existing = order_index.get_orders_by_ids(ids)
+    existing_items = order_items.get_items(ids)
+    headers, rows = [], []
+    skipped = 0
+    for order_id, ((user_id, timestamp, _), group) in zip(ids, groups):
+        if order_id in existing or live.has_order_near(user_id, timestamp):
+            skipped += 1
+            continue
+        header, items = _build_order(order_id, group)
+        headers.append(header)
+        if order_id not in existing_items:  # 上次中断在写入明细之后、写入订单头之前
+            rows.extend(item_rows(order_id, items))
+    store = get_store()
+    # 先写明细再写订单头：读取方看到订单时其明细已完整
+    if rows:
+        store.insert_many('order_items', rows)
+        order_items.refresh()
+    if headers:
+        store.insert_many('orders', headers)
+        order_index.refresh()
+    return len(headers), skipped
+
+
+def _group(rows):
+    """按 (用户, 时间, 会话) 分组（保持首次出现的顺序）"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(_group_key(row), []).append(row)
+    return list(groups.items())
+
+
+def _split_open_groups(groups, rows, window):
+    """把分组分为 (本块写入的分组, 留到下一块的记录)：已读到的记录中最晚的时间比分组时间晚不到 window 秒时，
+    该分组可能还有记录在后面的块中（时间无法解析的分组直接写入）"""
+    times = [when for when in (_parse_time(row.get('timestamp')) for row in rows) if when is not None]
+    latest = max(times) if times else None
+    closed, pending = [], []
+    for key, group in groups:
+        when = _parse_time(key[1])
+        if when is not None and (latest is None or (latest - when).total_seconds() <= window):
+            pending.extend(group)
+        else:
+            closed.append((key, group))
+    return closed, pending
+
+
+# ---------------------- 迁移 ----------------------
+def migrate_purchases(chunk_size=None, checkpoint_path=None, restart=False):
+    """执行（或从检查点继续）迁移，返回检查点状态：migrated / skipped 为累计写入/跳过的订单数"""
+    path = checkpoint_path or Config.PURCHASE_MIGRATION_CHECKPOINT
+    chunk_size = chunk_size or Config.PURCHASE_MIGRATION_CHUNK_SIZE
+    store = get_store()
+    with _running:
+        state = None if restart else load_checkpoint(path)
+        state = state or _new_state()
+        state['done'] = False
+        if not store.exists('user_actions'):
+            state['done'] = True
+            _save_checkpoint(path, state)
+            return state
+        flush_actions()  # 缓冲中的行为记录先落盘
+        live = _LiveOrders(Config.PURCHASE_MATCH_WINDOW)
+        while True:
+            rows, cursor, reset = store.read_appended('user_actions', state['cursor'], limit=chunk_size)
+            if reset:
+                # 日志被重写：从头重新读取（已写入的订单按ID跳过）
+                state['pending'] = []
+            at_end = len(rows) < chunk_size
+            purchases = state['pending'] + [row for row in rows if row.get('action_type') == 'purchase']
+            groups = _group(purchases)
+            # 可能延续到下一块的分组保留到检查点中，读到后续记录后一起写入
+            pending = []
+            if not at_end:
+                groups, pending = _split_open_groups(groups, rows, Config.PURCHASE_MIGRATION_GROUP_WINDOW)
+            migrated, skipped = _write_groups(groups, live)
+            state.update(cursor=cursor, pending=pending, migrated=state['migrated'] + migrated,
+                         skipped=state['skipped'] + skipped, done=at_end)
+            _save_checkpoint(path, state)
+            if at_end:
+                return state
+
+
+def migration_pending(checkpoint_path=None):
+    """是否需要执行迁移：检查点显示上次未完成；或尚无检查点且订单表为空（首次启动）"""
+    state = load_checkpoint(checkpoint_path)
+    if state is not None:
+        return not state.get('done')
+    store = get_store()
+    return not store.exists('orders') or store.count('orders') == 0
+
+
+def start_background(chunk_size=None):
+    """需要迁移时在后台线程中执行，不阻塞启动；返回线程（无需迁移返回None）"""
+    if not migration_pending():
+        return None
+
+    def run():
+        try:
+            state = migrate_purchases(chunk_size)
+            print(f"✅ 购买记录迁移完成：新增{state['migrated']}个订单，跳过{state['skipped']}个")
+        except Exception as e:
+            print(f"❌ 购买记录迁移失败（下次启动从检查点继续）：{e}")
+
+    thread = threading.Thread(target=run, name='purchase-migration', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把用户行为日志中的购买记录迁移为订单')
+    parser.add_argument('--chunk-size', type=int, default=Config.PURCHASE_MIGRATION_CHUNK_SIZE, help='每次读取的行为记录数')
+    parser.add_argument('--restart', action='store_true', help='忽略检查点，从头重新扫描（已写入的订单不会重复写入）')
+    args = parser.parse_args()
+
+    print("===== 购买记录迁移开始 =====")
+    state = migrate_purchases(args.chunk_size, restart=args.restart)
+    print(f"✅ 新增{state['migrated']}个订单，跳过{state['skipped']}个（已存在或已由下单接口写入）")
+    print("===== 购买记录迁移结束 =====")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+#会话标识
+#功能：当前请求会话的标识（行为日志的 session_id、结算页库存预留的标识），会话中没有时生成并保存，
+#      应用与各API蓝图统一通过 get_session_id() 获取，保证同一会话的预留能被本会话的结算识别并释放
+import uuid
+from flask import session
+
+
+def get_session_id():
+    """当前会话标识（不存在时生成并写入会话）"""
+    session_id = session.get('_id')
+    if not session_id:
+        session_id = str(uuid.uuid4())
+        session['_id'] = session_id
+    return session_id
@@ -0,0 +1,162 @@
+#库存账本
+#功能：进程内维护每个商品的库存与结算预留，库存查询、预留、扣减在一把锁内完成，均为O(1)字典操作（不读取商品表）
+#      available = 库存 - 其他会话的有效预留；打开结算页时为该会话预留购物车中的商品（STOCK_RESERVATION_TTL 秒后过期）
+#同步：账本记录加载时商品表的版本标记；结算在工作单元内提交库存扣减后增量修改账本，
+#      版本标记变化（后台改库存、其他进程下单）时在下次访问时按商品目录重新加载库存（预留保留）
+#持久化：库存以商品表为准，扣减随结算的工作单元一次写入商品表（不另行定期回写，多进程不会互相覆盖）；
+#        预留只在本进程内有效，跨进程的超卖由结算时在工作单元锁内的校验保证
+import heapq
+import math
+import threading
+import time
+from backend.config import Config
+from backend.storage.engine import get_store
+from backend.utils.catalog_cache import catalog_cache
+
+
+def _stock_value(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return 0 if math.isnan(value) else int(value)
+
+
+class StockLedger:
+    def __init__(self, table='products', ttl=None):
+        self.table = table
+        self.ttl = ttl or Config.STOCK_RESERVATION_TTL
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._loaded_stamp = None
+        self._stock = {}          # product_id -> 库存
+        self._reserved = {}       # product_id -> 有效预留合计
+        self._reservations = {}   # 预留标识（会话ID） -> (过期时间, {product_id: 数量})
+        self._expiry = []         # (过期时间, 预留标识) 小顶堆，用于清理过期预留
+
+    # ---------------------- 加载与维护（需持有 self._lock） ----------------------
+    def _ensure_loaded(self):
+        stamp = get_store().stamp(self.table)
+        if self._loaded and self._loaded_stamp == stamp:
+            return
+        self._stock = {product['product_id']: _stock_value(product.get('stock')) for product in catalog_cache.get_all()}
+        self._loaded_stamp = stamp
+        self._loaded = True
+
+    def _release(self, token):
+        reservation = self._reservations.pop(token, None)
+        if reservation is None:
+            return
+        for product_id, quantity in reservation[1].items():
+            left = self._reserved.get(product_id, 0) - quantity
+            if left > 0:
+                self._reserved[product_id] = left
+            else:
+                self._reserved.pop(product_id, None)
+
+    def _purge(self, now):
+        """清理已过期的预留（堆中的过期项若已被续期则跳过）"""
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, token = heapq.heappop(self._expiry)
+            reservation = self._reservations.get(token)
+            if reservation is not None and reservation[0] == expires_at:
+                self._release(token)
+
+    def _available(self, product_id, token):
+        own = self._reservations.get(token, (0, {}))[1].get(product_id, 0) if token else 0
+        return self._stock.get(product_id, 0) - self._reserved.get(product_id, 0) + own
+
+    def _shortages(self, quantities, token, staged=None):
+        staged = staged or {}
+        available = {product_id: self._available(product_id, token) - staged.get(product_id, 0) for product_id in quantities}
+        return {product_id: max(available[product_id], 0)
+                for product_id, quantity in quantities.items() if quantity > available[product_id]}
+
+    # ---------------------- 查询与预留 ----------------------
+    def available(self, product_id, token=None):
+        """可售数量：库存减去其他会话的有效预留（token 为当前会话，其自身的预留计入可售）"""
+        with self._lock:
+            self._ensure_loaded()
+            self._purge(time.time())
+            return max(self._available(int(product_id), token), 0)
+
+    def shortages(self, quantities, token=None):
+        """检查 {product_id: 数量} 是否都可售，返回不足的商品 {product_id: 可售数量}（全部可售返回空字典）"""
+        with self._lock:
+            self._ensure_loaded()
+            self._purge(time.time())
+            return self._shortages({int(pid): qty for pid, qty in quantities.items()}, token)
+
+    def reserve(self, token, quantities, ttl=None):
+        """为会话预留 {product_id: 数量}（替换该会话之前的预留）：全部可售才预留，
+        返回不足的商品 {product_id: 可售数量}；不足时保留之前的预留不变"""
+        quantities = {int(pid): qty for pid, qty in quantities.items() if qty > 0}
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            self._purge(now)
+            shortages = self._shortages(quantities, token)
+            if shortages:
+                return shortages
+            self._release(token)
+            if quantities:
+                expires_at = now + (ttl or self.ttl)
+                self._reservations[token] = (expires_at, quantities)
+                heapq.heappush(self._expiry, (expires_at, token))
+                for product_id, quantity in quantities.items():
+                    self._reserved[product_id] = self._reserved.get(product_id, 0) + quantity
+            return {}
+
+    def release(self, token):
+        """释放会话的预留"""
+        with self._lock:
+            self._release(token)
+
+    # ---------------------- 结算 ----------------------
+    def stage_sale(self, uow, quantities, token=None, staged=None):
+        """在结算的工作单元中（已锁定商品表）校验并暂存库存扣减：
+        库存不足返回 {product_id: 可售数量}，不暂存任何写入；否则暂存商品表扣减，提交后扣减账本并释放该会话的预留
+        staged 为同一工作单元中已暂存的扣减 {product_id: 可售数量的减少}（批量结算时由调用方传入，本次扣减会累加到其中）"""
+        quantities = {int(pid): qty for pid, qty in quantities.items()}
+        store = get_store()
+        with self._lock:
+            # 工作单元持有商品表的锁，此处加载的库存即最新库存
+            self._ensure_loaded()
+            self._purge(time.time())
+            shortages = self._shortages(quantities, token, staged)
+            if shortages:
+                return shortages
+            if staged is not None:
+                # 提交后本会话的预留随之释放，可售数量实际减少 扣减数 - 本会话的预留
+                own = self._reservations.get(token, (0, {}))[1] if token else {}
+                for product_id, quantity in quantities.items():
+                    staged[product_id] = staged.get(product_id, 0) + quantity - own.get(product_id, 0)
+        for product_id, quantity in quantities.items():
+            uow.adjust(self.table, {'product_id': product_id}, 'stock', -quantity, min_value=0)
+
+        def apply():
+            # 仍持有商品表的锁：提交后的版本标记只包含本次扣减
+            with self._lock:
+                for product_id, quantity in quantities.items():
+                    self._stock[product_id] = max(self._stock.get(product_id, 0) - quantity, 0)
+                if token:
+                    self._release(token)
+                if self._loaded:
+                    self._loaded_stamp = store.stamp(self.table)
+
+        uow.on_commit(apply)
+        return {}
+
+    def invalidate(self):
+        """强制下次访问时按商品目录重新加载库存（预留保留）"""
+        with self._lock:
+            self._loaded = False
+
+    def metrics(self):
+        with self._lock:
+            return {'products': len(self._stock), 'reservations': len(self._reservations),
+                    'reserved_units': sum(self._reserved.values())}
+
+
+# 进程级单例
+stock_ledger = StockLedger()
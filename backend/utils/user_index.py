@@ -0,0 +1,187 @@
+#用户索引
+#功能：进程内缓存用户表，维护 user_id / username / phone 三个哈希索引，登录与注册查重为O(1)字典查询
+#失效机制：通过本模块的 insert / update / adjust 写入时，在存储锁内同步修改索引（增量更新，不重新读取整表）；
+#          存储引擎的表版本标记变化（其他进程或其他代码写入）时整表重新加载
+import json
+import math
+import threading
+from backend.storage.engine import get_store
+
+_KEYS = ('user_id', 'username', 'phone')
+
+
+def _key(value):
+    """索引键统一为非空字符串（空值/NaN不建索引）"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = str(value)
+    return value or None
+
+
+def _stored(row):
+    """写入索引的行与从存储读回的格式保持一致（列表/字典字段存为JSON字符串）"""
+    return {k: json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v for k, v in row.items()}
+
+
+class UserIndex:
+    def __init__(self, table='users'):
+        self.table = table
+        self._lock = threading.RLock()
+        self._loaded_stamp = None
+        self._loaded = False
+        self._rows = []                                   # 按存储顺序排列的用户行
+        self._by = {key: {} for key in _KEYS}             # 列名 -> {键值: 用户行}
+
+    # ---------------------- 加载与维护 ----------------------
+    @staticmethod
+    def _index_row(rows, by, row):
+        rows.append(row)
+        for key in _KEYS:
+            value = _key(row.get(key))
+            if value is not None:
+                by[key].setdefault(value, row)  # 重复值以第一条为准（与原先顺序扫描一致）
+
+    def _add(self, row):
+        self._index_row(self._rows, self._by, row)
+
+    def _reindex(self, row, old_values):
+        """行的索引列被修改后，移除旧键并登记新键"""
+        for key in _KEYS:
+            old, new = _key(old_values.get(key)), _key(row.get(key))
+            if old == new:
+                continue
+            if old is not None and self._by[key].get(old) is row:
+                del self._by[key][old]
+            if new is not None:
+                self._by[key].setdefault(new, row)
+
+    def _load(self, stamp):
+        # 先构建完整的新索引再替换，加载期间的并发读取仍使用旧索引
+        rows, by = [], {key: {} for key in _KEYS}
+        if stamp is not None:
+            for row in get_store().find(self.table):
+                self._index_row(rows, by, row)
+        self._rows, self._by = rows, by
+        self._loaded_stamp = stamp
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        stamp = get_store().stamp(self.table)
+        if self._loaded and self._loaded_stamp == stamp:
+            return
+        with self._lock:
+            stamp = get_store().stamp(self.table)
+            if not (self._loaded and self._loaded_stamp == stamp):
+                self._load(stamp)
+
+    def _write(self, write_func, apply_func):
+        """在存储锁内执行写入：写入前索引是最新的则增量修改，否则留待下次读取时整表加载"""
+        store = get_store()
+        with store.locked(self.table), self._lock:
+            fresh = self._loaded and self._loaded_stamp == store.stamp(self.table)
+            result = write_func(store)
+            if fresh and result:
+                apply_func()
+                self._loaded_stamp = store.stamp(self.table)
+            return result
+
+    def invalidate(self):
+        """强制下次读取时重新加载"""
+        with self._lock:
+            self._loaded = False
+
+    # ---------------------- 查询 ----------------------
+    def _get(self, key, value):
+        value = _key(value)
+        if value is None:
+            return None
+        self._ensure_loaded()
+        row = self._by[key].get(value)
+        return dict(row) if row is not None else None
+
+    def get(self, user_id):
+        """通过user_id获取用户（返回副本，不存在返回None）"""
+        return self._get('user_id', user_id)
+
+    def get_by_username(self, username):
+        return self._get('username', username)
+
+    def get_by_phone(self, phone):
+        return self._get('phone', phone)
+
+    def find_login(self, login_id):
+        """登录匹配：user_id / 用户名 / 手机号 任一匹配的用户（去重，按存储顺序）"""
+        self._ensure_loaded()
+        value = _key(login_id)
+        matches = [self._by[key].get(value) for key in _KEYS] if value is not None else []
+        seen = []
+        for row in matches:
+            if row is not None and all(row is not other for other in seen):
+                seen.append(row)
+        return [dict(row) for row in seen]
+
+    def all(self):
+        """所有用户（按存储顺序，返回副本）"""
+        self._ensure_loaded()
+        return [dict(row) for row in self._rows]
+
+    def count(self):
+        self._ensure_loaded()
+        return len(self._rows)
+
+    # ---------------------- 写入（写存储并增量更新索引） ----------------------
+    def insert(self, user):
+        """新增用户"""
+        row = _stored(user)
+        return self._write(lambda store: store.insert(self.table, row), lambda: self._add(row))
+
+    def update(self, user_id, values):
+        """修改用户字段，返回是否找到该用户"""
+        values = _stored(values)
+
+        def apply():
+            row = self._by['user_id'].get(_key(user_id))
+            if row is not None:
+                old_values = dict(row)
+                row.update({k: v for k, v in values.items() if k in row})
+                self._reindex(row, old_values)
+
+        return self._write(lambda store: store.update(self.table, {'user_id': user_id}, values) > 0, apply)
+
+    def _apply_adjust(self, user_id, column, delta, min_value):
+        row = self._by['user_id'].get(_key(user_id))
+        if row is not None:
+            current = row.get(column)
+            current = 0 if current is None or (isinstance(current, float) and math.isnan(current)) else current
+            new_value = current + delta
+            row[column] = max(new_value, min_value) if min_value is not None else new_value
+
+    def adjust(self, user_id, column, delta, min_value=None):
+        """数值字段增减（如余额），返回修改后的用户（不存在返回None）"""
+        self._ensure_loaded()
+        criteria = {'user_id': user_id}
+        if not self._write(lambda store: store.adjust(self.table, criteria, column, delta, min_value) > 0,
+                           lambda: self._apply_adjust(user_id, column, delta, min_value)):
+            return None
+        return self.get(user_id)
+
+    def stage_adjust(self, uow, user_id, column, delta, min_value=None):
+        """在工作单元中暂存数值字段增减（工作单元已锁定用户表）：提交后增量修改索引，回滚时索引不变"""
+        self._ensure_loaded()
+        store = get_store()
+        with self._lock:
+            fresh = self._loaded and self._loaded_stamp == store.stamp(self.table)
+        uow.adjust(self.table, {'user_id': user_id}, column, delta, min_value)
+
+        def apply():
+            with self._lock:
+                # 写入前索引是最新的才增量修改，否则留待下次读取时整表加载
+                if fresh and self._loaded:
+                    self._apply_adjust(user_id, column, delta, min_value)
+                    self._loaded_stamp = store.stamp(self.table)
+
+        uow.on_commit(apply)
+
+
+# 进程级单例：app.py 与 backend 模型共用同一份索引
+user_index = UserIndex()
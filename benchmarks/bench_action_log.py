@@ -0,0 +1,83 @@
+#用户行为日志写入基准测试
+#功能：对比"追加写入"与旧的"读取-拼接-重写"方式，在日志规模从1千到100万行时的单条写入耗时
+#用法：python benchmarks/bench_action_log.py [--sizes 1000,10000,100000,1000000] [--events 200] [--legacy-max 100000]
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from backend.utils.action_log import ACTION_FIELDS, append_action
+
+
+def make_row(i):
+    return {
+        'timestamp': '2025-11-26 17:22:16',
+        'user_id': f'user_{i % 500}',
+        'username': f'用户{i % 500}',
+        'product_id': i % 8 + 1,
+        'product_name': 'iPhone 15 Pro',
+        'product_category': '手机数码',
+        'action_type': 'view',
+        'session_id': 'c87f9b14-4ada-4c0e-a08a-d494f55b67a0',
+        'quantity': 1,
+        'total_amount': 0
+    }
+
+
+def build_log(path, rows):
+    """生成指定行数的行为日志（带BOM表头，与线上文件格式一致）"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=ACTION_FIELDS, lineterminator=os.linesep)
+        writer.writeheader()
+        for i in range(rows):
+            writer.writerow(make_row(i))
+
+
+def legacy_append(path, row):
+    """旧实现：读取全量日志、拼接一行、重写整个文件"""
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    pd.concat([df, pd.DataFrame([row])], ignore_index=True).to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def time_per_event(fn, path, events):
+    start = time.perf_counter()
+    for i in range(events):
+        fn(path, make_row(i))
+    return (time.perf_counter() - start) / events * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户行为日志写入基准测试')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='日志初始行数（逗号分隔）')
+    parser.add_argument('--events', type=int, default=200, help='每个规模下追加的事件数')
+    parser.add_argument('--legacy-max', type=int, default=100000, help='旧实现只测到该规模（更大规模单条耗时以秒计）')
+    parser.add_argument('--legacy-events', type=int, default=5, help='旧实现每个规模追加的事件数')
+    parser.add_argument('--no-fsync', action='store_true', help='追加写入时不调用fsync')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    fsync = not args.no_fsync
+    print(f"{'日志行数':>10} | {'追加写入 ms/条':>14} | {'旧实现 ms/条':>12}")
+    print('-' * 46)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'user_actions.csv')
+        for size in sizes:
+            build_log(path, size)
+            append_ms = time_per_event(lambda p, r: append_action(r, path=p, fsync=fsync), path, args.events)
+
+            legacy_ms = None
+            if size <= args.legacy_max:
+                build_log(path, size)
+                legacy_ms = time_per_event(legacy_append, path, args.legacy_events)
+
+            legacy_str = f'{legacy_ms:12.3f}' if legacy_ms is not None else f"{'跳过':>12}"
+            print(f'{size:>10} | {append_ms:14.3f} | {legacy_str}')
+
+
+if __name__ == '__main__':
+    main()
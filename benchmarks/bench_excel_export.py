@@ -0,0 +1,102 @@
+#Excel导出内存基准测试
+#功能：对比"分块读取 + openpyxl只写模式"与旧的"读取整表 + pd.ExcelWriter"两种方式，
+#      导出10万/100万行用户行为数据为xlsx时的峰值内存（RSS）与耗时
+#用法：python benchmarks/bench_excel_export.py [--sizes 100000,1000000] [--legacy-max 1000000]
+#说明：每次导出在独立子进程中执行，峰值内存取子进程的 ru_maxrss；数据在临时目录中生成，不会修改 data/ 下的数据
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+
+def build_log(path, rows):
+    """生成指定行数的行为日志（带BOM表头，与线上文件格式一致）"""
+    from backend.utils.action_log import ACTION_FIELDS
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=ACTION_FIELDS, lineterminator=os.linesep)
+        writer.writeheader()
+        for i in range(rows):
+            writer.writerow({
+                'timestamp': f'2025-11-{i % 28 + 1:02d} 17:22:16', 'user_id': f'user_{i % 500}',
+                'username': f'用户{i % 500}', 'product_id': i % 8 + 1, 'product_name': 'iPhone 15 Pro',
+                'product_category': '手机数码', 'action_type': 'view',
+                'session_id': 'c87f9b14-4ada-4c0e-a08a-d494f55b67a0', 'quantity': 1, 'total_amount': 0
+            })
+
+
+def peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def legacy_export(output):
+    """旧实现：读取整表为DataFrame，经 pd.ExcelWriter 在内存中生成整个工作簿"""
+    from io import BytesIO
+    import pandas as pd
+    from backend.storage.engine import get_store
+    df = get_store().read_table('user_actions')
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='用户行为数据')
+    with open(output, 'wb') as f:
+        f.write(buffer.getvalue())
+
+
+def streaming_export(output):
+    """新实现：分块读取 + 只写模式工作簿"""
+    from backend.utils.excel_utils import write_excel
+    from backend.utils.export_stream import iter_export_chunks, parse_export_options
+    options = parse_export_options('user_actions', {'format': 'xlsx'})
+    with open(output, 'wb') as f:
+        write_excel(iter_export_chunks('user_actions', options), f, '用户行为数据')
+
+
+def run_export(method, output, results):
+    start = time.perf_counter()
+    {'legacy': legacy_export, 'streaming': streaming_export}[method](output)
+    results.put((time.perf_counter() - start, peak_rss_mb()))
+
+
+def measure(ctx, method, output):
+    results = ctx.Queue()
+    proc = ctx.Process(target=run_export, args=(method, output, results))
+    proc.start()
+    elapsed, rss = results.get()
+    proc.join()
+    return elapsed, rss, os.path.getsize(output) / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Excel导出内存基准测试')
+    parser.add_argument('--sizes', default='100000,1000000', help='导出行数（逗号分隔）')
+    parser.add_argument('--legacy-max', type=int, default=1000000, help='旧实现只测到该规模（100万行时需数GB内存）')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    print(f"{'行数':>9} | {'实现':>9} | {'峰值RSS(MB)':>11} | {'耗时(s)':>8} | {'文件(MB)':>8}")
+    print('-' * 60)
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 子进程通过环境变量使用临时数据目录（必须在导入backend模块之前设置）
+        os.environ['ECOMMERCE_DATA_DIR'] = data_dir
+        os.environ['ECOMMERCE_STORAGE_ENGINE'] = 'csv'
+        ctx = multiprocessing.get_context('spawn')
+        for size in sizes:
+            build_log(os.path.join(data_dir, 'user_actions.csv'), size)
+            output = os.path.join(data_dir, 'export.xlsx')
+            for method in ('streaming', 'legacy'):
+                if method == 'legacy' and size > args.legacy_max:
+                    print(f"{size:>9} | {method:>9} | {'跳过':>11} | {'':>8} | {'':>8}")
+                    continue
+                elapsed, rss, file_mb = measure(ctx, method, output)
+                print(f'{size:>9} | {method:>9} | {rss:11.1f} | {elapsed:8.1f} | {file_mb:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#订单解码基准测试
+#功能：对比"逐行 json.loads"与 order_codec 批量解码，解码N个订单（后台格式与前台items格式各占一半）的耗时
+#用法：python benchmarks/bench_order_codec.py [--sizes 1000,10000,100000] [--repeat 3]
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.utils.order_codec import LIST_COLUMNS, decode_orders
+
+
+def make_orders(count):
+    orders = []
+    for i in range(count):
+        if i % 2:
+            orders.append({'order_id': i, 'items': json.dumps([
+                {'product_id': i % 8 + 1, 'name': '小米平板6', 'image': f'{i % 8 + 1}.jpg', 'quantity': 1, 'price': 2499.0}
+            ])})
+        else:
+            orders.append({'order_id': i, 'product_ids': json.dumps([i % 8 + 1, 3]),
+                           'product_names': json.dumps(['iPhone 15 Pro', '小米平板6'], ensure_ascii=False),
+                           'quantities': json.dumps([1, 2])})
+    return orders
+
+
+def legacy_decode(orders):
+    """旧实现：逐行逐列调用 json.loads"""
+    for order in orders:
+        for col in LIST_COLUMNS:
+            try:
+                order[col] = json.loads(order[col])
+            except Exception:
+                pass
+    return orders
+
+
+def best_of(func, count, repeat):
+    best = None
+    for _ in range(repeat):
+        orders = make_orders(count)
+        start = time.perf_counter()
+        func(orders)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='订单解码基准测试')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='订单数（逗号分隔）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    print(f"{'订单数':>8} | {'逐行解析(ms)':>12} | {'批量解码(ms)':>12}")
+    print('-' * 42)
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        legacy = best_of(legacy_decode, size, args.repeat)
+        bulk = best_of(decode_orders, size, args.repeat)
+        print(f'{size:>8} | {legacy * 1000:12.1f} | {bulk * 1000:12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#商品搜索基准测试
+#功能：生成N个商品（中英文混合的名称、分类、描述），统计倒排索引的构建耗时与各类查询的延迟（中位数/P99），
+#      以及增量更新（新增/修改/删除单个商品）的耗时
+#用法：python benchmarks/bench_product_search.py [--products 100000] [--repeat 200]
+#说明：在临时数据目录中运行（通过 ECOMMERCE_DATA_DIR 指定），不会修改 data/ 下的数据
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BRANDS = ['华为', '小米', '苹果', 'OPPO', 'vivo', '联想', '戴尔', '索尼', '海尔', '美的', 'Nike', 'Adidas', '李宁', '安踏', '戴森', '雅诗兰黛']
+KINDS = {
+    '手机数码': ['手机', '平板', '耳机', '智能手表', '充电器', '移动电源'],
+    '电脑办公': ['笔记本电脑', '显示器', '键盘', '鼠标', '打印机', '路由器'],
+    '家居用品': ['吹风机', '电饭煲', '空气净化器', '扫地机器人', '台灯', '床垫'],
+    '服装鞋帽': ['跑步鞋', '运动外套', '羽绒服', '篮球鞋', '卫衣', '帽子'],
+    '美妆护肤': ['精华液', '面霜', '口红', '防晒霜', '洗面奶', '面膜'],
+}
+FEATURES = ['轻薄便携', '超长续航', '主动降噪', '快速充电', '高清大屏', '透气舒适', '保湿补水', '静音设计',
+            '智能互联', '专业级性能', 'Pro版', '青春版', '旗舰芯片', '防水防尘', '经典配色', '限量款']
+QUERIES = ['华为手机', '手机', '鞋', '降噪耳机', 'nike 跑步鞋', 'pro', '超长续航笔记本电脑', '保湿面霜',
+           '扫地机器人', '不存在的商品xyz']
+
+
+def make_products(count, seed=1):
+    rng = random.Random(seed)
+    categories = list(KINDS)
+    products = []
+    for product_id in range(1, count + 1):
+        category = rng.choice(categories)
+        kind = rng.choice(KINDS[category])
+        brand = rng.choice(BRANDS)
+        features = rng.sample(FEATURES, 3)
+        products.append({
+            'product_id': product_id,
+            'name': f'{brand}{kind} {features[0]} {rng.randint(1, 99)}代',
+            'category': category,
+            'price': rng.randint(10, 9999),
+            'stock': rng.randint(0, 500),
+            'description': f'{brand}出品，{"，".join(features)}，适合日常使用的{kind}',
+            'image': f'{product_id}.jpg'
+        })
+    return products
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='商品搜索基准测试')
+    parser.add_argument('--products', type=int, default=100000, help='商品数')
+    parser.add_argument('--repeat', type=int, default=200, help='每个查询的重复次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 必须在导入backend模块之前设置
+        os.environ['ECOMMERCE_DATA_DIR'] = data_dir
+        import pandas as pd
+        from backend.models.product_model import ProductModel
+        from backend.storage.engine import get_store
+        from backend.utils.catalog_cache import catalog_cache
+        from backend.utils.product_search import product_search
+
+        get_store().replace_table('products', pd.DataFrame(make_products(args.products)))
+        catalog_cache.invalidate()
+        catalog_cache.records()  # 先加载商品目录，只统计索引构建耗时
+
+        start = time.perf_counter()
+        product_search.refresh()
+        build = time.perf_counter() - start
+        print(f"商品数：{args.products}  索引构建：{build:.2f}s  索引规模：{product_search.metrics()}")
+
+        print(f"{'查询':<16} | {'命中':>6} | {'中位数(ms)':>10} | {'P99(ms)':>8}")
+        print('-' * 52)
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = product_search.search(query, limit=20)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{query:<16} | {len(results):>6} | {percentile(timings, 0.5):>10.3f} | {percentile(timings, 0.99):>8.3f}")
+
+        # 增量更新：通过 ProductModel 写入后索引只修改该商品
+        start = time.perf_counter()
+        new_id = ProductModel.add_product({'name': '基准测试专用商品', 'category': '手机数码', 'price': 1,
+                                           'stock': 1, 'description': '增量索引', 'image': 'bench.jpg'})
+        ProductModel.update_product(new_id, {'name': '基准测试专用商品二代'})
+        ProductModel.delete_product(new_id)
+        write = time.perf_counter() - start
+        catalog_cache.records()  # 商品目录重新加载（与索引无关）
+        start = time.perf_counter()
+        product_search.search('手机', limit=20)
+        resync = time.perf_counter() - start
+        print(f"新增+修改+删除一个商品（含写表）：{write * 1000:.1f}ms  "
+              f"之后首次查询（与重新加载的目录快照比对）：{resync * 1000:.1f}ms  索引：{product_search.metrics()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#用户订单历史一致性检查
+#功能：多个用户交替下单、修改订单状态，核对每个用户的"我的订单"视图与订单表一致，
+#      且本进程的写入只更新下单用户的视图（其他用户的视图继续命中，不重新构建）；
+#      最后模拟其他进程直接修改订单表，核对视图全部作废并按订单表重新构建
+#用法：python benchmarks/check_order_history.py [--users 20] [--orders 200] [--engine csv|sqlite]
+#说明：在临时数据目录中运行（通过 ECOMMERCE_DATA_DIR 指定），不会修改 data/ 下的数据
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+PRODUCT_ID = 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户订单历史一致性检查')
+    parser.add_argument('--users', type=int, default=20, help='用户数')
+    parser.add_argument('--orders', type=int, default=200, help='下单次数')
+    parser.add_argument('--engine', default='csv', choices=['csv', 'sqlite'], help='存储引擎')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 必须在导入backend模块之前设置
+        os.environ['ECOMMERCE_DATA_DIR'] = data_dir
+        os.environ['ECOMMERCE_STORAGE_ENGINE'] = args.engine
+        os.environ['ECOMMERCE_SQLITE_DB'] = os.path.join(data_dir, 'ecommerce.db')
+        import pandas as pd
+        from backend.models.order_model import OrderModel
+        from backend.storage.engine import get_store
+        from backend.utils.order_history import order_history
+
+        store = get_store()
+        store.replace_table('products', pd.DataFrame([{
+            'product_id': PRODUCT_ID, 'name': '检查商品', 'category': '检查分类', 'price': 10,
+            'stock': args.orders * 10, 'description': '订单历史检查', 'image': 'check.jpg'
+        }]))
+        users = [f'history_user_{i}' for i in range(args.users)]
+        cart = [{'product_id': PRODUCT_ID, 'name': '检查商品', 'image': 'check.jpg', 'price': 10, 'quantity': 1, 'subtotal': 10}]
+
+        def expected(user_id):
+            return [(str(o['order_id']), o['status']) for o in OrderModel.get_orders_by_user_id(user_id)[:order_history.per_user]]
+
+        def view(user_id):
+            return [(str(o['order_id']), o['status']) for o in order_history.get(user_id)]
+
+        # 1. 先构建所有用户的视图，之后交替下单/取消订单，每次写入后读取所有用户的视图
+        for user_id in users:
+            view(user_id)
+        rebuilds = order_history.metrics()['rebuilds']
+        rng = random.Random(1)
+        placed = []
+        mismatches = 0
+        for _ in range(args.orders):
+            user_id = rng.choice(users)
+            if placed and rng.random() < 0.2:
+                order_user, order_id = placed.pop(rng.randrange(len(placed)))
+                OrderModel.update_order_status(order_id, '已取消')
+            else:
+                result = OrderModel.checkout(user_id, user_id, cart_items=cart, charge_balance=False, clear_cart=False)
+                placed.append((user_id, result['order_id']))
+            for other in users:
+                mismatches += view(other) != expected(other)
+        local_rebuilds = order_history.metrics()['rebuilds'] - rebuilds
+
+        # 2. 模拟其他进程修改订单表（不经过本进程的订单模型）
+        order_user, order_id = placed[0]
+        store.update('orders', {'order_id': order_id}, {'status': '已发货'})
+        rebuilds = order_history.metrics()['rebuilds']
+        external_ok = view(order_user) == expected(order_user) and (str(order_id), '已发货') in view(order_user)
+        external_rebuilds = order_history.metrics()['rebuilds'] - rebuilds
+
+    print(f"引擎：{args.engine}  用户：{args.users}  写入次数：{args.orders}  视图统计：{order_history.metrics()}")
+    checks = [
+        ('每次写入后所有用户的视图 = 订单表', mismatches, 0),
+        ('本进程写入后重新构建的视图数', local_rebuilds, 0),
+        ('其他进程写入后视图与订单表一致', external_ok, True),
+        ('其他进程写入后读取一个用户重新构建的视图数', external_rebuilds, 1),
+    ]
+    failed = False
+    for name, actual, expected_value in checks:
+        ok = actual == expected_value
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}：实际 {actual}，期望 {expected_value}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#购买记录迁移一致性检查
+#功能：生成多个会话交错写入的购买记录（同一次购买的记录与其他会话的记录交错，并夹杂浏览记录），
+#      分别以"一次读完"与很小的块（默认3行）执行迁移，核对两次得到的订单与订单明细完全一致，
+#      且明细件数与购买记录数一致（分块迁移不会丢失跨块的明细）
+#用法：python benchmarks/check_purchase_migration.py [--purchases 3000] [--chunk-size 3] [--interleave 6] [--engine csv|sqlite]
+#说明：在临时数据目录中运行（通过 ECOMMERCE_DATA_DIR 指定），不会修改 data/ 下的数据
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+
+def make_actions(purchases, interleave, seed=1):
+    """生成行为记录：最多 interleave 个会话同时在购买，每次购买1~8件商品，记录逐条交错写入"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 10, 0, 0)
+    rows, active = [], []
+    sessions = 0
+    while sum(1 for row in rows if row['action_type'] == 'purchase') < purchases:
+        if len(active) < interleave:
+            sessions += 1
+            user_id = f'user_{sessions % 37}'
+            timestamp = (start + timedelta(seconds=sessions // 3)).strftime('%Y-%m-%d %H:%M:%S')
+            active.append({'user_id': user_id, 'timestamp': timestamp, 'session_id': f'session_{sessions}',
+                           'left': rng.randint(1, 8)})
+        session = rng.choice(active)
+        quantity = rng.randint(1, 3)
+        row = {'timestamp': session['timestamp'], 'user_id': session['user_id'], 'username': session['user_id'],
+               'product_id': rng.randint(1, 20), 'product_name': '检查商品', 'product_category': '检查分类',
+               'action_type': 'purchase', 'session_id': session['session_id'], 'quantity': quantity,
+               'total_amount': quantity * 10}
+        rows.append(row)
+        if rng.random() < 0.3:
+            rows.append(dict(row, action_type='view', quantity=1, total_amount=0))
+        session['left'] -= 1
+        if not session['left']:
+            active.remove(session)
+    return rows
+
+
+def snapshot(store):
+    """订单 {order_id: (用户, 时间, 金额)} 与明细 {order_id: [(商品, 数量, 单价), ...]}"""
+    orders = {str(order['order_id']): (str(order['user_id']), str(order['create_time']), round(float(order['total_amount']), 2))
+              for order in store.find('orders')}
+    items = {}
+    for row in store.find('order_items'):
+        items.setdefault(str(row['order_id']), []).append((int(row['product_id']), int(row['quantity']), float(row['price'])))
+    return orders, {order_id: sorted(rows) for order_id, rows in items.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='购买记录迁移一致性检查')
+    parser.add_argument('--purchases', type=int, default=3000, help='购买记录数')
+    parser.add_argument('--chunk-size', type=int, default=3, help='分块迁移的块大小')
+    parser.add_argument('--interleave', type=int, default=6, help='同时交错写入的购买会话数')
+    parser.add_argument('--engine', default='csv', choices=['csv', 'sqlite'], help='存储引擎')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 必须在导入backend模块之前设置
+        os.environ['ECOMMERCE_DATA_DIR'] = data_dir
+        os.environ['ECOMMERCE_STORAGE_ENGINE'] = args.engine
+        os.environ['ECOMMERCE_SQLITE_DB'] = os.path.join(data_dir, 'ecommerce.db')
+        import pandas as pd
+        from backend.storage.engine import get_store
+        from backend.utils.purchase_migration import migrate_purchases
+
+        rows = make_actions(args.purchases, args.interleave)
+        sessions = len({row['session_id'] for row in rows if row['action_type'] == 'purchase'})
+        store = get_store()
+        store.replace_table('user_actions', pd.DataFrame(rows))
+
+        # 1. 一次读完全部记录（不跨块）
+        migrate_purchases(chunk_size=len(rows) + 1, checkpoint_path=os.path.join(data_dir, 'single.json'), restart=True)
+        single_orders, single_items = snapshot(store)
+
+        # 2. 清空订单后按小块重新迁移
+        store.delete('order_items', {})
+        store.delete('orders', {})
+        state = migrate_purchases(chunk_size=args.chunk_size, checkpoint_path=os.path.join(data_dir, 'chunked.json'),
+                                  restart=True)
+        chunked_orders, chunked_items = snapshot(store)
+
+    purchase_units = sum(row['quantity'] for row in rows if row['action_type'] == 'purchase')
+    chunked_units = sum(quantity for items in chunked_items.values() for _, quantity, _ in items)
+    print(f"引擎：{args.engine}  行为记录：{len(rows)}  购买会话：{sessions}  块大小：{args.chunk_size}  "
+          f"分块迁移：新增{state['migrated']}个订单，跳过{state['skipped']}个")
+
+    checks = [
+        ('订单数 = 购买会话数', len(chunked_orders), sessions),
+        ('分块迁移的订单 = 一次迁移的订单', chunked_orders == single_orders, True),
+        ('分块迁移的明细 = 一次迁移的明细', chunked_items == single_items, True),
+        ('明细件数 = 购买件数', chunked_units, purchase_units),
+    ]
+    failed = False
+    for name, actual, expected in checks:
+        ok = actual == expected
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}：实际 {actual}，期望 {expected}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
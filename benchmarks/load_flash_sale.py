@@ -0,0 +1,162 @@
+#秒杀压力测试
+#功能：在本进程中启动多线程Flask测试服务器，N个客户端（每个客户端一个会话）先加购同一件商品，
+#      再同时调用 /api/purchase；统计持续下单速率与各类结果，并核对库存、订单数、订单明细与成功数一致（零超卖）
+#用法：python benchmarks/load_flash_sale.py [--clients 1000] [--stock 100] [--engine csv|sqlite] [--no-flash-sale]
+#说明：在临时数据目录中运行（通过 ECOMMERCE_DATA_DIR 指定），不会修改 data/ 下的数据
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+PRODUCT_ID = 1
+
+
+def seed_data(initial_stock):
+    """在临时数据目录中写入秒杀商品"""
+    import pandas as pd
+    from backend.storage.engine import get_store
+
+    get_store().replace_table('products', pd.DataFrame([{
+        'product_id': PRODUCT_ID, 'name': '秒杀商品', 'category': '压测分类', 'price': 10,
+        'stock': initial_stock, 'description': '秒杀压测', 'image': 'flash.jpg'
+    }]))
+
+
+def request_json(port, path, payload=None, cookie=None):
+    """发送POST请求，返回 (响应JSON, Set-Cookie中的session)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        headers = {'Content-Type': 'application/json'}
+        if cookie:
+            headers['Cookie'] = cookie
+        conn.request('POST', path, body=json.dumps(payload or {}), headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        set_cookie = response.getheader('Set-Cookie')
+        return json.loads(body), (set_cookie.split(';', 1)[0] if set_cookie else cookie)
+    finally:
+        conn.close()
+
+
+def classify(result):
+    if result is None:
+        return 'error'
+    if result.get('success'):
+        return 'ok'
+    msg = result.get('msg', '')
+    if '售罄' in msg or '库存不足' in msg:
+        return 'sold_out'
+    if '火爆' in msg:
+        return 'busy'
+    return 'error'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='秒杀压力测试')
+    parser.add_argument('--clients', type=int, default=1000, help='并发客户端数')
+    parser.add_argument('--stock', type=int, default=100, help='秒杀商品初始库存')
+    parser.add_argument('--engine', default='csv', choices=['csv', 'sqlite'], help='存储引擎')
+    parser.add_argument('--no-flash-sale', action='store_true', help='不开启秒杀模式（对照组）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 必须在导入backend模块之前设置
+        os.environ['ECOMMERCE_DATA_DIR'] = data_dir
+        os.environ['ECOMMERCE_STORAGE_ENGINE'] = args.engine
+        os.environ['ECOMMERCE_SQLITE_DB'] = os.path.join(data_dir, 'ecommerce.db')
+        import warnings
+        warnings.filterwarnings('ignore')
+        seed_data(args.stock)
+        import app as shop
+        from werkzeug.serving import make_server
+        from backend.storage.engine import get_store
+        from backend.utils.action_log import flush_actions
+        from backend.utils.flash_sale import flash_sale
+
+        if not args.no_flash_sale:
+            flash_sale.start([PRODUCT_ID])
+        server = make_server('127.0.0.1', 0, shop.app, threaded=True)
+        server.socket.listen(args.clients)  # 加大连接队列，所有客户端可同时建立连接
+        port = server.socket.getsockname()[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # 1. 每个客户端加购（获得各自的会话cookie）
+        cookies = [None] * args.clients
+        barrier = threading.Barrier(args.clients + 1)
+        results = [None] * args.clients
+        started = [0.0] * args.clients
+        finished = [0.0] * args.clients
+
+        def client(i):
+            try:
+                _, cookies[i] = request_json(port, '/api/add_to_cart', {'product_id': PRODUCT_ID, 'quantity': 1})
+            finally:
+                barrier.wait()
+            # 2. 同时下单（在客户端线程内计时：上千个线程争用时主线程可能很久之后才被调度）
+            started[i] = time.perf_counter()
+            try:
+                results[i], _ = request_json(port, '/api/purchase', cookie=cookies[i])
+            except Exception as e:
+                results[i] = {'success': False, 'msg': f'请求失败：{e}'}
+            finished[i] = time.perf_counter()
+
+        threading.stack_size(512 * 1024)
+        pool = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        for t in pool:
+            t.start()
+        barrier.wait()
+        for t in pool:
+            t.join()
+        start = min(started)
+        elapsed = max(finished) - start
+        server.shutdown()
+        flush_actions()
+
+        counts = {'ok': 0, 'sold_out': 0, 'busy': 0, 'error': 0}
+        for result in results:
+            counts[classify(result)] += 1
+        ok_times = sorted(finished[i] - start for i, result in enumerate(results) if classify(result) == 'ok')
+        order_span = ok_times[-1] if ok_times else 0.0
+
+        store = get_store()
+        final_stock = int(store.find_one('products', product_id=PRODUCT_ID)['stock'])
+        orders = store.count('orders')
+        items = store.read_table('order_items')
+        sold_units = int(items['quantity'].sum()) if not items.empty else 0
+        errors = [result.get('msg') for result in results if classify(result) == 'error'][:3]
+
+    mode = '对照（未开启秒杀）' if args.no_flash_sale else '秒杀模式'
+    print(f"引擎：{args.engine}  {mode}  客户端：{args.clients}  初始库存：{args.stock}")
+    print(f"下单请求：{args.clients}  成功：{counts['ok']}  售罄：{counts['sold_out']}  "
+          f"排队拒绝：{counts['busy']}  异常：{counts['error']}")
+    print(f"全部请求完成：{elapsed:.2f}s（{args.clients / elapsed:.1f} 请求/秒）  "
+          f"最后一单成交：{order_span:.2f}s（持续 {counts['ok'] / order_span if order_span else 0:.1f} 单/秒）")
+    if not args.no_flash_sale:
+        print(f"秒杀统计：{flash_sale.status()}")
+    if errors:
+        print(f"异常示例：{errors}")
+
+    checks = [
+        ('库存 = 初始库存 - 成功下单数', final_stock, args.stock - counts['ok']),
+        ('订单数 = 成功下单数', orders, counts['ok']),
+        ('订单明细件数 = 成功下单数', sold_units, counts['ok']),
+        ('零超卖（成功下单数 <= 初始库存）', counts['ok'] <= args.stock, True),
+        ('无异常请求', counts['error'], 0),
+    ]
+    failed = False
+    for name, actual, expected in checks:
+        ok = actual == expected
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}：实际 {actual}，期望 {expected}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
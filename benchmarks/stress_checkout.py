@@ -0,0 +1,141 @@
+#下单/充值并发压力测试
+#功能：多进程 × 多线程同时调用 /api/purchase 与 /api/recharge（模拟多worker部署），
+#      结束后核对库存扣减、订单数、购买记录与余额是否与成功请求数一致（无丢失更新、无超卖）
+#用法：python benchmarks/stress_checkout.py [--processes 4] [--threads 8] [--rounds 10] [--engine csv|sqlite]
+#说明：在临时数据目录中运行（通过 ECOMMERCE_DATA_DIR 指定），不会修改 data/ 下的数据
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+USERNAME = 'stress_user'
+PASSWORD = 'stress123'
+PRODUCT_ID = 1
+RECHARGE_AMOUNT = 1.0
+
+
+def seed_data(initial_stock):
+    """在临时数据目录中写入初始商品与压测用户"""
+    import bcrypt
+    import pandas as pd
+    from backend.storage.engine import get_store
+
+    store = get_store()
+    store.replace_table('products', pd.DataFrame([{
+        'product_id': PRODUCT_ID, 'name': '压测商品', 'category': '压测分类', 'price': 10,
+        'stock': initial_stock, 'description': '并发下单压测', 'image': 'stress.jpg'
+    }]))
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    store.replace_table('users', pd.DataFrame([{
+        'user_id': '13800000000', 'username': USERNAME, 'password': hashed, 'phone': '13800000000',
+        'balance': 0.0, 'favorites': '[]', 'is_admin': False
+    }]))
+
+
+def worker(threads, rounds, results):
+    """单个进程：多个线程各自登录后循环 加购→下单→充值"""
+    import warnings
+    warnings.filterwarnings('ignore')
+    import app as shop
+    from backend.utils.action_log import flush_actions
+
+    counts = {'purchase_ok': 0, 'purchase_sold_out': 0, 'purchase_error': 0, 'recharge_ok': 0, 'recharge_error': 0}
+    lock = threading.Lock()
+
+    def run():
+        client = shop.app.test_client()
+        client.post('/api/login', json={'loginId': USERNAME, 'password': PASSWORD})
+        local = dict.fromkeys(counts, 0)
+        for _ in range(rounds):
+            client.post('/api/add_to_cart', json={'product_id': PRODUCT_ID, 'quantity': 1})
+            result = client.post('/api/purchase').get_json()
+            if result['success']:
+                local['purchase_ok'] += 1
+            elif '库存不足' in result['msg']:
+                local['purchase_sold_out'] += 1
+                client.post('/api/update_cart', json={'product_id': PRODUCT_ID, 'quantity': 0})
+            else:
+                local['purchase_error'] += 1
+            result = client.post('/api/recharge', json={'amount': RECHARGE_AMOUNT}).get_json()
+            local['recharge_ok' if result['success'] else 'recharge_error'] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    flush_actions()  # 子进程退出前确保购买记录已写入
+    results.put(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下单/充值并发压力测试')
+    parser.add_argument('--processes', type=int, default=4, help='进程数（模拟gunicorn worker数）')
+    parser.add_argument('--threads', type=int, default=8, help='每个进程的线程数')
+    parser.add_argument('--rounds', type=int, default=10, help='每个线程的下单次数')
+    parser.add_argument('--stock', type=int, default=None, help='初始库存（默认为总下单次数的3/4，以覆盖售罄场景）')
+    parser.add_argument('--engine', default='csv', choices=['csv', 'sqlite'], help='存储引擎')
+    args = parser.parse_args()
+
+    attempts = args.processes * args.threads * args.rounds
+    initial_stock = args.stock if args.stock is not None else attempts * 3 // 4
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # 子进程通过环境变量使用同一临时数据目录（必须在导入backend模块之前设置）
+        os.environ['ECOMMERCE_DATA_DIR'] = data_dir
+        os.environ['ECOMMERCE_STORAGE_ENGINE'] = args.engine
+        os.environ['ECOMMERCE_SQLITE_DB'] = os.path.join(data_dir, 'ecommerce.db')
+        seed_data(initial_stock)
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(args.threads, args.rounds, results)) for _ in range(args.processes)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        totals = {}
+        for _ in procs:
+            for key, value in results.get().items():
+                totals[key] = totals.get(key, 0) + value
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        from backend.storage.engine import get_store
+        store = get_store()
+        final_stock = int(store.find_one('products', product_id=PRODUCT_ID)['stock'])
+        orders = len(store.read_table('orders'))
+        actions = store.read_table('user_actions')
+        purchases = int((actions['action_type'] == 'purchase').sum()) if not actions.empty else 0
+        balance = float(store.find_one('users', username=USERNAME)['balance'])
+
+    print(f"引擎：{args.engine}  进程：{args.processes}  线程/进程：{args.threads}  轮数：{args.rounds}")
+    print(f"下单请求：{attempts}  成功：{totals['purchase_ok']}  售罄：{totals['purchase_sold_out']}  "
+          f"异常：{totals['purchase_error']}  耗时：{elapsed:.2f}s（{attempts / elapsed:.1f} 单/秒）")
+
+    checks = [
+        ('库存 = 初始库存 - 成功下单数', final_stock, initial_stock - totals['purchase_ok']),
+        ('订单行数 = 成功下单数', orders, totals['purchase_ok']),
+        ('购买记录数 = 成功下单数', purchases, totals['purchase_ok']),
+        ('余额 = 成功充值数 × 充值金额', round(balance, 2), round(totals['recharge_ok'] * RECHARGE_AMOUNT, 2)),
+        ('未超卖（库存 >= 0）', final_stock >= 0, True),
+    ]
+    failed = False
+    for name, actual, expected in checks:
+        ok = actual == expected
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}：实际 {actual}，期望 {expected}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+//数据看板页面 JS
+//图表数据来自 /admin/api/dashboard_data（只包含数值序列），在浏览器中用 SVG 绘制
+document.addEventListener('DOMContentLoaded', function() {
+    const SVG_NS = 'http://www.w3.org/2000/svg';
+    const COLORS = ['#3498db', '#e74c3c', '#2ecc71', '#f39c12', '#9b59b6', '#1abc9c', '#e67e22', '#34495e'];
+    const WIDTH = 600;
+    const HEIGHT = 300;
+
+    // 创建SVG元素
+    function el(tag, attrs, text) {
+        const node = document.createElementNS(SVG_NS, tag);
+        Object.keys(attrs || {}).forEach(key => node.setAttribute(key, attrs[key]));
+        if (text !== undefined) node.textContent = text;
+        return node;
+    }
+
+    function createSvg() {
+        return el('svg', { viewBox: `0 0 ${WIDTH} ${HEIGHT}`, preserveAspectRatio: 'xMidYMid meet' });
+    }
+
+    function shorten(label, size) {
+        label = String(label);
+        return label.length > size ? label.slice(0, size) + '…' : label;
+    }
+
+    // 1. 饼图（右侧为图例）
+    function drawPie(svg, data) {
+        const total = data.values.reduce((sum, v) => sum + v, 0);
+        const cx = 150, cy = HEIGHT / 2, r = 120;
+        let angle = -Math.PI / 2;
+        data.values.forEach((value, i) => {
+            const color = COLORS[i % COLORS.length];
+            const share = value / total;
+            const tip = `${data.labels[i]}：${value}（${(share * 100).toFixed(1)}%）`;
+            let shape;
+            if (share >= 1) {
+                shape = el('circle', { cx: cx, cy: cy, r: r, fill: color });
+            } else {
+                const end = angle + share * 2 * Math.PI;
+                const large = share > 0.5 ? 1 : 0;
+                const x1 = cx + r * Math.cos(angle), y1 = cy + r * Math.sin(angle);
+                const x2 = cx + r * Math.cos(end), y2 = cy + r * Math.sin(end);
+                shape = el('path', { d: `M${cx},${cy} L${x1},${y1} A${r},${r} 0 ${large} 1 ${x2},${y2} Z`, fill: color });
+                angle = end;
+            }
+            shape.appendChild(el('title', {}, tip));
+            svg.appendChild(shape);
+
+            // 图例
+            const ly = 30 + i * 24;
+            svg.appendChild(el('rect', { x: 310, y: ly - 11, width: 14, height: 14, fill: color }));
+            svg.appendChild(el('text', { x: 332, y: ly, 'font-size': 13, fill: '#333' },
+                `${shorten(data.labels[i], 12)}  ${(share * 100).toFixed(1)}%`));
+        });
+    }
+
+    // 坐标轴（返回绘图区域）
+    function drawAxes(svg, maxValue) {
+        const area = { left: 50, right: WIDTH - 20, top: 20, bottom: HEIGHT - 60 };
+        svg.appendChild(el('line', { x1: area.left, y1: area.bottom, x2: area.right, y2: area.bottom, stroke: '#999' }));
+        svg.appendChild(el('line', { x1: area.left, y1: area.top, x2: area.left, y2: area.bottom, stroke: '#999' }));
+        for (let i = 0; i <= 4; i++) {
+            const y = area.bottom - (area.bottom - area.top) * i / 4;
+            svg.appendChild(el('line', { x1: area.left, y1: y, x2: area.right, y2: y, stroke: '#eee' }));
+            svg.appendChild(el('text', { x: area.left - 6, y: y + 4, 'font-size': 11, fill: '#666', 'text-anchor': 'end' },
+                Math.round(maxValue * i / 4)));
+        }
+        return area;
+    }
+
+    function drawXLabel(svg, x, y, label) {
+        svg.appendChild(el('text', {
+            x: x, y: y + 14, 'font-size': 11, fill: '#666', 'text-anchor': 'end',
+            transform: `rotate(-35 ${x} ${y + 14})`
+        }, shorten(label, 10)));
+    }
+
+    // 2. 柱状图（柱子上方显示数值）
+    function drawBar(svg, data) {
+        const maxValue = Math.max(...data.values, 1);
+        const area = drawAxes(svg, maxValue);
+        const step = (area.right - area.left) / data.values.length;
+        const barWidth = Math.min(step * 0.6, 60);
+        data.values.forEach((value, i) => {
+            const h = (area.bottom - area.top) * value / maxValue;
+            const x = area.left + step * i + (step - barWidth) / 2;
+            const bar = el('rect', { x: x, y: area.bottom - h, width: barWidth, height: h, fill: COLORS[0] });
+            bar.appendChild(el('title', {}, `${data.labels[i]}：${value}`));
+            svg.appendChild(bar);
+            svg.appendChild(el('text', { x: x + barWidth / 2, y: area.bottom - h - 4, 'font-size': 11, fill: '#333', 'text-anchor': 'middle' }, value));
+            drawXLabel(svg, x + barWidth / 2, area.bottom, data.labels[i]);
+        });
+    }
+
+    // 3. 折线图（标签较多时间隔显示）
+    function drawLine(svg, data) {
+        const maxValue = Math.max(...data.values, 1);
+        const area = drawAxes(svg, maxValue);
+        const count = data.values.length;
+        const step = count > 1 ? (area.right - area.left) / (count - 1) : 0;
+        const labelEvery = Math.max(1, Math.ceil(count / 12));
+        const points = data.values.map((value, i) => [
+            count > 1 ? area.left + step * i : (area.left + area.right) / 2,
+            area.bottom - (area.bottom - area.top) * value / maxValue
+        ]);
+        svg.appendChild(el('polyline', { points: points.map(p => p.join(',')).join(' '), fill: 'none', stroke: COLORS[1], 'stroke-width': 2 }));
+        points.forEach((point, i) => {
+            const dot = el('circle', { cx: point[0], cy: point[1], r: 3, fill: COLORS[1] });
+            dot.appendChild(el('title', {}, `${data.labels[i]}：${data.values[i]}`));
+            svg.appendChild(dot);
+            if (i % labelEvery === 0) drawXLabel(svg, point[0], area.bottom, data.labels[i]);
+        });
+    }
+
+    const DRAWERS = { pie: drawPie, bar: drawBar, line: drawLine };
+    const notify = window.adminToast || (msg => console.error(msg));
+
+    function render(container, data) {
+        container.innerHTML = '';
+        if (!data || !data.values.length || !data.values.some(v => v > 0)) {
+            container.innerHTML = '<div class="chart-empty">暂无数据</div>';
+            return;
+        }
+        const svg = createSvg();
+        DRAWERS[container.dataset.type](svg, data);
+        container.appendChild(svg);
+    }
+
+    const containers = document.querySelectorAll('.chart-canvas[data-chart]');
+    if (!containers.length) return;
+
+    fetch('/admin/api/dashboard_data')
+        .then(res => res.json())
+        .then(result => {
+            if (!result.success) {
+                notify('看板数据加载失败：' + result.msg, false);
+                return;
+            }
+            const data = result.data;
+            containers.forEach(container => render(container, data.charts[container.dataset.chart]));
+
+            // 同步更新统计卡片
+            const users = document.querySelector('#stat-total-users');
+            if (users) users.textContent = data.total_users;
+            const sales = document.querySelector('#stat-total-sales');
+            if (sales) sales.textContent = '¥' + data.total_revenue;
+        })
+        .catch(err => notify('看板数据加载失败：' + err, false));
+});